@@ -8,6 +8,8 @@
 """
 
 import os
+from pathlib import Path
+
 from dotenv import load_dotenv
 
 # 加载环境变量
@@ -36,6 +38,22 @@ class ProductionConfig:
     # OpenMemory配置
     OPENMEMORY_BASE_URL = os.getenv('OPENMEMORY_BASE_URL', 'https://api.openmemory.ai')
     OPENMEMORY_MAX_MEMORIES = int(os.getenv('OPENMEMORY_MAX_MEMORIES', '1000'))
+    # 本地持久化记忆存储（SQLite），不配置时本地只在内存中缓存
+    MEMORY_STORE_PATH = os.getenv('MEMORY_STORE_PATH', '')
+    # fallback: API不可用时使用本地；cache: 写穿透缓存，读取优先本地；primary: 只用本地
+    MEMORY_STORE_MODE = os.getenv('MEMORY_STORE_MODE', 'fallback')
+    # 对话记忆异步写回（不阻塞回复；未写完的记忆记录在落盘日志中，重启后恢复）
+    # 落盘日志每个进程独占，多个工作进程时需为每个进程配置不同的 MEMORY_WRITE_SPOOL
+    MEMORY_WRITE_BEHIND = {
+        'enabled': os.getenv('MEMORY_WRITE_BEHIND', 'true').lower() == 'true',
+        'spool_path': os.getenv(
+            'MEMORY_WRITE_SPOOL', str(Path(__file__).parent.parent / 'cache' / 'memory_write_spool.jsonl')
+        ),
+        'max_size': int(os.getenv('MEMORY_WRITE_QUEUE_SIZE', '10000')),
+        'batch_size': int(os.getenv('MEMORY_WRITE_BATCH_SIZE', '32')),
+        'flush_interval': float(os.getenv('MEMORY_WRITE_FLUSH_INTERVAL', '1.0')),
+        'max_retries': int(os.getenv('MEMORY_WRITE_MAX_RETRIES', '6'))
+    }
     
     # Redis配置
     REDIS_URL = os.getenv('REDIS_URL')
@@ -95,6 +113,10 @@ class ProductionConfig:
             'enabled': True,
             'rate_limit': 5000
         },
+        'similar_dishes': {
+            'enabled': True,
+            'rate_limit': 5000
+        },
         'image_search': {
             'enabled': True,
             'api_key': BING_API_KEY,
@@ -113,7 +135,19 @@ class ProductionConfig:
         'enable_function_calling': True,
         'enable_streaming': True,
         'default_personality': 'professional_food_expert',
-        'rate_limit_per_user': 100  # 每小时每用户限制
+        'rate_limit_per_user': 100,  # 每小时每用户限制
+        'tool_budget_seconds': 45,  # 单次请求内工具调用的总时间预算（秒）
+        'poi_stream_pages': 1  # 流式回复中餐厅搜索连续获取的页数（每多一页多消耗一次高德配额）
+    }
+    
+    # 天气预取配置
+    WEATHER_PREFETCH = {
+        # 只在配置了 OpenWeather 密钥时启用，可用 WEATHER_PREFETCH_ENABLED=false 关闭
+        'enabled': bool(OPENWEATHER_API_KEY) and os.getenv('WEATHER_PREFETCH_ENABLED', 'true').lower() == 'true',
+        'hot_cities': ['Changsha,CN', 'Beijing,CN', 'Shanghai,CN', 'Guangzhou,CN', 'Shenzhen,CN'],
+        'recent_hours': 6,  # 最近多少小时内查询过的位置也保持新鲜
+        'interval_seconds': 120,  # 检查间隔（秒）
+        'refresh_ahead_seconds': 180  # 距离过期多少秒内开始刷新
     }
     
     # 监控配置
@@ -10,6 +10,7 @@
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, AsyncGenerator, Any
 import openai
@@ -17,6 +18,9 @@ from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
+# 流式回复中逐条产出结果的工具
+STREAMING_TOOLS = ('amap_search',)
+
 class ConversationContext(BaseModel):
     """对话上下文模型"""
     user_id: str
@@ -68,6 +72,11 @@ class FoodAgent:
         }
         
         self.current_personality = "friendly_food_expert"
+        
+        # 单次请求内所有工具调用共享的时间预算（秒）
+        agent_config = getattr(config, 'AGENT_CONFIG', {}) or {}
+        self.tool_budget_seconds = agent_config.get('tool_budget_seconds', 45)
+        self.poi_stream_pages = agent_config.get('poi_stream_pages', 1)
     
     def _init_ai_clients(self):
         """初始化所有可用的AI客户端"""
@@ -197,6 +206,7 @@ class FoodAgent:
             
             # 计划阶段 - 分析用户意图和需要的工具
             plan = await self._plan_response(message, context, model)
+            plan = self._drop_unhealthy_tools(plan)
             
             # 行动阶段 - 执行必要的工具调用
             action_results = await self._execute_actions(plan, context, model)
@@ -301,6 +311,7 @@ class FoodAgent:
             }
             
             plan = await self._plan_response_with_thinking(message, context, model)
+            plan = self._drop_unhealthy_tools(plan)
             
             # 流式生成计划思考过程
             plan_thinking_content = ""
@@ -343,7 +354,24 @@ class FoodAgent:
                     "status": "processing"
                 }
                 
-                action_results = await self._execute_actions_with_thinking(plan, context, model)
+                # 流式工具和其余工具共享同一个截止时间，整个请求的工具耗时不超过预算
+                deadline = time.monotonic() + self.tool_budget_seconds
+                
+                # 支持流式的工具先执行，逐条推送结果以便前端渐进渲染
+                for tool_name in plan["tools"]:
+                    if tool_name not in STREAMING_TOOLS:
+                        continue
+                    async for event in self._stream_tool_results(tool_name, plan, context, deadline):
+                        if event["type"] == "tool_result":
+                            action_results[tool_name] = event["content"]
+                        else:
+                            yield event
+                
+                remaining_tools = [tool for tool in plan["tools"] if tool not in action_results]
+                if remaining_tools:
+                    action_results.update(await self._execute_actions_with_thinking(
+                        {**plan, "tools": remaining_tools}, context, model, deadline
+                    ))
                 
                 # 分析工具结果
                 tools_summary = []
@@ -355,6 +383,9 @@ class FoodAgent:
                         elif tool_name == 'food_recommendation':
                             count = result.get('display_data', {}).get('total_count', 0)
                             tools_summary.append(f"美食推荐：生成 {count} 个推荐")
+                        elif tool_name == 'similar_dishes':
+                            count = result.get('display_data', {}).get('total_count', 0)
+                            tools_summary.append(f"相似菜品：找到 {count} 道相似的菜")
                         elif tool_name == 'recipe_generator':
                             dish_name = result.get('display_data', {}).get('recipe', {}).get('dish_name', '菜谱')
                             tools_summary.append(f"菜谱生成：制作 {dish_name} 的详细菜谱")
@@ -467,6 +498,7 @@ class FoodAgent:
 - bing_search: 必应搜索（获取最新信息）【参数：query(必需)】
 - weather_api: 天气API（获取天气信息）【参数：city(必需)】
 - food_recommendation: 美食推荐【参数：preferences(可选)】
+- similar_dishes: 相似菜品（当用户要找"类似"、"差不多"、"像某道菜"的菜时使用）【参数：dish_name(必需)】
 - image_search: 图片搜索（当用户要求"图片"、"照片"、"看看"、"展示"、"搜索图片"时使用）【参数：query(必需)】
 - recipe_generator: 菜谱生成（当用户要求"做法"、"菜谱"、"怎么做"时使用）【参数：dish_name(必需)】
 
@@ -475,6 +507,7 @@ class FoodAgent:
 2. 如果用户要求菜谱或做法，使用recipe_generator工具，参数名为dish_name
 3. 如果用户询问餐厅位置，使用amap_search工具，参数名为keyword
 4. 如果用户要求美食推荐，使用food_recommendation工具，参数名为preferences
+5. 如果用户想找与某道菜类似的菜，使用similar_dishes工具，参数名为dish_name
 
 **图片搜索query生成规则：**
 - 分析用户需求，主动生成最优的搜索关键词（不是简单提取）
@@ -532,6 +565,16 @@ class FoodAgent:
             # 使用规则引擎作为回退
             return self._create_fallback_plan(message)
     
+    def _drop_unhealthy_tools(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """从计划中移除处于熔断状态的工具，避免等待已故障的依赖"""
+        tools = plan.get("tools", [])
+        healthy_tools = self.mcp_manager.filter_healthy_tools(tools)
+        if len(healthy_tools) != len(tools):
+            skipped = [tool for tool in tools if tool not in healthy_tools]
+            logger.warning(f"跳过熔断中的工具: {skipped}")
+            plan["tools"] = healthy_tools
+        return plan
+    
     def _create_fallback_plan(self, message: str) -> Dict[str, Any]:
         """
         基于规则的回退计划生成器
@@ -543,6 +586,8 @@ class FoodAgent:
         image_keywords = ['图片', '照片', '看看', '展示', '搜索图片', '显示', '图像', '看一下', '瞧瞧']
         # 菜谱关键词
         recipe_keywords = ['做法', '菜谱', '怎么做', '制作方法', '烹饪', '料理', '步骤']
+        # 相似菜品关键词
+        similar_keywords = ['类似', '相似', '差不多', '同类', '一样的菜']
         # 推荐关键词
         recommendation_keywords = ['推荐', '建议', '什么好吃', '吃什么']
         # 地图搜索关键词
@@ -589,6 +634,17 @@ class FoodAgent:
                 "query": search_query
             }
         
+        # 检查相似菜品需求（工具会从消息中识别已知菜名）
+        elif any(keyword in message_lower for keyword in similar_keywords):
+            plan["intent"] = "推荐相似菜品"
+            plan["tools"].append("similar_dishes")
+            plan["response_type"] = "recommendation"
+            
+            plan["parameters"]["similar_dishes"] = {
+                "dish_name": message,
+                "count": 5
+            }
+        
         # 检查推荐需求
         elif any(keyword in message_lower for keyword in recommendation_keywords):
             plan["intent"] = "美食推荐"
@@ -903,6 +959,7 @@ class FoodAgent:
 - bing_search: 必应搜索（获取最新信息）【参数：query(必需)】
 - weather_api: 天气API（获取天气信息）【参数：city(必需)】
 - food_recommendation: 美食推荐【参数：preferences(可选)】
+- similar_dishes: 相似菜品（当用户要找"类似"、"差不多"、"像某道菜"的菜时使用）【参数：dish_name(必需)】
 - image_search: 图片搜索（当用户要求"图片"、"照片"、"看看"、"展示"、"搜索图片"时使用）【参数：query(必需)】
 - recipe_generator: 菜谱生成（当用户要求"做法"、"菜谱"、"怎么做"时使用）【参数：dish_name(必需)】
 
@@ -976,17 +1033,86 @@ class FoodAgent:
         """
         try:
             parameters = plan.get("parameters", {}).get(tool_name, {})
-            result = await self.mcp_manager.execute_tool(tool_name, parameters)
+            deadline = time.monotonic() + self.tool_budget_seconds
+            result = await self.mcp_manager.execute_tool(tool_name, parameters, deadline=deadline)
             return result
         except Exception as e:
             logger.error(f"工具 {tool_name} 执行失败: {e}")
             return {"success": False, "error": str(e)}
 
-    async def _execute_actions_with_thinking(self, plan: Dict[str, Any], context: ConversationContext, model: str = None) -> Dict[str, Any]:
+    async def _stream_tool_results(
+        self,
+        tool_name: str,
+        plan: Dict[str, Any],
+        context: ConversationContext,
+        deadline: Optional[float] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        流式执行工具
+        
+        逐条产出 action_result_partial 事件，最后产出 {"type": "tool_result"}，
+        其内容与 _execute_actions 中该工具的结果格式一致。deadline 为本次请求
+        所有工具共享的截止时间（time.monotonic()），为空时从现在起按预算计算。
+        """
+        parameters = self._with_ranking_preferences(tool_name, plan.get("parameters", {}).get(tool_name, {}), context)
+        if tool_name == "amap_search":
+            parameters.setdefault("pages", self.poi_stream_pages)
+        if deadline is None:
+            deadline = time.monotonic() + self.tool_budget_seconds
+        
+        start_time = time.time()
+        result = None
+        error = None
+        streamed = 0
+        async for chunk in self.mcp_manager.stream_tool(tool_name, parameters, deadline=deadline):
+            if chunk["type"] == "poi":
+                yield {
+                    "type": "action_result_partial",
+                    "tool_name": tool_name,
+                    "display_type": "location_list",
+                    "index": streamed,
+                    "content": chunk["location"]
+                }
+                streamed += 1
+            elif chunk["type"] == "result":
+                result = chunk["result"]
+            elif chunk["type"] == "error":
+                error = chunk["error"]
+        
+        if error is not None or result is None:
+            logger.error(f"工具 {tool_name} 流式执行失败: {error}")
+            yield {
+                "type": "tool_result",
+                "content": {
+                    "error": error or "工具未返回结果",
+                    "display_type": "error",
+                    "tool_name": tool_name
+                }
+            }
+            return
+        
+        logger.info(f"工具 {tool_name} 流式执行成功，共推送 {streamed} 条结果")
+        yield {
+            "type": "tool_result",
+            "content": self._enhance_tool_result(tool_name, {
+                "success": True,
+                "tool_name": tool_name,
+                "result": result,
+                "execution_time": time.time() - start_time
+            })
+        }
+
+    async def _execute_actions_with_thinking(
+        self,
+        plan: Dict[str, Any],
+        context: ConversationContext,
+        model: str = None,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         带思维链的工具执行
         """
-        return await self._execute_actions(plan, context, model)
+        return await self._execute_actions(plan, context, model, deadline)
 
     async def _stream_response_with_thinking(
         self, 
@@ -1003,7 +1129,13 @@ class FoodAgent:
         async for chunk in self._stream_response(message, context, plan, action_results, model):
             yield chunk
 
-    async def _execute_actions(self, plan: Dict[str, Any], context: ConversationContext, model: str = None) -> Dict[str, Any]:
+    async def _execute_actions(
+        self,
+        plan: Dict[str, Any],
+        context: ConversationContext,
+        model: str = None,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         行动阶段 - 执行计划中的工具调用
         
@@ -1011,21 +1143,28 @@ class FoodAgent:
             plan: 响应计划
             context: 对话上下文
             model: 用户选择的模型
+            deadline: 本次请求的工具截止时间（time.monotonic()），为空时从现在起按预算计算
             
         Returns:
             工具执行结果
         """
         action_results = {}
         
+        # 计划内的工具共享同一个截止时间，剩余预算逐个向下传递
+        if deadline is None:
+            deadline = time.monotonic() + self.tool_budget_seconds
+        
         for tool_name in plan.get("tools", []):
             try:
-                parameters = plan.get("parameters", {}).get(tool_name, {})
+                parameters = self._with_ranking_preferences(
+                    tool_name, plan.get("parameters", {}).get(tool_name, {}), context
+                )
                 
                 # 如果是菜谱生成工具，添加模型信息
                 if tool_name == "recipe_generator" and model:
                     parameters["model_id"] = model
                 
-                result = await self.mcp_manager.execute_tool(tool_name, parameters)
+                result = await self.mcp_manager.execute_tool(tool_name, parameters, deadline=deadline)
                 
                 # 为结果添加展示类型信息
                 enhanced_result = self._enhance_tool_result(tool_name, result)
@@ -1043,6 +1182,21 @@ class FoodAgent:
         
         return action_results
 
+    def _with_ranking_preferences(
+        self,
+        tool_name: str,
+        parameters: Dict[str, Any],
+        context: ConversationContext
+    ) -> Dict[str, Any]:
+        """餐厅搜索默认按用户偏好综合排序；美食推荐带上用户ID（用于派生推荐种子和A/B分组）"""
+        parameters = dict(parameters)
+        if tool_name == "amap_search" and context.preferences:
+            parameters.setdefault("sort_by", "score")
+            parameters.setdefault("preferences", context.preferences)
+        if tool_name == "food_recommendation" and context.user_id:
+            parameters.setdefault("user_id", context.user_id)
+        return parameters
+
     def _enhance_tool_result(self, tool_name: str, result: Dict[str, Any]) -> Dict[str, Any]:
         """
         为工具结果添加展示类型信息，优化前端展示
@@ -1107,6 +1261,24 @@ class FoodAgent:
                     "categories": []
                 }
         
+        elif tool_name == "similar_dishes":
+            # 与美食推荐使用相同的卡片展示
+            enhanced_result["display_type"] = "recommendation_cards"
+            enhanced_result["display_config"] = {
+                "layout": "card_grid",
+                "show_ratings": True,
+                "show_difficulty": True,
+                "interactive": True
+            }
+            tool_result = result.get("result", result)
+            similar_dishes = tool_result.get("similar_dishes", [])
+            enhanced_result["display_data"] = {
+                "recommendations": similar_dishes,
+                "total_count": len(similar_dishes),
+                "categories": self._extract_recommendation_categories(similar_dishes),
+                "reference_dish": tool_result.get("matched_dish") or tool_result.get("query", "")
+            }
+        
         elif tool_name == "recipe_generator":
             enhanced_result["display_type"] = "recipe_detailed"
             enhanced_result["display_config"] = {
@@ -1340,7 +1512,7 @@ class FoodAgent:
 
     async def _update_memory(self, context: ConversationContext, user_message: str, ai_response: str) -> bool:
         """
-        更新用户记忆
+        更新用户记忆（偏好立即更新到对话上下文，记忆异步保存）
         
         Args:
             context: 对话上下文
@@ -1348,7 +1520,7 @@ class FoodAgent:
             ai_response: AI回复
             
         Returns:
-            是否成功更新记忆
+            记忆是否已提交保存
         """
         try:
             # 分析对话内容，提取可记忆的信息
@@ -1366,14 +1538,12 @@ class FoodAgent:
                 memory_data["preferences"] = preferences
                 context.preferences.update(preferences)
             
-            # 保存到记忆系统
-            await self.memory_client.add_memory(
+            # 放入记忆写回队列，由后台批量保存，不阻塞回复
+            return await self.memory_client.enqueue_memory(
                 user_id=context.user_id,
                 memory_data=memory_data
             )
             
-            return True
-            
         except Exception as e:
             logger.error(f"更新记忆失败: {e}")
             return False
@@ -1398,7 +1568,13 @@ class FoodAgent:
         
         return preferences
 
-    async def search_food(self, food_name: str, location: str = None, preferences: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def search_food(
+        self,
+        food_name: str,
+        location: str = None,
+        preferences: Dict[str, Any] = None,
+        cursor: str = None
+    ) -> Dict[str, Any]:
         """
         搜索美食信息
         
@@ -1406,42 +1582,66 @@ class FoodAgent:
             food_name: 食物名称
             location: 位置信息
             preferences: 用户偏好
+            cursor: 上一次结果中的 next_cursor，提供时只继续加载下一页餐厅
             
         Returns:
             搜索结果
         """
         try:
             results = {}
+            deadline = time.monotonic() + self.tool_budget_seconds
+            
+            if cursor:
+                restaurant_results = await self.mcp_manager.execute_tool(
+                    'amap_search',
+                    {'keyword': food_name, 'cursor': cursor},
+                    deadline=deadline
+                )
+                return {
+                    'success': restaurant_results.get('success', False),
+                    'food_name': food_name,
+                    'results': {'restaurants': restaurant_results},
+                    'next_cursor': self._next_cursor(restaurant_results)
+                }
+            
+            usable_tools = self.mcp_manager.filter_healthy_tools(self.mcp_manager.available_tools)
             
             # 使用多个工具搜索
-            if location and 'amap_search' in self.mcp_manager.available_tools:
-                # 搜索附近餐厅
+            if location and 'amap_search' in usable_tools:
+                # 搜索附近餐厅，有偏好时按偏好综合排序
+                amap_parameters = {'keyword': food_name, 'location': location}
+                if preferences:
+                    amap_parameters.update({'sort_by': 'score', 'preferences': preferences})
                 restaurant_results = await self.mcp_manager.execute_tool(
                     'amap_search',
-                    {'keyword': food_name, 'location': location}
+                    amap_parameters,
+                    deadline=deadline
                 )
                 results['restaurants'] = restaurant_results
             
-            if 'recipe_generator' in self.mcp_manager.available_tools:
+            if 'recipe_generator' in usable_tools:
                 # 生成菜谱
                 recipe_results = await self.mcp_manager.execute_tool(
                     'recipe_generator',
-                    {'food_name': food_name, 'preferences': preferences}
+                    {'food_name': food_name, 'preferences': preferences},
+                    deadline=deadline
                 )
                 results['recipe'] = recipe_results
             
-            if 'image_search' in self.mcp_manager.available_tools:
+            if 'image_search' in usable_tools:
                 # 搜索图片
                 image_results = await self.mcp_manager.execute_tool(
                     'image_search',
-                    {'query': food_name}
+                    {'query': food_name},
+                    deadline=deadline
                 )
                 results['images'] = image_results
             
             return {
                 'success': True,
                 'food_name': food_name,
-                'results': results
+                'results': results,
+                'next_cursor': self._next_cursor(results.get('restaurants'))
             }
             
         except Exception as e:
@@ -1449,4 +1649,13 @@ class FoodAgent:
             return {
                 'success': False,
                 'error': str(e)
-            } 
\ No newline at end of file
+            } 
+
+    @staticmethod
+    def _next_cursor(restaurant_results: Optional[Dict[str, Any]]) -> Optional[str]:
+        """从餐厅搜索结果中取出继续翻页的游标"""
+        if not restaurant_results:
+            return None
+        pagination = (restaurant_results.get('result') or {}).get('pagination') or {}
+        return pagination.get('next_cursor')
+
@@ -18,6 +18,7 @@ import logging
 from datetime import datetime
 import os
 import sys
+import time
 from pathlib import Path
 from contextlib import asynccontextmanager
 
@@ -30,6 +31,8 @@ sys.path.insert(0, str(project_root))
 from agents.food_agent import FoodAgent
 from memory.openmemory_client import OpenMemoryClient
 from mcp_tools import MCPToolManager
+from mcp_tools.tools.weather_prefetch import WeatherPrefetcher
+from image_proxy import configure_image_cache, get_image_cache, router as image_proxy_router
 from model_manager import ModelManager, ModelConfig
 from config import get_config
 
@@ -45,7 +48,9 @@ food_agent = None
 memory_client = None
 mcp_manager = None
 model_manager = None
+weather_prefetcher = None
 active_connections: List[WebSocket] = []
+startup_time: Optional[float] = None
 
 # Pydantic模型
 class ChatMessage(BaseModel):
@@ -67,6 +72,7 @@ class FoodSearchRequest(BaseModel):
     food_name: str
     location: Optional[str] = None
     preferences: Optional[Dict[str, Any]] = {}
+    cursor: Optional[str] = None  # 上一次结果中的 next_cursor，用于继续加载餐厅
 
 class ChatResponse(BaseModel):
     """聊天响应模型"""
@@ -102,16 +108,23 @@ class ModelUpdateRequest(BaseModel):
 
 async def startup_tasks():
     """应用启动时初始化组件"""
-    global food_agent, memory_client, mcp_manager, model_manager
+    global food_agent, memory_client, mcp_manager, model_manager, weather_prefetcher, startup_time
     
     try:
         logger.info("正在初始化瀚邦智能美食助手...")
+        start_time = time.perf_counter()
         
         # 初始化模型管理器
         model_manager = ModelManager(config)
         
         # 初始化记忆客户端
-        memory_client = OpenMemoryClient(config.OPENMEMORY_API_KEY)
+        write_behind = dict(getattr(config, 'MEMORY_WRITE_BEHIND', {}))
+        memory_client = OpenMemoryClient(
+            config.OPENMEMORY_API_KEY,
+            store_path=getattr(config, 'MEMORY_STORE_PATH', '') or None,
+            store_mode=getattr(config, 'MEMORY_STORE_MODE', 'fallback'),
+            write_behind=write_behind if write_behind.pop('enabled', False) else None
+        )
         await memory_client.initialize()
         
         # 初始化MCP工具管理器（传入模型管理器）
@@ -126,7 +139,22 @@ async def startup_tasks():
             model_manager=model_manager
         )
         
-        logger.info("瀚邦智能美食助手初始化完成！")
+        # 图片代理缓存：缩略图在共享CPU任务池中生成
+        configure_image_cache(run_cpu=mcp_manager.cpu_pool.run)
+        
+        # 天气预取调度器（在服务开始接收请求后启动）
+        prefetch_config = getattr(config, 'WEATHER_PREFETCH', {})
+        if prefetch_config.get('enabled', False):
+            weather_prefetcher = WeatherPrefetcher(
+                mcp_manager,
+                hot_cities=prefetch_config.get('hot_cities', []),
+                recent_hours=prefetch_config.get('recent_hours', 6),
+                interval=prefetch_config.get('interval_seconds', 120),
+                refresh_ahead=prefetch_config.get('refresh_ahead_seconds', 180)
+            )
+        
+        startup_time = time.perf_counter() - start_time
+        logger.info(f"瀚邦智能美食助手初始化完成！冷启动耗时 {startup_time * 1000:.1f}ms")
         
     except Exception as e:
         logger.error(f"初始化失败: {e}")
@@ -135,6 +163,9 @@ async def startup_tasks():
 async def shutdown_tasks():
     """应用关闭时清理资源"""
     logger.info("正在关闭瀚邦智能美食助手...")
+    if weather_prefetcher:
+        await weather_prefetcher.stop()
+    await get_image_cache().close()
     if mcp_manager:
         await mcp_manager.cleanup()
     if memory_client:
@@ -145,6 +176,11 @@ async def shutdown_tasks():
 async def lifespan(app: FastAPI):
     # 启动时执行
     await startup_tasks()
+    # MCP工具在服务开始接收请求后于后台预热
+    mcp_manager.start_warmup()
+    # 后台预取热门城市和最近查询位置的天气
+    if weather_prefetcher:
+        weather_prefetcher.start()
     yield
     # 关闭时执行
     await shutdown_tasks()
@@ -168,6 +204,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 图片代理（本地缓存第三方图片和缩略图）
+app.include_router(image_proxy_router)
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -188,6 +227,16 @@ async def health_check():
             "memory_client": memory_client is not None,
             "mcp_manager": mcp_manager is not None
         },
+        "startup_time": startup_time,
+        "mcp_tools": {
+            "registered": len(mcp_manager.tool_specs),
+            "loaded": len(mcp_manager.tools),
+            "registry_time": mcp_manager.startup_time,
+            "tool_load_times": mcp_manager.load_times
+        } if mcp_manager else None,
+        "weather_prefetch": weather_prefetcher.get_stats() if weather_prefetcher else None,
+        "memory_write_queue": memory_client.write_queue.get_stats() if memory_client and memory_client.write_queue is not None else None,
+        "image_cache": get_image_cache().get_stats(),
         "timestamp": datetime.now().isoformat()
     }
 
@@ -457,7 +506,7 @@ async def get_ip_location(request: Request):
         logger.info(f"开始IP定位，客户端IP: {client_ip}")
         
         # 获取高德地图工具
-        amap_tool = mcp_manager.tools.get('amap_search')
+        amap_tool = await mcp_manager.get_tool('amap_search')
         if not amap_tool:
             logger.error("高德地图工具未找到")
             raise HTTPException(
@@ -490,7 +539,8 @@ async def search_food(request: FoodSearchRequest):
         result = await food_agent.search_food(
             request.food_name,
             location=request.location,
-            preferences=request.preferences
+            preferences=request.preferences,
+            cursor=request.cursor
         )
         return result
     except Exception as e:
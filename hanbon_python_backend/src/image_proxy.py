@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: image_proxy.py
+@description: 图片代理与本地缓存（按内容寻址的磁盘缓存、缩略图、ETag/Range）
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import hashlib
+import ipaddress
+import logging
+import os
+import socket
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+from urllib import parse
+
+import aiohttp
+from aiohttp.abc import AbstractResolver, ResolveResult
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from mcp_tools.http_pool import HTTPSessionPool
+
+logger = logging.getLogger(__name__)
+
+PROXY_PATH = "/images/proxy"
+
+# 允许的缩略图宽度，请求的宽度向上取整到其中一档，避免缓存碎片
+THUMBNAIL_WIDTHS = (96, 160, 240, 320, 480, 640, 960)
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / 'cache' / 'images'
+
+# 上游重定向的最大跳数，每一跳都重新校验地址
+MAX_REDIRECTS = 5
+
+# 允许缓存和返回的图片类型。只允许位图：SVG等可执行脚本的类型从本站源返回会导致XSS
+ALLOWED_CONTENT_TYPES = {
+    'image/jpeg': 'image/jpeg',
+    'image/jpg': 'image/jpeg',
+    'image/pjpeg': 'image/jpeg',
+    'image/png': 'image/png',
+    'image/gif': 'image/gif',
+    'image/webp': 'image/webp'
+}
+
+# 代理响应的安全头：禁止浏览器猜测类型，图片即使被直接打开也不能执行脚本或加载其他资源
+SECURITY_HEADERS = {
+    'X-Content-Type-Options': 'nosniff',
+    'Content-Security-Policy': "default-src 'none'; sandbox"
+}
+
+
+class ImageFetchError(Exception):
+    """上游图片获取失败（不可达、非图片或超出大小限制）"""
+    pass
+
+
+class PublicAddressResolver(AbstractResolver):
+    """
+    只返回公网地址的DNS解析器
+
+    在建立连接时检查域名实际解析到的地址（包括每一跳重定向），
+    解析到内网、回环、链路本地（如云元数据服务）等非公网地址的记录被丢弃，
+    全部被丢弃时连接失败。避免通过 127.0.0.1.nip.io、metadata.google.internal
+    这类域名绕过URL检查访问内网。
+    """
+
+    def __init__(self):
+        self._resolver = aiohttp.ThreadedResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET) -> List[ResolveResult]:
+        records = await self._resolver.resolve(host, port, family)
+        public = [record for record in records if ipaddress.ip_address(record['host']).is_global]
+        if not public:
+            raise OSError(f"不允许代理内网地址: {host}")
+        return public
+
+    async def close(self):
+        await self._resolver.close()
+
+
+@dataclass
+class CachedImage:
+    """磁盘缓存中的图片文件"""
+    path: Path
+    content_type: str
+    etag: str
+
+
+def proxy_url(url: str, width: Optional[int] = None) -> str:
+    """生成图片代理地址（相对路径），width 为缩略图宽度"""
+    query = {'url': url}
+    if width:
+        query['w'] = width
+    return f"{PROXY_PATH}?{parse.urlencode(query)}"
+
+
+def make_thumbnail(source: str, target_prefix: str, width: int) -> Tuple[str, str]:
+    """
+    生成缩略图并原子写入，返回 (文件路径, Content-Type)
+
+    不放大原图；带透明通道的图片保存为PNG，其余保存为JPEG。模块级函数，可在CPU任务池中执行。
+    """
+    # 在函数内导入，避免应用启动时加载Pillow
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.thumbnail((width, width * 4))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            fmt, suffix, content_type = 'PNG', 'png', 'image/png'
+        else:
+            image = image.convert('RGB')
+            fmt, suffix, content_type = 'JPEG', 'jpg', 'image/jpeg'
+        target = f"{target_prefix}.{suffix}"
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        image.save(tmp_path, fmt, quality=85, optimize=True)
+    os.replace(tmp_path, target)
+    return target, content_type
+
+
+class ImageCache:
+    """
+    图片磁盘缓存
+
+    原图按内容的 SHA-256 存放（objects/ab/abcdef…），URL到内容哈希的映射单独保存
+    （urls/<URL哈希>），不同URL指向同一张图片时只存一份；缩略图由内容哈希和宽度
+    确定（thumbs/<哈希>_<宽度>）。同一URL的并发未命中只下载一次。
+    总大小超过 max_bytes 时按最近访问时间淘汰。
+    """
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        max_bytes: int = 512 * 1024 * 1024,
+        max_image_bytes: int = 10 * 1024 * 1024,
+        timeout: float = 10.0,
+        run_cpu: Optional[Callable[..., Awaitable[Any]]] = None,
+        allow_private_hosts: bool = False
+    ):
+        """
+        初始化缓存
+
+        Args:
+            root: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+            max_image_bytes: 单张原图大小上限（字节）
+            timeout: 下载超时时间（秒）
+            run_cpu: 执行CPU密集型函数的协程（生成缩略图），默认使用线程
+            allow_private_hosts: 是否允许代理内网地址（仅用于测试）
+        """
+        self.root = Path(root or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.max_image_bytes = max_image_bytes
+        self.timeout = timeout
+        self.run_cpu = run_cpu or asyncio.to_thread
+        self.allow_private_hosts = allow_private_hosts
+        self.http_pool = HTTPSessionPool(
+            limit_per_host=4,
+            resolver_factory=None if allow_private_hosts else PublicAddressResolver
+        )
+
+        # URL -> (内容哈希, Content-Type)
+        self._index: Dict[str, Tuple[str, str]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._total_bytes: Optional[int] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.thumbnails_generated = 0
+        self.evicted = 0
+
+    async def get(self, url: str, width: Optional[int] = None) -> CachedImage:
+        """
+        获取图片（缓存未命中时下载），width 不为空时返回对应宽度的缩略图
+
+        Raises:
+            ValueError: URL不合法或不允许代理
+            ImageFetchError: 上游获取失败
+        """
+        self._check_url(url)
+        original = await self._get_original(url)
+        if not width:
+            return original
+
+        width = next((w for w in THUMBNAIL_WIDTHS if w >= width), THUMBNAIL_WIDTHS[-1])
+        etag = f"{original.etag}-{width}"
+        prefix = self.root / 'thumbs' / f"{original.etag}_{width}"
+        for suffix, content_type in (('jpg', 'image/jpeg'), ('png', 'image/png')):
+            path = prefix.with_name(f"{prefix.name}.{suffix}")
+            try:
+                os.utime(path)
+                return CachedImage(path, content_type, etag)
+            except FileNotFoundError:
+                continue
+
+        prefix.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            path, content_type = await self.run_cpu(make_thumbnail, str(original.path), str(prefix), width)
+        except Exception as e:
+            raise ImageFetchError(f"生成缩略图失败: {e}")
+        self.thumbnails_generated += 1
+        path = Path(path)
+        await self._account(path.stat().st_size)
+        return CachedImage(path, content_type, etag)
+
+    async def close(self):
+        """关闭下载用的HTTP会话"""
+        await self.http_pool.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "root": str(self.root),
+            "indexed_urls": len(self._index),
+            "total_bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "thumbnails_generated": self.thumbnails_generated,
+            "evicted": self.evicted,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    # ---------- 内部方法 ----------
+
+    def _check_url(self, url: str):
+        """
+        只允许 http/https 公网地址，避免代理被用来访问内网
+
+        这里只能检查字面IP（包括 127.1、2130706433 这类简写形式，aiohttp 会把它们当作IP
+        直接连接而不经过解析器）；域名实际解析到的地址在连接时由 PublicAddressResolver 检查。
+        """
+        parts = parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError("只支持 http/https 图片地址")
+        if self.allow_private_hosts:
+            return
+        host = parts.hostname.lower().rstrip('.')
+        if host == 'localhost' or host.endswith('.localhost') or host.endswith('.local'):
+            raise ValueError("不允许代理内网地址")
+        if ':' not in host and not host.replace('.', '').isdigit():
+            return
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            try:
+                address = ipaddress.ip_address(socket.inet_aton(host))
+            except OSError:
+                raise ValueError("不支持的图片地址")
+        if not address.is_global:
+            raise ValueError("不允许代理内网地址")
+
+    @staticmethod
+    def _url_key(url: str) -> str:
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _object_path(self, content_hash: str) -> Path:
+        return self.root / 'objects' / content_hash[:2] / content_hash
+
+    async def _get_original(self, url: str) -> CachedImage:
+        entry = self._index.get(url) or await asyncio.to_thread(self._read_index, url)
+        # 旧版本缓存中可能有不在白名单内的类型，按未命中重新下载校验
+        if entry is not None and entry[1] in ALLOWED_CONTENT_TYPES.values():
+            path = self._object_path(entry[0])
+            try:
+                os.utime(path)
+                self.hits += 1
+                self._index[url] = entry
+                return CachedImage(path, entry[1], entry[0])
+            except FileNotFoundError:
+                # 原图已被淘汰
+                self._index.pop(url, None)
+
+        task = self._inflight.get(url)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._download(url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    def _read_index(self, url: str) -> Optional[Tuple[str, str]]:
+        try:
+            content_hash, content_type = (self.root / 'urls' / self._url_key(url)).read_text().split()
+            return content_hash, content_type
+        except (FileNotFoundError, ValueError):
+            return None
+
+    async def _download(self, url: str) -> CachedImage:
+        session = self.http_pool.get_session()
+        timeout = aiohttp.ClientTimeout(total=self.timeout, sock_connect=min(self.timeout, 5.0))
+        target = url
+        try:
+            # 手动跟随重定向，每一跳都重新检查地址
+            for _ in range(MAX_REDIRECTS + 1):
+                async with session.get(target, timeout=timeout, allow_redirects=False) as response:
+                    if response.status in (301, 302, 303, 307, 308):
+                        location = response.headers.get('Location')
+                        if not location:
+                            raise ImageFetchError(f"上游返回 {response.status} 但没有跳转地址")
+                        target = parse.urljoin(target, location)
+                        try:
+                            self._check_url(target)
+                        except ValueError as e:
+                            raise ImageFetchError(f"跳转地址不允许: {e}")
+                        continue
+                    if response.status != 200:
+                        raise ImageFetchError(f"上游返回 {response.status}")
+                    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                    if content_type not in ALLOWED_CONTENT_TYPES:
+                        raise ImageFetchError(f"不支持的图片类型: {content_type or '未知类型'}")
+                    content_type = ALLOWED_CONTENT_TYPES[content_type]
+                    data = await response.content.read(self.max_image_bytes + 1)
+                    break
+            else:
+                raise ImageFetchError("上游重定向次数过多")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ImageFetchError(f"下载图片失败: {e}")
+        if len(data) > self.max_image_bytes:
+            raise ImageFetchError("图片超过大小限制")
+
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._object_path(content_hash)
+        written = await asyncio.to_thread(self._store, url, content_hash, content_type, data)
+        self._index[url] = (content_hash, content_type)
+        if written:
+            await self._account(written)
+        return CachedImage(path, content_type, content_hash)
+
+    def _store(self, url: str, content_hash: str, content_type: str, data: bytes) -> int:
+        """写入原图（内容已存在时跳过）和URL映射，返回新写入的字节数"""
+        written = 0
+        path = self._object_path(content_hash)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+            written = len(data)
+
+        index_path = self.root / 'urls' / self._url_key(url)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index_path.write_text(f"{content_hash} {content_type}")
+        return written
+
+    async def _account(self, added: int):
+        """累计缓存大小，超过上限时在线程中淘汰最久未访问的文件"""
+        if self._total_bytes is None:
+            self._total_bytes = await asyncio.to_thread(self._scan_size)
+        else:
+            self._total_bytes += added
+        if self._total_bytes > self.max_bytes:
+            self._total_bytes = await asyncio.to_thread(self._evict)
+
+    def _cached_files(self):
+        for directory in ('objects', 'thumbs'):
+            base = self.root / directory
+            if base.exists():
+                yield from (p for p in base.rglob('*') if p.is_file())
+
+    def _scan_size(self) -> int:
+        return sum(p.stat().st_size for p in self._cached_files())
+
+    def _evict(self) -> int:
+        """按访问时间从旧到新删除，直到总大小低于上限的90%"""
+        files = sorted(
+            ((p.stat().st_mtime, p.stat().st_size, p) for p in self._cached_files()),
+            key=lambda item: item[0]
+        )
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+                self.evicted += 1
+            except FileNotFoundError:
+                pass
+        logger.info(f"图片缓存淘汰完成，当前大小 {total / 1024 / 1024:.1f}MB")
+        return total
+
+
+_image_cache: Optional[ImageCache] = None
+
+
+def configure_image_cache(run_cpu: Optional[Callable[..., Awaitable[Any]]] = None) -> ImageCache:
+    """按环境变量创建全局图片缓存（应用启动时调用，注入CPU任务池）"""
+    global _image_cache
+    _image_cache = ImageCache(
+        root=os.getenv('IMAGE_CACHE_DIR') or None,
+        max_bytes=int(os.getenv('IMAGE_CACHE_MAX_MB', '512')) * 1024 * 1024,
+        run_cpu=run_cpu
+    )
+    return _image_cache
+
+
+def get_image_cache() -> ImageCache:
+    """获取全局图片缓存，尚未创建时按默认配置创建"""
+    return _image_cache or configure_image_cache()
+
+
+router = APIRouter()
+
+
+@router.get(PROXY_PATH)
+async def proxy_image(request: Request, url: str, w: Optional[int] = None):
+    """
+    图片代理
+
+    命中缓存时直接返回磁盘文件（支持 If-None-Match 和 Range，服务器支持
+    ASGI pathsend 扩展时零拷贝发送）；未命中时下载并缓存后返回。
+    """
+    try:
+        image = await get_image_cache().get(url, w)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ImageFetchError as e:
+        logger.warning(f"图片代理失败 {url}: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+
+    etag = f'"{image.etag}"'
+    headers = {'ETag': etag, 'Cache-Control': 'public, max-age=86400', **SECURITY_HEADERS}
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(image.path, media_type=image.content_type, headers=headers)
@@ -8,6 +8,5 @@
 """
 
 from .mcp_manager import MCPToolManager
-from .tools import *
 
 __all__ = ['MCPToolManager'] 
\ No newline at end of file
@@ -8,8 +8,14 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
-from dataclasses import dataclass
+from typing import Dict, Any, Optional, AsyncGenerator
+from dataclasses import dataclass, replace
+
+import aiohttp
+
+from .execution_policy import ExecutionPolicy, remaining_time
+from .http_pool import HTTPSessionPool
+from .cpu_pool import CPUWorkerPool
 
 @dataclass
 class ToolMetadata:
@@ -24,29 +30,111 @@ class ToolMetadata:
 class BaseMCPTool(ABC):
     """MCP工具基类"""
     
+    # 默认执行策略（超时/重试/退避），子类按上游特性覆盖
+    execution_policy: ExecutionPolicy = ExecutionPolicy()
+    
     def __init__(self, name: str, description: str, **config):
         self.name = name
         self.description = description
         self.config = config
         self.enabled = config.get('enabled', True)
         self.rate_limit = config.get('rate_limit', None)
+        self.policy = self._build_policy(config)
+        self.http_pool: Optional[HTTPSessionPool] = None
+        self._owns_http_pool = False
+        self.cpu_pool: Optional[CPUWorkerPool] = None
+    
+    def _build_policy(self, config: Dict[str, Any]) -> ExecutionPolicy:
+        """合并类级默认策略与配置中的覆盖项"""
+        overrides = {
+            key: config[key]
+            for key in ('timeout', 'max_retries', 'backoff_base', 'backoff_max')
+            if config.get(key) is not None
+        }
+        return replace(self.execution_policy, **overrides)
+    
+    def client_timeout(self, timeout: Optional[float] = None) -> aiohttp.ClientTimeout:
+        """
+        构建HTTP请求超时设置
+        
+        取策略超时与当前调用剩余截止时间中的较小值，保证上游请求不会超出调用方的预算。
+        
+        Args:
+            timeout: 覆盖策略中的超时时间（秒）
+        """
+        total = timeout or self.policy.timeout
+        remaining = remaining_time()
+        if remaining is not None:
+            total = max(0.1, min(total, remaining))
+        return aiohttp.ClientTimeout(total=total, sock_connect=min(total, 5.0))
+    
+    def bind_http_pool(self, pool: HTTPSessionPool):
+        """注入共享HTTP连接池（由MCPToolManager在注册时调用）"""
+        self.http_pool = pool
+        self._owns_http_pool = False
+    
+    def get_http_session(self) -> aiohttp.ClientSession:
+        """
+        获取HTTP会话
+        
+        已注入连接池时使用共享会话；单独使用工具时创建工具私有的连接池，
+        在 cleanup() 中关闭。
+        """
+        if self.http_pool is None:
+            self.http_pool = HTTPSessionPool()
+            self._owns_http_pool = True
+        return self.http_pool.get_session()
+    
+    def bind_cpu_pool(self, pool: CPUWorkerPool):
+        """注入共享CPU任务池（由MCPToolManager在注册时调用）"""
+        self.cpu_pool = pool
+    
+    async def run_cpu(self, func, *args, **kwargs):
+        """
+        执行CPU密集型的后处理（HTML/大JSON解析等）
+        
+        已注入任务池时在线程/进程池中执行；单独使用工具时直接执行。
+        """
+        if self.cpu_pool is None:
+            return func(*args, **kwargs)
+        return await self.cpu_pool.run(func, *args, **kwargs)
+    
+    async def cleanup(self):
+        """清理工具资源"""
+        if self._owns_http_pool and self.http_pool is not None:
+            await self.http_pool.close()
+            self.http_pool = None
+            self._owns_http_pool = False
     
     @abstractmethod
     async def execute(self, **parameters) -> Dict[str, Any]:
         """执行工具功能"""
         pass
     
+    async def stream(self, **parameters) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        流式执行工具，逐块产出结果
+        
+        默认一次性产出 execute 的结果；能够分批返回数据的工具（如分页搜索）可重写，
+        先逐块产出部分结果，最后产出 {"type": "result"} 完整结果。每个数据块都带有 "type" 字段。
+        """
+        yield {"type": "result", "result": await self.execute(**parameters)}
+    
     @abstractmethod
     def get_parameters_schema(self) -> Dict[str, Any]:
         """获取参数模式"""
         pass
     
-    def get_metadata(self) -> ToolMetadata:
-        """获取工具元数据"""
+    def get_metadata(self, parameters: Optional[Dict[str, Any]] = None) -> ToolMetadata:
+        """获取工具元数据
+        
+        Args:
+            parameters: 已构建好的参数模式，不传则调用 get_parameters_schema()
+        """
         return ToolMetadata(
             name=self.name,
             description=self.description,
-            parameters=self.get_parameters_schema(),
+            parameters=parameters if parameters is not None else self.get_parameters_schema(),
             category=getattr(self, 'category', 'general'),
             enabled=self.enabled,
             rate_limit=self.rate_limit
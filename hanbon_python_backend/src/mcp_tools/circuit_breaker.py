@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: circuit_breaker.py
+@description: 工具熔断器与健康评分
+@author: AI Assistant
+@created: 2024
+"""
+
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    """熔断器状态"""
+    CLOSED = "closed"        # 正常放行
+    OPEN = "open"            # 熔断中，直接失败
+    HALF_OPEN = "half_open"  # 试探放行少量请求
+
+
+class CircuitOpenError(Exception):
+    """工具处于熔断状态，调用被快速拒绝"""
+
+
+@dataclass(frozen=True)
+class CircuitBreakerConfig:
+    """熔断器配置"""
+    window_size: int = 20                # 滑动窗口内统计的调用次数
+    min_calls: int = 5                   # 窗口内至少有这么多次调用才会判断是否熔断
+    failure_rate_threshold: float = 0.5  # 失败率达到该值时熔断
+    slow_call_rate_threshold: float = 0.8  # 慢调用比例达到该值时熔断
+    open_duration: float = 30.0          # 熔断持续时间（秒），之后进入半开状态
+    half_open_max_calls: int = 1         # 半开状态下允许同时试探的调用数
+
+
+class CircuitBreaker:
+    """
+    基于滑动窗口的熔断器
+
+    按最近 window_size 次调用的失败率和慢调用比例决定是否熔断；熔断
+    open_duration 秒后进入半开状态放行试探请求，成功则恢复，失败则重新熔断。
+    """
+
+    def __init__(self, name: str, slow_call_duration: float, config: Optional[CircuitBreakerConfig] = None):
+        """
+        初始化熔断器
+
+        Args:
+            name: 工具名称
+            slow_call_duration: 超过该耗时（秒）的调用视为慢调用
+            config: 熔断器配置
+        """
+        self.name = name
+        self.slow_call_duration = slow_call_duration
+        self.config = config or CircuitBreakerConfig()
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        # 每次调用记录为 (是否失败, 是否慢调用)
+        self._window: deque = deque(maxlen=self.config.window_size)
+        self.total_rejections = 0
+
+    @property
+    def state(self) -> CircuitState:
+        """当前状态（熔断到期时自动转为半开）"""
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.config.open_duration:
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    def allow_request(self) -> bool:
+        """判断是否放行本次调用；放行后必须调用 record_success/record_failure"""
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN and self._half_open_in_flight < self.config.half_open_max_calls:
+            self._half_open_in_flight += 1
+            return True
+
+        self.total_rejections += 1
+        return False
+
+    def record_success(self, duration: float):
+        """记录一次成功调用"""
+        slow = duration >= self.slow_call_duration
+        if self._state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            if slow:
+                self._trip()
+            else:
+                self._window.clear()
+                self._transition(CircuitState.CLOSED)
+            return
+
+        self._window.append((False, slow))
+        self._evaluate()
+
+    def record_failure(self, duration: float):
+        """记录一次失败调用"""
+        if self._state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            self._trip()
+            return
+
+        self._window.append((True, duration >= self.slow_call_duration))
+        self._evaluate()
+
+    def record_cancelled(self):
+        """调用被取消（如客户端断开），不计入统计，仅释放半开试探名额"""
+        if self._state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+    def _evaluate(self):
+        """根据窗口统计判断是否需要熔断"""
+        if self._state != CircuitState.CLOSED or len(self._window) < self.config.min_calls:
+            return
+        failure_rate, slow_rate = self._rates()
+        if failure_rate >= self.config.failure_rate_threshold or slow_rate >= self.config.slow_call_rate_threshold:
+            self._trip()
+
+    def _trip(self):
+        """进入熔断状态"""
+        self._opened_at = time.monotonic()
+        self._transition(CircuitState.OPEN)
+
+    def _transition(self, new_state: CircuitState):
+        if new_state != self._state:
+            logger.warning(f"⚡ 工具 {self.name} 熔断器状态: {self._state.value} -> {new_state.value}")
+            self._state = new_state
+            if new_state != CircuitState.HALF_OPEN:
+                self._half_open_in_flight = 0
+
+    def _rates(self) -> tuple:
+        """返回窗口内的 (失败率, 慢调用比例)"""
+        if not self._window:
+            return 0.0, 0.0
+        total = len(self._window)
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow = sum(1 for _, is_slow in self._window if is_slow)
+        return failures / total, slow / total
+
+    def health_score(self) -> float:
+        """
+        健康评分（0~1）
+
+        熔断中为0；否则由成功率和非慢调用比例综合得出，半开状态再打五折。
+        """
+        state = self.state
+        if state == CircuitState.OPEN:
+            return 0.0
+        failure_rate, slow_rate = self._rates()
+        score = (1.0 - failure_rate) * (1.0 - 0.5 * slow_rate)
+        if state == CircuitState.HALF_OPEN:
+            score *= 0.5
+        return round(score, 3)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器统计信息"""
+        failure_rate, slow_rate = self._rates()
+        state = self.state
+        return {
+            "state": state.value,
+            "failure_rate": round(failure_rate, 3),
+            "slow_call_rate": round(slow_rate, 3),
+            "window_calls": len(self._window),
+            "rejections": self.total_rejections,
+            "retry_after": (
+                max(0.0, self.config.open_duration - (time.monotonic() - self._opened_at))
+                if state == CircuitState.OPEN else 0.0
+            )
+        }
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: cpu_pool.py
+@description: MCP工具共享的CPU任务池（HTML解析、大JSON解析等不在事件循环中执行）
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+THREAD = 'thread'
+PROCESS = 'process'
+INLINE = 'inline'
+
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict) -> Tuple[Any, float]:
+    """在工作线程/进程中执行，返回结果和开始执行的时间（用于统计排队时间）"""
+    started_at = time.time()
+    return func(*args, **kwargs), started_at
+
+
+class CPUWorkerPool:
+    """
+    有界CPU任务池
+
+    由 MCPToolManager 持有并在注册时注入各工具。工具的CPU密集型后处理通过
+    run() 提交到线程池或进程池，避免阻塞事件循环；同时在途的任务数超过
+    max_pending 时，新任务在事件循环侧等待，而不是无限堆积在执行器队列里。
+
+    inline 模式直接在当前线程执行，便于测试和调试。进程池模式下提交的函数
+    和参数必须可以被 pickle（模块级函数）。
+    """
+
+    def __init__(
+        self,
+        mode: str = THREAD,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None
+    ):
+        """
+        初始化任务池
+
+        Args:
+            mode: thread（默认）、process 或 inline
+            max_workers: 工作线程/进程数，默认 min(4, CPU核数)
+            max_pending: 同时在途（排队 + 执行中）的任务数上限，默认 max_workers 的4倍
+        """
+        if mode not in (THREAD, PROCESS, INLINE):
+            logger.warning(f"未知的CPU任务池模式 {mode}，改用 {THREAD}")
+            mode = THREAD
+        self.mode = mode
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.max_pending = max_pending or self.max_workers * 4
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.peak_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.total_run_time = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """已提交但还没有空闲工作线程/进程执行的任务数"""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        执行CPU密集型函数并返回结果
+
+        调用方被取消时不会中断已在执行的任务，但其结果会被丢弃。
+        """
+        if self.mode == INLINE:
+            return func(*args, **kwargs)
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+
+        submitted_at = time.time()
+        self.submitted += 1
+        async with self._semaphore:
+            self.in_flight += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+            try:
+                loop = asyncio.get_running_loop()
+                result, started_at = await loop.run_in_executor(
+                    self._get_executor(), functools.partial(_timed_call, func, args, kwargs)
+                )
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+        finished_at = time.time()
+        self.completed += 1
+        self.total_wait_time += max(0.0, started_at - submitted_at)
+        self.total_run_time += finished_at - started_at
+        return result
+
+    def shutdown(self):
+        """关闭执行器（不等待在途任务）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            logger.info("CPU任务池已关闭")
+        self._executor = None
+        self._semaphore = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取任务池统计信息"""
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self.total_wait_time / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.total_run_time / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+    def _get_executor(self) -> Executor:
+        """首次提交任务时创建执行器"""
+        if self._executor is None:
+            if self.mode == PROCESS:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="mcp-cpu"
+                )
+            logger.info(f"创建CPU任务池: mode={self.mode}, workers={self.max_workers}")
+        return self._executor
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: execution_policy.py
+@description: 工具执行策略（超时、重试、退避）与请求截止时间传递
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+import aiohttp
+
+
+class TransientToolError(Exception):
+    """可重试的临时错误（如上游返回5xx）"""
+
+
+# 视为临时故障、允许按策略重试的异常类型
+TRANSIENT_ERRORS = (TransientToolError, aiohttp.ClientError, asyncio.TimeoutError)
+
+# 当前调用的绝对截止时间（time.monotonic()），由MCPToolManager在执行工具前设置
+_current_deadline: ContextVar[Optional[float]] = ContextVar('mcp_tool_deadline', default=None)
+
+
+@dataclass(frozen=True)
+class ExecutionPolicy:
+    """工具执行策略"""
+    timeout: float = 15.0        # 单次尝试的超时时间（秒）
+    max_retries: int = 0         # 失败后的最大重试次数
+    backoff_base: float = 0.5    # 指数退避的基础等待时间（秒）
+    backoff_max: float = 4.0     # 单次退避的最长等待时间（秒）
+    min_attempt_time: float = 1.0  # 剩余预算低于该值时不再发起新的尝试
+
+    def backoff_delay(self, attempt: int) -> float:
+        """计算第 attempt 次重试前的等待时间（带抖动）"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+
+def get_current_deadline() -> Optional[float]:
+    """获取当前调用的绝对截止时间"""
+    return _current_deadline.get()
+
+
+def set_current_deadline(deadline: Optional[float]):
+    """设置当前调用的截止时间，返回用于恢复的token"""
+    return _current_deadline.set(deadline)
+
+
+def reset_current_deadline(token):
+    """恢复之前的截止时间"""
+    _current_deadline.reset(token)
+
+
+def remaining_time(default: Optional[float] = None) -> Optional[float]:
+    """
+    获取距离截止时间的剩余秒数
+
+    Args:
+        default: 没有截止时间时的返回值
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    return max(0.0, deadline - time.monotonic())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: http_pool.py
+@description: MCP工具共享的HTTP连接池
+@author: AI Assistant
+@created: 2024
+"""
+
+import logging
+from typing import Dict, Any, Callable, Optional
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPSessionPool:
+    """
+    长生命周期的 aiohttp ClientSession
+
+    由 MCPToolManager 持有并在注册时注入各工具，复用 TCP/TLS 连接（keep-alive）
+    和 DNS 缓存，避免每次工具调用都重新握手。
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        dns_cache_ttl: int = 300,
+        keepalive_timeout: float = 30.0,
+        resolver_factory: Optional[Callable[[], AbstractResolver]] = None
+    ):
+        """
+        初始化连接池
+
+        Args:
+            limit: 总连接数上限
+            limit_per_host: 单个上游主机的连接数上限
+            dns_cache_ttl: DNS缓存时间（秒）
+            keepalive_timeout: 空闲连接保持时间（秒）
+            resolver_factory: 创建DNS解析器的函数（在事件循环中创建会话时调用），默认使用aiohttp的解析器
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.resolver_factory = resolver_factory
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """获取共享会话，首次调用（或关闭后）时在当前事件循环中创建"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+                enable_cleanup_closed=True,
+                resolver=self.resolver_factory() if self.resolver_factory else None
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+            logger.info(
+                f"创建共享HTTP会话: limit={self.limit}, limit_per_host={self.limit_per_host}, "
+                f"dns_ttl={self.dns_cache_ttl}s"
+            )
+        return self._session
+
+    async def close(self):
+        """关闭共享会话及其连接"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("共享HTTP会话已关闭")
+        self._session = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        session = self._session
+        if session is None or session.closed:
+            return {"active": False}
+
+        connector = session.connector
+        acquired = len(getattr(connector, '_acquired', ()))
+        idle = sum(len(conns) for conns in getattr(connector, '_conns', {}).values())
+        return {
+            "active": True,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "connections_in_use": acquired,
+            "idle_connections": idle
+        }
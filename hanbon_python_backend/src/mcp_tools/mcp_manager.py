@@ -9,45 +9,69 @@
 
 import asyncio
 import logging
-from typing import Dict, List, Any
+import time
+from dataclasses import asdict
+from typing import Dict, List, Any, Optional, AsyncGenerator, Awaitable, Callable
 
 # 导入基类
 from .base_tool import BaseMCPTool, ToolMetadata
-
-# 导入具体的工具实现
-from .tools.amap_tool import AmapTool
-from .tools.bing_search_tool import BingSearchTool
-from .tools.weather_tool import WeatherTool
-from .tools.food_recommendation_tool import FoodRecommendationTool
-from .tools.image_search_tool import ImageSearchTool
-from .tools.recipe_generator_tool import RecipeGeneratorTool
+from .schema_validator import CompiledSchema, compile_schema
+from .execution_policy import TRANSIENT_ERRORS, set_current_deadline, reset_current_deadline
+from .http_pool import HTTPSessionPool
+from .cpu_pool import CPUWorkerPool
+from .registry import ToolSpec, BUILTIN_TOOL_SPECS
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
 
 logger = logging.getLogger(__name__)
 
 class MCPToolManager:
     """MCP工具管理器"""
     
-    def __init__(self, model_manager=None):
+    def __init__(self, model_manager=None, cpu_pool_mode: Optional[str] = None):
         """初始化MCP工具管理器
         
         Args:
             model_manager: 模型管理器实例
+            cpu_pool_mode: CPU任务池模式（thread/process/inline），默认读取 MCP_CPU_POOL_MODE
         """
-        self.tools: Dict[str, BaseMCPTool] = {}
+        self.tools: Dict[str, BaseMCPTool] = {}   # 已实例化的工具
+        self.tool_specs: Dict[str, ToolSpec] = {}  # 已注册（可能尚未加载）的工具
         self.tool_metadata: Dict[str, ToolMetadata] = {}
+        self.compiled_schemas: Dict[str, CompiledSchema] = {}
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
         self.execution_count: Dict[str, int] = {}
         self.last_execution: Dict[str, float] = {}
         self.model_manager = model_manager
         
+        # 所有工具共享的HTTP连接池（keep-alive、DNS缓存、单主机连接数限制）
+        self.http_pool = HTTPSessionPool()
+        
+        # 所有工具共享的CPU任务池（HTML/大JSON解析不占用事件循环），测试时可设为inline
+        self.cpu_pool = CPUWorkerPool(
+            mode=cpu_pool_mode or self._get_config_value('MCP_CPU_POOL_MODE', 'thread'),
+            max_workers=int(self._get_config_value('MCP_CPU_POOL_WORKERS', '0')) or None
+        )
+        
+        # 按需加载相关状态
+        self._load_locks: Dict[str, asyncio.Lock] = {}
+        self._warmup_task: Optional[asyncio.Task] = None
+        self.load_times: Dict[str, float] = {}
+        self.startup_time: Optional[float] = None
+        
     async def initialize(self):
-        """初始化所有工具"""
+        """初始化工具注册表（不导入、不实例化具体工具）"""
         try:
             logger.info("正在初始化MCP工具...")
+            start_time = time.perf_counter()
             
             # 注册所有可用工具
             await self._register_tools()
             
-            logger.info(f"成功初始化 {len(self.tools)} 个MCP工具")
+            self.startup_time = time.perf_counter() - start_time
+            logger.info(
+                f"成功注册 {len(self.tool_specs)} 个MCP工具（按需加载），"
+                f"冷启动耗时 {self.startup_time * 1000:.1f}ms"
+            )
             
         except Exception as e:
             logger.error(f"MCP工具初始化失败: {e}")
@@ -55,51 +79,81 @@ class MCPToolManager:
     
     async def _register_tools(self):
         """注册所有工具"""
-        # 高德地图工具
-        amap_tool = AmapTool(
-            name="amap_search",
-            description="高德地图搜索工具，用于查找餐厅、美食地点等",
-            api_key=self._get_config_value('AMAP_API_KEY')
-        )
-        await self._register_tool(amap_tool)
-        
-        # 必应搜索工具
-        bing_tool = BingSearchTool(
-            name="bing_search",
-            description="必应搜索工具，用于获取最新的网络信息",
-            api_key=self._get_config_value('BING_API_KEY')
-        )
-        await self._register_tool(bing_tool)
+        for spec in BUILTIN_TOOL_SPECS:
+            self.register_tool_spec(spec)
+    
+    def register_tool_spec(self, spec: ToolSpec):
+        """注册工具入口，工具模块在首次使用时才导入"""
+        if not spec.name:
+            raise ValueError("工具名称不能为空")
+        self.tool_specs[spec.name] = spec
+        self.execution_count.setdefault(spec.name, 0)
+    
+    def start_warmup(self):
+        """在后台预热所有已注册工具（服务开始接收请求后调用）"""
+        if self._warmup_task is None or self._warmup_task.done():
+            self._warmup_task = asyncio.create_task(self.warmup())
+        return self._warmup_task
+    
+    async def warmup(self):
+        """依次加载所有尚未加载的工具"""
+        start_time = time.perf_counter()
+        for tool_name in list(self.tool_specs):
+            try:
+                await self.get_tool(tool_name)
+            except Exception as e:
+                logger.warning(f"预热工具 {tool_name} 失败: {e}")
         
-        # 天气API工具 (使用OpenWeather API)
-        weather_tool = WeatherTool(
-            name="weather_api",
-            description="天气API工具，用于获取天气信息和基于天气的美食推荐",
-            api_key=self._get_config_value('OPENWEATHER_API_KEY')
+        logger.info(
+            f"MCP工具预热完成: 已加载 {len(self.tools)}/{len(self.tool_specs)} 个，"
+            f"耗时 {(time.perf_counter() - start_time) * 1000:.1f}ms"
         )
-        await self._register_tool(weather_tool)
+    
+    async def get_tool(self, tool_name: str) -> Optional[BaseMCPTool]:
+        """
+        获取工具实例，未加载时导入模块并实例化
         
-        # 美食推荐工具
-        food_rec_tool = FoodRecommendationTool(
-            name="food_recommendation",
-            description="智能美食推荐工具，基于用户偏好推荐美食"
-        )
-        await self._register_tool(food_rec_tool)
+        Args:
+            tool_name: 工具名称
+            
+        Returns:
+            工具实例；工具未注册时返回None
+        """
+        tool = self.tools.get(tool_name)
+        if tool is not None:
+            return tool
         
-        # 图片搜索工具（基于Bing爬虫）
-        image_tool = ImageSearchTool(
-            name="image_search",
-            description="Bing图片搜索工具，用于搜索美食相关图片（基于爬虫技术）"
-        )
-        await self._register_tool(image_tool)
+        spec = self.tool_specs.get(tool_name)
+        if spec is None:
+            return None
         
-        # 菜谱生成工具
-        recipe_tool = RecipeGeneratorTool(
-            name="recipe_generator",
-            description="AI菜谱生成工具，使用用户选择的默认模型生成详细的烹饪菜谱",
-            model_manager=self.model_manager
-        )
-        await self._register_tool(recipe_tool)
+        lock = self._load_locks.setdefault(tool_name, asyncio.Lock())
+        async with lock:
+            if tool_name in self.tools:
+                return self.tools[tool_name]
+            
+            start_time = time.perf_counter()
+            # 模块导入（如BeautifulSoup）可能较慢，放到线程中避免阻塞事件循环
+            tool_class = await asyncio.to_thread(spec.load_class)
+            tool = tool_class(**self._build_tool_kwargs(spec))
+            tool.enabled = tool.enabled and spec.enabled
+            await self._register_tool(tool)
+            
+            self.load_times[tool_name] = time.perf_counter() - start_time
+            logger.info(f"按需加载工具 {tool_name}，耗时 {self.load_times[tool_name] * 1000:.1f}ms")
+            return tool
+    
+    def _build_tool_kwargs(self, spec: ToolSpec) -> Dict[str, Any]:
+        """根据注册项构建工具构造参数"""
+        kwargs: Dict[str, Any] = {
+            "name": spec.name,
+            "description": spec.description
+        }
+        for param, env_key in spec.config_env.items():
+            kwargs[param] = self._get_config_value(env_key)
+        if spec.inject_model_manager:
+            kwargs["model_manager"] = self.model_manager
+        return kwargs
     
     def _get_config_value(self, key: str, default: str = "") -> str:
         """获取配置值"""
@@ -113,9 +167,21 @@ class MCPToolManager:
             if not tool.name:
                 raise ValueError("工具名称不能为空")
             
+            # 编译参数模式（只在注册时构建一次）
+            compiled_schema = compile_schema(tool.get_parameters_schema())
+            
+            # 注入共享HTTP连接池
+            tool.bind_http_pool(self.http_pool)
+            tool.bind_cpu_pool(self.cpu_pool)
+            
             # 注册工具
             self.tools[tool.name] = tool
-            self.tool_metadata[tool.name] = tool.get_metadata()
+            self.compiled_schemas[tool.name] = compiled_schema
+            # 超过单次超时80%的调用视为慢调用
+            self.circuit_breakers[tool.name] = CircuitBreaker(
+                tool.name, slow_call_duration=tool.policy.timeout * 0.8
+            )
+            self.tool_metadata[tool.name] = tool.get_metadata(parameters=compiled_schema.schema)
             self.execution_count[tool.name] = 0
             
             logger.info(f"成功注册工具: {tool.name}")
@@ -124,18 +190,23 @@ class MCPToolManager:
             logger.error(f"注册工具 {tool.name} 失败: {e}")
             raise
     
-    async def execute_tool(self, tool_name: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    async def execute_tool(
+        self,
+        tool_name: str,
+        parameters: Dict[str, Any],
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         执行指定工具
         
         Args:
             tool_name: 工具名称
             parameters: 工具参数
+            deadline: 调用方的绝对截止时间（time.monotonic()），为None时仅受工具自身策略约束
             
         Returns:
             执行结果
         """
-        import time
         start_time = time.time()
         
         # 记录工具调用输入日志
@@ -144,33 +215,24 @@ class MCPToolManager:
         logger.info(f"   输入参数: {parameters}")
         
         try:
-            # 检查工具是否存在
-            if tool_name not in self.tools:
-                error_msg = f"工具 '{tool_name}' 不存在"
-                logger.error(f"❌ {error_msg}")
-                raise ValueError(error_msg)
-            
-            tool = self.tools[tool_name]
-            
-            # 检查工具是否启用
-            if not tool.enabled:
-                error_msg = f"工具 '{tool_name}' 已禁用"
-                logger.error(f"❌ {error_msg}")
-                raise ValueError(error_msg)
-            
-            # 检查速率限制
-            if not self._check_rate_limit(tool_name):
-                error_msg = f"工具 '{tool_name}' 达到速率限制"
-                logger.error(f"⚠️ {error_msg}")
-                raise ValueError(error_msg)
-            
-            # 验证参数
-            logger.info(f"📋 验证工具参数...")
-            self._validate_parameters(tool, parameters)
+            tool, parameters, breaker = await self._prepare_call(tool_name, parameters)
             
             # 执行工具
             logger.info(f"⚙️ 开始执行工具: {tool_name}")
-            result = await tool.execute(**parameters)
+            call_start = time.monotonic()
+            try:
+                result, attempts = await self._execute_with_policy(tool, parameters, deadline)
+            except asyncio.CancelledError:
+                breaker.record_cancelled()
+                raise
+            except Exception:
+                breaker.record_failure(time.monotonic() - call_start)
+                raise
+            # 工具把非瞬时错误转换为 success=False 的结果返回，同样计入熔断统计
+            if isinstance(result, dict) and result.get("success") is False:
+                breaker.record_failure(time.monotonic() - call_start)
+            else:
+                breaker.record_success(time.monotonic() - call_start)
             
             # 计算执行时间
             execution_time = time.time() - start_time
@@ -188,7 +250,8 @@ class MCPToolManager:
                 "success": True,
                 "tool_name": tool_name,
                 "result": result,
-                "execution_time": execution_time
+                "execution_time": execution_time,
+                "attempts": attempts
             }
             
             logger.info(f"📤 最终返回结果: {final_result}")
@@ -211,6 +274,198 @@ class MCPToolManager:
             
             return error_result
     
+    async def _prepare_call(self, tool_name: str, parameters: Dict[str, Any]) -> tuple:
+        """
+        执行前检查：加载工具、启用状态、速率限制、参数验证和熔断器
+        
+        Returns:
+            (工具实例, 验证后的参数, 熔断器)
+        """
+        # 检查工具是否存在（未加载时按需加载）
+        tool = await self.get_tool(tool_name)
+        if tool is None:
+            error_msg = f"工具 '{tool_name}' 不存在"
+            logger.error(f"❌ {error_msg}")
+            raise ValueError(error_msg)
+        
+        # 检查工具是否启用
+        if not tool.enabled:
+            error_msg = f"工具 '{tool_name}' 已禁用"
+            logger.error(f"❌ {error_msg}")
+            raise ValueError(error_msg)
+        
+        # 检查速率限制
+        if not self._check_rate_limit(tool_name):
+            error_msg = f"工具 '{tool_name}' 达到速率限制"
+            logger.error(f"⚠️ {error_msg}")
+            raise ValueError(error_msg)
+        
+        # 验证参数
+        logger.info(f"📋 验证工具参数...")
+        parameters = self._validate_parameters(tool, parameters)
+        
+        # 检查熔断器，依赖故障时快速失败而不是等待超时
+        breaker = self.circuit_breakers[tool_name]
+        if not breaker.allow_request():
+            retry_after = breaker.get_stats()["retry_after"]
+            error_msg = f"工具 '{tool_name}' 已熔断，约 {retry_after:.0f} 秒后重试"
+            logger.error(f"⚡ {error_msg}")
+            raise CircuitOpenError(error_msg)
+        
+        return tool, parameters, breaker
+    
+    async def stream_tool(
+        self,
+        tool_name: str,
+        parameters: Dict[str, Any],
+        deadline: Optional[float] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        流式执行指定工具，逐块产出工具的 stream() 结果
+        
+        与 execute_tool 共用执行前检查和熔断统计；已产出的数据无法撤回，因此不做重试。
+        每个数据块的等待时间受策略超时和调用方截止时间约束，出错时产出
+        {"type": "error"} 数据块后结束。
+        
+        Args:
+            tool_name: 工具名称
+            parameters: 工具参数
+            deadline: 调用方的绝对截止时间（time.monotonic()）
+        """
+        start_time = time.time()
+        logger.info(f"🔧 MCP工具流式调用开始: {tool_name}, 参数: {parameters}")
+        
+        try:
+            tool, parameters, breaker = await self._prepare_call(tool_name, parameters)
+        except Exception as e:
+            logger.error(f"❌ MCP工具流式调用失败: {tool_name}, 错误: {e}")
+            yield {"type": "error", "tool_name": tool_name, "error": str(e)}
+            return
+        
+        call_start = time.monotonic()
+        chunks = tool.stream(**parameters)
+        completed = False
+        last_chunk = None
+        try:
+            while True:
+                chunk_timeout = tool.policy.timeout
+                if deadline is not None:
+                    chunk_timeout = min(chunk_timeout, deadline - time.monotonic())
+                    if chunk_timeout <= 0:
+                        raise asyncio.TimeoutError(f"工具 '{tool_name}' 流式执行超出请求截止时间")
+                
+                token = set_current_deadline(time.monotonic() + chunk_timeout)
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=chunk_timeout)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    reset_current_deadline(token)
+                last_chunk = chunk
+                yield chunk
+            completed = True
+        except asyncio.TimeoutError as e:
+            breaker.record_failure(time.monotonic() - call_start)
+            completed = True
+            error_msg = str(e) or f"工具 '{tool_name}' 流式执行超时"
+            logger.error(f"❌ MCP工具流式调用失败: {tool_name}, 错误: {error_msg}")
+            yield {"type": "error", "tool_name": tool_name, "error": error_msg}
+            return
+        except Exception as e:
+            breaker.record_failure(time.monotonic() - call_start)
+            completed = True
+            logger.error(f"❌ MCP工具流式调用失败: {tool_name}, 错误: {e}")
+            yield {"type": "error", "tool_name": tool_name, "error": str(e)}
+            return
+        finally:
+            if not completed:
+                # 调用方提前停止消费（如客户端断开）
+                breaker.record_cancelled()
+            await chunks.aclose()
+        
+        # 工具以 {"type": "error"} 数据块结束时视为失败
+        if isinstance(last_chunk, dict) and last_chunk.get("type") == "error":
+            breaker.record_failure(time.monotonic() - call_start)
+            logger.warning(f"MCP工具流式调用以错误结束: {tool_name}, 错误: {last_chunk.get('error')}")
+            return
+        breaker.record_success(time.monotonic() - call_start)
+        self._update_execution_stats(tool_name)
+        logger.info(f"✅ MCP工具流式调用完成: {tool_name}, 耗时: {time.time() - start_time:.2f}秒")
+    
+    async def run_background_call(self, tool_name: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        在工具的熔断器和执行统计下执行一次后台上游调用（如天气预取）
+        
+        不做参数校验和重试；熔断时抛出 CircuitOpenError，调用失败时记录后原样抛出。
+        """
+        breaker = self.circuit_breakers[tool_name]
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"工具 '{tool_name}' 已熔断")
+        
+        call_start = time.monotonic()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+        except Exception:
+            breaker.record_failure(time.monotonic() - call_start)
+            raise
+        breaker.record_success(time.monotonic() - call_start)
+        self._update_execution_stats(tool_name)
+        return result
+    
+    async def _execute_with_policy(
+        self,
+        tool: BaseMCPTool,
+        parameters: Dict[str, Any],
+        deadline: Optional[float]
+    ) -> tuple:
+        """
+        按工具的执行策略执行：单次超时、临时错误重试与指数退避
+        
+        每次尝试的超时取策略超时与调用方剩余预算中的较小值；超时后
+        asyncio.wait_for 会取消工具任务，取消随之传递到底层HTTP连接。
+        
+        Returns:
+            (执行结果, 尝试次数)
+        """
+        policy = tool.policy
+        attempt = 0
+        
+        while True:
+            attempt_timeout = policy.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError(f"工具 '{tool.name}' 执行前已超出请求截止时间")
+                attempt_timeout = min(attempt_timeout, remaining)
+            
+            token = set_current_deadline(time.monotonic() + attempt_timeout)
+            try:
+                result = await asyncio.wait_for(tool.execute(**parameters), timeout=attempt_timeout)
+                return result, attempt + 1
+            except TRANSIENT_ERRORS as e:
+                delay = policy.backoff_delay(attempt)
+                out_of_budget = (
+                    deadline is not None
+                    and deadline - time.monotonic() - delay < policy.min_attempt_time
+                )
+                if attempt >= policy.max_retries or out_of_budget:
+                    if isinstance(e, asyncio.TimeoutError) and not str(e):
+                        raise asyncio.TimeoutError(
+                            f"工具 '{tool.name}' 执行超时（{attempt_timeout:.1f}秒）"
+                        ) from e
+                    raise
+                
+                logger.warning(
+                    f"🔁 工具 {tool.name} 第 {attempt + 1} 次执行失败: {e!r}，{delay:.2f}秒后重试"
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+            finally:
+                reset_current_deadline(token)
+    
     def _check_rate_limit(self, tool_name: str) -> bool:
         """检查速率限制"""
         tool = self.tools[tool_name]
@@ -231,17 +486,18 @@ class MCPToolManager:
         
         return True
     
-    def _validate_parameters(self, tool: BaseMCPTool, parameters: Dict[str, Any]):
-        """验证工具参数"""
-        schema = tool.get_parameters_schema()
-        required_params = schema.get('required', [])
-        
-        # 检查必需参数
-        for param in required_params:
-            if param not in parameters:
-                raise ValueError(f"缺少必需参数: {param}")
+    def _validate_parameters(self, tool: BaseMCPTool, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """验证工具参数并填充默认值"""
+        compiled_schema = self.compiled_schemas.get(tool.name)
+        if compiled_schema is None:
+            compiled_schema = compile_schema(tool.get_parameters_schema())
+            self.compiled_schemas[tool.name] = compiled_schema
+            # 超过单次超时80%的调用视为慢调用
+            self.circuit_breakers[tool.name] = CircuitBreaker(
+                tool.name, slow_call_duration=tool.policy.timeout * 0.8
+            )
         
-        # 可以添加更多参数验证逻辑
+        return compiled_schema.validate(parameters)
     
     def _update_execution_stats(self, tool_name: str):
         """更新执行统计"""
@@ -258,6 +514,10 @@ class MCPToolManager:
         """获取可用工具列表"""
         tools_info = []
         
+        # 列表需要完整的参数模式，确保所有工具已加载（通常已由后台预热完成）
+        for tool_name in list(self.tool_specs):
+            await self.get_tool(tool_name)
+        
         for tool_name, metadata in self.tool_metadata.items():
             tools_info.append({
                 "name": metadata.name,
@@ -272,25 +532,28 @@ class MCPToolManager:
     
     async def enable_tool(self, tool_name: str):
         """启用工具"""
-        if tool_name in self.tools:
-            self.tools[tool_name].enabled = True
-            self.tool_metadata[tool_name].enabled = True
-            logger.info(f"已启用工具: {tool_name}")
-        else:
-            raise ValueError(f"工具 '{tool_name}' 不存在")
+        self._set_tool_enabled(tool_name, True)
+        logger.info(f"已启用工具: {tool_name}")
     
     async def disable_tool(self, tool_name: str):
         """禁用工具"""
-        if tool_name in self.tools:
-            self.tools[tool_name].enabled = False
-            self.tool_metadata[tool_name].enabled = False
-            logger.info(f"已禁用工具: {tool_name}")
-        else:
+        self._set_tool_enabled(tool_name, False)
+        logger.info(f"已禁用工具: {tool_name}")
+    
+    def _set_tool_enabled(self, tool_name: str, enabled: bool):
+        """设置工具启用状态（未加载的工具只更新注册项）"""
+        if tool_name not in self.tool_specs and tool_name not in self.tools:
             raise ValueError(f"工具 '{tool_name}' 不存在")
+        
+        if tool_name in self.tool_specs:
+            self.tool_specs[tool_name].enabled = enabled
+        if tool_name in self.tools:
+            self.tools[tool_name].enabled = enabled
+            self.tool_metadata[tool_name].enabled = enabled
     
     async def get_tool_status(self, tool_name: str) -> Dict[str, Any]:
         """获取工具状态"""
-        if tool_name not in self.tools:
+        if await self.get_tool(tool_name) is None:
             raise ValueError(f"工具 '{tool_name}' 不存在")
         
         metadata = self.tool_metadata[tool_name]
@@ -301,13 +564,26 @@ class MCPToolManager:
             "enabled": metadata.enabled,
             "execution_count": self.execution_count.get(tool_name, 0),
             "last_execution": self.last_execution.get(tool_name, None),
-            "rate_limit": metadata.rate_limit
+            "rate_limit": metadata.rate_limit,
+            "policy": asdict(self.tools[tool_name].policy),
+            "circuit": self.circuit_breakers[tool_name].get_stats(),
+            "health_score": self.get_health_score(tool_name),
+            "load_time": self.load_times.get(tool_name),
+            "stats": self.tools[tool_name].get_stats() if hasattr(self.tools[tool_name], 'get_stats') else None
         }
     
     async def cleanup(self):
         """清理资源"""
         logger.info("正在清理MCP工具资源...")
         
+        # 停止尚未完成的后台预热
+        if self._warmup_task is not None and not self._warmup_task.done():
+            self._warmup_task.cancel()
+            try:
+                await self._warmup_task
+            except asyncio.CancelledError:
+                pass
+        
         # 清理各个工具的资源
         for tool in self.tools.values():
             if hasattr(tool, 'cleanup'):
@@ -316,24 +592,52 @@ class MCPToolManager:
                 except Exception as e:
                     logger.warning(f"清理工具 {tool.name} 资源失败: {e}")
         
+        # 关闭共享HTTP连接池
+        try:
+            await self.http_pool.close()
+        except Exception as e:
+            logger.warning(f"关闭共享HTTP连接池失败: {e}")
+        
+        # 关闭共享CPU任务池
+        self.cpu_pool.shutdown()
+        
         # 清理管理器状态
         self.tools.clear()
         self.tool_metadata.clear()
+        self.compiled_schemas.clear()
+        self.circuit_breakers.clear()
         self.execution_count.clear()
         self.last_execution.clear()
         
         logger.info("MCP工具资源清理完成")
     
+    def get_health_score(self, tool_name: str) -> float:
+        """获取工具健康评分（0~1），尚未加载的工具视为健康"""
+        breaker = self.circuit_breakers.get(tool_name)
+        return breaker.health_score() if breaker else 1.0
+    
+    def is_circuit_open(self, tool_name: str) -> bool:
+        """工具是否处于熔断状态（半开状态仍允许试探，不算熔断）"""
+        breaker = self.circuit_breakers.get(tool_name)
+        return breaker is not None and breaker.state == CircuitState.OPEN
+    
+    def filter_healthy_tools(self, tool_names: List[str]) -> List[str]:
+        """过滤掉处于熔断状态的工具"""
+        return [name for name in tool_names if not self.is_circuit_open(name)]
+    
     @property
     def available_tools(self) -> List[str]:
         """获取可用工具名称列表"""
-        return [name for name, tool in self.tools.items() if tool.enabled]
+        return [
+            name for name, spec in self.tool_specs.items()
+            if (self.tools[name].enabled if name in self.tools else spec.enabled)
+        ]
     
     def get_tools_by_category(self, category: str) -> List[str]:
         """按类别获取工具"""
         return [
-            name for name, metadata in self.tool_metadata.items()
-            if metadata.category == category and metadata.enabled
+            name for name, spec in self.tool_specs.items()
+            if spec.category == category and name in self.available_tools
         ]
     
     def get_execution_stats(self) -> Dict[str, Any]:
@@ -341,13 +645,21 @@ class MCPToolManager:
         total_executions = sum(self.execution_count.values())
         
         return {
-            "total_tools": len(self.tools),
+            "total_tools": len(self.tool_specs),
+            "loaded_tools": len(self.tools),
             "enabled_tools": len(self.available_tools),
+            "startup": {
+                "registry_time": self.startup_time,
+                "tool_load_times": dict(self.load_times)
+            },
             "total_executions": total_executions,
+            "http_pool": self.http_pool.get_stats(),
+            "cpu_pool": self.cpu_pool.get_stats(),
             "tool_stats": {
                 name: {
                     "executions": count,
-                    "last_execution": self.last_execution.get(name)
+                    "last_execution": self.last_execution.get(name),
+                    "health_score": self.get_health_score(name)
                 }
                 for name, count in self.execution_count.items()
             }
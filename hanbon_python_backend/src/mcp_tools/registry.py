@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: registry.py
+@description: MCP工具注册表（按需导入与实例化）
+@author: AI Assistant
+@created: 2024
+"""
+
+import importlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Type
+
+from .base_tool import BaseMCPTool
+
+
+@dataclass
+class ToolSpec:
+    """
+    工具注册项
+
+    只记录工具的入口（"模块:类名"）和构造参数来源，注册时不导入模块，
+    首次使用或后台预热时才导入并实例化。
+    """
+    name: str
+    entry_point: str                 # 形如 "mcp_tools.tools.amap_tool:AmapTool"
+    description: str
+    category: str = "general"
+    config_env: Dict[str, str] = field(default_factory=dict)  # 构造参数名 -> 环境变量名
+    inject_model_manager: bool = False
+    enabled: bool = True
+
+    def load_class(self) -> Type[BaseMCPTool]:
+        """导入工具模块并返回工具类"""
+        module_path, _, class_name = self.entry_point.partition(':')
+        module = importlib.import_module(module_path)
+        return getattr(module, class_name)
+
+
+_TOOLS_PACKAGE = __name__.rsplit('.', 1)[0] + '.tools'
+
+# 内置工具注册表
+BUILTIN_TOOL_SPECS: List[ToolSpec] = [
+    ToolSpec(
+        name="amap_search",
+        entry_point=f"{_TOOLS_PACKAGE}.amap_tool:AmapTool",
+        description="高德地图搜索工具，用于查找餐厅、美食地点等",
+        category="location",
+        config_env={"api_key": "AMAP_API_KEY", "ip_range_db": "IP_RANGE_DB_PATH"}
+    ),
+    ToolSpec(
+        name="bing_search",
+        entry_point=f"{_TOOLS_PACKAGE}.bing_search_tool:BingSearchTool",
+        description="必应搜索工具，用于获取最新的网络信息",
+        category="search",
+        config_env={
+            "api_key": "BING_API_KEY",
+            "cache_path": "BING_SEARCH_CACHE_PATH",
+            "cache_ttl": "BING_SEARCH_CACHE_TTL",
+            "monthly_quota": "BING_SEARCH_MONTHLY_QUOTA",
+            "max_concurrency": "BING_SEARCH_MAX_CONCURRENCY"
+        }
+    ),
+    ToolSpec(
+        name="weather_api",
+        entry_point=f"{_TOOLS_PACKAGE}.weather_tool:WeatherTool",
+        description="天气API工具，用于获取天气信息和基于天气的美食推荐",
+        category="weather",
+        config_env={"api_key": "OPENWEATHER_API_KEY"}
+    ),
+    ToolSpec(
+        name="food_recommendation",
+        entry_point=f"{_TOOLS_PACKAGE}.food_recommendation_tool:FoodRecommendationTool",
+        description="智能美食推荐工具，基于用户偏好推荐美食",
+        category="recommendation",
+        config_env={"knowledge_base": "FOOD_KB_PATH", "ranking_variants": "FOOD_RANKING_VARIANTS"}
+    ),
+    ToolSpec(
+        name="similar_dishes",
+        entry_point=f"{_TOOLS_PACKAGE}.similar_dishes_tool:SimilarDishesTool",
+        description="相似菜品检索工具，查找与指定菜品口味、食材相近的菜",
+        category="recommendation",
+        config_env={
+            "embeddings_path": "DISH_EMBEDDINGS_PATH",
+            "embedding_model": "DISH_EMBEDDING_MODEL",
+            "knowledge_base": "FOOD_KB_PATH"
+        }
+    ),
+    ToolSpec(
+        name="image_search",
+        entry_point=f"{_TOOLS_PACKAGE}.image_search_tool:ImageSearchTool",
+        description="Bing图片搜索工具，用于搜索美食相关图片（基于爬虫技术）",
+        category="search",
+        config_env={
+            "validate_images": "IMAGE_SEARCH_VALIDATE",
+            "validate_concurrency": "IMAGE_SEARCH_VALIDATE_CONCURRENCY",
+            "validate_timeout": "IMAGE_SEARCH_VALIDATE_TIMEOUT"
+        }
+    ),
+    ToolSpec(
+        name="recipe_generator",
+        entry_point=f"{_TOOLS_PACKAGE}.recipe_generator_tool:RecipeGeneratorTool",
+        description="AI菜谱生成工具，使用用户选择的默认模型生成详细的烹饪菜谱",
+        category="food",
+        inject_model_manager=True
+    ),
+]
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: schema_validator.py
+@description: 工具参数模式编译与校验
+@author: AI Assistant
+@created: 2024
+"""
+
+import copy
+import logging
+import re
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+# 单个字段的校验函数：输入原始值和字段路径，返回（可能经过转换的）值
+FieldChecker = Callable[[Any, str], Any]
+
+_MISSING = object()
+# 枚举字段的值不在可选范围内：丢弃该值（按未传处理），不让整个调用失败
+_INVALID = object()
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledSchema:
+    """
+    编译后的参数模式
+
+    在工具注册时编译一次，执行时直接复用字段校验函数，
+    不再每次调用 get_parameters_schema() 重新构建模式字典。
+
+    模型规划的参数里，枚举字段经常出现近义的自由文本（如 mood='难过'）：
+    可选字段的值不在枚举范围内时记录警告并丢弃该值（有默认值时使用默认值），
+    数组中不在范围内的元素被过滤；只有必需字段取值不合法时才报错。
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.schema = schema
+        self.required: Tuple[str, ...] = tuple(schema.get('required', []))
+        self._fields: List[Tuple[str, FieldChecker, Any]] = []
+
+        for name, prop in schema.get('properties', {}).items():
+            default = copy.deepcopy(prop['default']) if 'default' in prop else _MISSING
+            self._fields.append((name, _compile_property(prop), default))
+
+    def validate(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        校验参数并填充默认值
+
+        Args:
+            parameters: 原始参数
+
+        Returns:
+            校验后的新参数字典（未在模式中声明的参数原样保留）
+
+        Raises:
+            ValueError: 参数缺失或不合法
+        """
+        parameters = parameters or {}
+
+        for param in self.required:
+            if parameters.get(param) is None:
+                raise ValueError(f"缺少必需参数: {param}")
+
+        validated = dict(parameters)
+        for name, checker, default in self._fields:
+            value = parameters.get(name)
+            if value is None:
+                if default is _MISSING:
+                    validated.pop(name, None)
+                else:
+                    validated[name] = copy.deepcopy(default)
+                continue
+            checked = checker(value, name)
+            if checked is _INVALID:
+                if name in self.required:
+                    raise ValueError(f"参数 {name} 的值 {value!r} 不在可选范围内")
+                if default is _MISSING:
+                    validated.pop(name, None)
+                else:
+                    validated[name] = copy.deepcopy(default)
+                continue
+            validated[name] = checked
+
+        return validated
+
+
+def compile_schema(schema: Dict[str, Any]) -> CompiledSchema:
+    """编译工具参数模式"""
+    return CompiledSchema(schema or {})
+
+
+def _compile_property(prop: Dict[str, Any]) -> FieldChecker:
+    """将单个字段的模式编译为校验函数"""
+    checks: List[FieldChecker] = []
+
+    type_checker = _TYPE_CHECKERS.get(prop.get('type'))
+    if type_checker:
+        checks.append(type_checker)
+
+    if 'enum' in prop:
+        allowed = frozenset(prop['enum'])
+
+        def check_enum(value, path):
+            if value not in allowed:
+                logger.warning(f"参数 {path} 的值 {value!r} 不在可选范围内 {list(prop['enum'])}，已忽略")
+                return _INVALID
+            return value
+
+        checks.append(check_enum)
+
+    minimum = prop.get('minimum')
+    maximum = prop.get('maximum')
+    if minimum is not None or maximum is not None:
+        def check_range(value, path):
+            if minimum is not None and value < minimum:
+                raise ValueError(f"参数 {path} 不能小于 {minimum}")
+            if maximum is not None and value > maximum:
+                raise ValueError(f"参数 {path} 不能大于 {maximum}")
+            return value
+
+        checks.append(check_range)
+
+    min_length = prop.get('minLength')
+    max_length = prop.get('maxLength')
+    if min_length is not None or max_length is not None:
+        def check_length(value, path):
+            if min_length is not None and len(value) < min_length:
+                raise ValueError(f"参数 {path} 长度不能小于 {min_length}")
+            if max_length is not None and len(value) > max_length:
+                raise ValueError(f"参数 {path} 长度不能大于 {max_length}")
+            return value
+
+        checks.append(check_length)
+
+    if 'pattern' in prop:
+        regex = re.compile(prop['pattern'])
+
+        def check_pattern(value, path):
+            if not regex.search(value):
+                raise ValueError(f"参数 {path} 格式不正确: {value!r}")
+            return value
+
+        checks.append(check_pattern)
+
+    if prop.get('type') == 'array' and 'items' in prop:
+        item_checker = _compile_property(prop['items'])
+
+        def check_items(value, path):
+            items = (item_checker(item, f"{path}[{i}]") for i, item in enumerate(value))
+            return [item for item in items if item is not _INVALID]
+
+        checks.append(check_items)
+
+    if prop.get('type') == 'object' and 'properties' in prop:
+        nested = CompiledSchema(prop)
+
+        def check_object(value, path):
+            try:
+                return nested.validate(value)
+            except ValueError as e:
+                raise ValueError(f"参数 {path} 不合法: {e}")
+
+        checks.append(check_object)
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value, path):
+        for check in checks:
+            value = check(value, path)
+            if value is _INVALID:
+                break
+        return value
+
+    return check_all
+
+
+def _check_string(value, path):
+    if isinstance(value, str):
+        return value
+    # 数字可以无损转换为字符串（如 radius=3000）
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise ValueError(f"参数 {path} 应为字符串，实际为 {type(value).__name__}")
+
+
+def _check_integer(value, path):
+    if isinstance(value, bool):
+        raise ValueError(f"参数 {path} 应为整数，实际为 bool")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+    raise ValueError(f"参数 {path} 应为整数，实际为 {value!r}")
+
+
+def _check_number(value, path):
+    if isinstance(value, bool):
+        raise ValueError(f"参数 {path} 应为数字，实际为 bool")
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    raise ValueError(f"参数 {path} 应为数字，实际为 {value!r}")
+
+
+def _check_boolean(value, path):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ('true', 'false'):
+        return value.lower() == 'true'
+    raise ValueError(f"参数 {path} 应为布尔值，实际为 {value!r}")
+
+
+def _check_array(value, path):
+    if isinstance(value, list):
+        return value
+    if isinstance(value, tuple):
+        return list(value)
+    # 模型经常把单个值直接传进来，包装成列表
+    if isinstance(value, (str, int, float)):
+        return [value]
+    raise ValueError(f"参数 {path} 应为数组，实际为 {type(value).__name__}")
+
+
+def _check_object(value, path):
+    if isinstance(value, dict):
+        return value
+    raise ValueError(f"参数 {path} 应为对象，实际为 {type(value).__name__}")
+
+
+_TYPE_CHECKERS: Dict[Optional[str], FieldChecker] = {
+    'string': _check_string,
+    'integer': _check_integer,
+    'number': _check_number,
+    'boolean': _check_boolean,
+    'array': _check_array,
+    'object': _check_object,
+}
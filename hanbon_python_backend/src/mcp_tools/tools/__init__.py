@@ -7,18 +7,31 @@
 @created: 2024
 """
 
-from .amap_tool import AmapTool
-from .bing_search_tool import BingSearchTool
-from .weather_tool import WeatherTool
-from .food_recommendation_tool import FoodRecommendationTool
-from .image_search_tool import ImageSearchTool
-from .recipe_generator_tool import RecipeGeneratorTool
+import importlib
+
+# 工具类按需导入：访问 tools.AmapTool 等属性时才加载对应模块
+_TOOL_MODULES = {
+    'AmapTool': '.amap_tool',
+    'BingSearchTool': '.bing_search_tool',
+    'WeatherTool': '.weather_tool',
+    'FoodRecommendationTool': '.food_recommendation_tool',
+    'SimilarDishesTool': '.similar_dishes_tool',
+    'ImageSearchTool': '.image_search_tool',
+    'RecipeGeneratorTool': '.recipe_generator_tool'
+}
+
+def __getattr__(name):
+    if name in _TOOL_MODULES:
+        module = importlib.import_module(_TOOL_MODULES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 __all__ = [
     'AmapTool',
     'BingSearchTool', 
     'WeatherTool',
     'FoodRecommendationTool',
+    'SimilarDishesTool',
     'ImageSearchTool',
     'RecipeGeneratorTool'
 ] 
\ No newline at end of file
@@ -7,22 +7,88 @@
 @created: 2024
 """
 
-import aiohttp
+import asyncio
+import base64
+import json
 import logging
-from typing import Dict, Any, List, Optional
+import math
+from typing import Dict, Any, List, Optional, AsyncGenerator
 from ..base_tool import BaseMCPTool
+from ..execution_policy import (
+    ExecutionPolicy, TransientToolError, TRANSIENT_ERRORS, set_current_deadline, reset_current_deadline
+)
+from .poi_index import PoiIndex
+from .poi_ranking import rank_pois
+from .ip_location_cache import IPLocationCache, is_unroutable
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 25      # 高德单页最多返回25条
+MAX_PAGES_PER_CALL = 5
+
+# 游标中保存的查询条件
+_CURSOR_FIELDS = ('keyword', 'location', 'city', 'radius', 'type', 'page_size')
+# 游标中保存的排序条件，使后续页与首页排序方式一致（旧游标中没有时沿用本次参数）
+_CURSOR_RANKING_FIELDS = ('sort_by', 'preferences', 'top_k')
+
+
+def encode_page_cursor(query: Dict[str, Any], page: int) -> str:
+    """将查询条件和下一页页码编码为不透明游标"""
+    payload = {field: query.get(field) for field in _CURSOR_FIELDS + _CURSOR_RANKING_FIELDS}
+    payload['page'] = page
+    raw = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_page_cursor(cursor: str) -> Dict[str, Any]:
+    """解析游标，格式无效时抛出 ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        query = {field: payload[field] for field in _CURSOR_FIELDS}
+        query.update({field: payload[field] for field in _CURSOR_RANKING_FIELDS if field in payload})
+        query['page'] = int(payload['page'])
+        query['page_size'] = min(int(query['page_size']), MAX_PAGE_SIZE)
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+    if query['page'] < 1:
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return query
+
+
 class AmapTool(BaseMCPTool):
     """高德地图搜索工具"""
     
+    execution_policy = ExecutionPolicy(timeout=8.0, max_retries=2)
+    
     def __init__(self, name: str, description: str, api_key: str, **config):
         super().__init__(name, description, **config)
         self.api_key = api_key
         self.base_url = "https://restapi.amap.com/v3"
         self.category = "location"
         
+        # 本地POI索引，由历史搜索结果构建；poi_index=False 时关闭
+        self.poi_index: Optional[PoiIndex] = None
+        if config.get('poi_index', True):
+            self.poi_index = PoiIndex(
+                refresh_after=config.get('poi_refresh_after', 6 * 3600),
+                max_age=config.get('poi_max_age', 24 * 3600),
+                max_pois=config.get('poi_max_entries', 50000)
+            )
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        
+        # 多页搜索时同时进行的请求数上限
+        self.page_concurrency = config.get('page_concurrency', 3)
+        
+        # IP定位缓存，可选加载本地IP段数据库（CSV）实现离线定位
+        self.ip_cache = IPLocationCache(
+            ttl=config.get('ip_cache_ttl', 24 * 3600),
+            negative_ttl=config.get('ip_negative_ttl', 3600),
+            range_db_path=config.get('ip_range_db') or None
+        )
+        
     async def execute(self, **parameters) -> Dict[str, Any]:
         """
         执行高德地图搜索
@@ -33,54 +99,324 @@ class AmapTool(BaseMCPTool):
             city: 城市名称
             radius: 搜索半径(米)
             type: POI类型
+            page: 起始页码
+            page_size: 每页数量
+            pages: 本次连续获取的页数（并发请求）
+            cursor: 上一次结果返回的 next_cursor，用于继续翻页
+            sort_by: 排序方式，"score" 时按距离/评分/价格/偏好综合排序
+            preferences: 用户偏好（如 spicy_preference），用于综合排序
+            top_k: 只返回排序后的前k个结果
         """
         try:
-            keyword = parameters.get('keyword', '')
-            location = parameters.get('location', '')
-            city = parameters.get('city', '长沙')
-            radius = parameters.get('radius', '5000')
-            poi_type = parameters.get('type', '')
-            
-            # 构建搜索参数
-            search_params = {
-                'key': self.api_key,
-                'keywords': keyword,
-                'city': city,
-                'output': 'json',
-                'offset': '20',  # 返回20个结果
-                'page': '1',
-                'extensions': 'all'  # 返回详细信息
-            }
-            
-            # 如果有坐标，进行周边搜索
-            if location:
-                search_params['location'] = location
-                search_params['radius'] = radius
-                endpoint = f"{self.base_url}/place/around"
-            else:
-                # 关键词搜索
-                endpoint = f"{self.base_url}/place/text"
+            query = self._resolve_query(parameters)
+            endpoint, search_params = self._build_search_request(query)
             
-            # 如果指定了POI类型
-            if poi_type:
-                search_params['types'] = poi_type
+            # 本地POI索引能完整覆盖本次查询时直接返回（仅限从默认首页开始的查询）
+            if self._is_default_page(query):
+                local_result = self._search_local_index(
+                    query, endpoint, search_params, complete=query['pages'] > 1
+                )
+                if local_result is not None:
+                    return local_result
             
-            # 发送请求
-            async with aiohttp.ClientSession() as session:
-                async with session.get(endpoint, params=search_params) as response:
-                    if response.status == 200:
-                        data = await response.json()
+            pois = []
+            first_data = None
+            total_count = 0
+            last_page = query['page'] - 1
+            async for page, data in self._iter_pages(endpoint, search_params, query):
+                if first_data is None:
+                    first_data = data
+                    if data.get('status') != '1':
                         return self._parse_search_results(data)
-                    else:
-                        raise Exception(f"API请求失败: {response.status}")
-                        
+                    total_count = self._total_count(data)
+                    if self._is_default_page(query):
+                        self._update_local_index(query, data)
+                elif data.get('status') != '1':
+                    break
+                pois.extend(data.get('pois') or [])
+                last_page = page
+            
+            result = self._build_ranked_result(
+                pois, first_data.get('suggestion', {}) if first_data else {}, query
+            )
+            result["pagination"] = self._build_pagination(query, last_page, total_count)
+            return result
+                    
+        except TRANSIENT_ERRORS:
+            # 网络类临时错误交给MCPToolManager按策略重试
+            raise
         except Exception as e:
             logger.error(f"高德地图搜索失败: {e}")
             return {
+                "success": False,
                 "error": str(e),
                 "results": []
             }
 
+    async def stream(self, **parameters) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        流式分页搜索：逐个产出解析后的POI，最后产出与 execute 格式一致的完整结果
+        
+        参数同 execute。产出的数据块：
+            {"type": "poi", "page": 页码, "location": POI}
+            {"type": "result", "result": {... "pagination": {...}}}
+            {"type": "error", "error": 错误信息}
+        """
+        try:
+            query = self._resolve_query(parameters)
+        except ValueError as e:
+            yield {"type": "error", "error": str(e)}
+            return
+        endpoint, search_params = self._build_search_request(query)
+        
+        # 本地POI索引包含完整结果时直接产出，不请求线上
+        if self._is_default_page(query):
+            local_result = self._search_local_index(query, endpoint, search_params, complete=True)
+            if local_result is not None:
+                for location_item in local_result["display_data"]["locations"]:
+                    yield {"type": "poi", "page": query['page'], "location": location_item}
+                yield {"type": "result", "result": local_result}
+                return
+        
+        pois = []
+        suggestion = {}
+        total_count = 0
+        last_page = query['page'] - 1
+        async for page, data in self._iter_pages(endpoint, search_params, query):
+            if data.get('status') != '1':
+                if page == query['page']:
+                    yield {"type": "error", "error": data.get('info', '未知错误')}
+                    return
+                break
+            if page == query['page']:
+                total_count = self._total_count(data)
+                suggestion = data.get('suggestion', {})
+                if self._is_default_page(query):
+                    self._update_local_index(query, data)
+            for poi in data.get('pois') or []:
+                location_item = self._parse_poi(poi)
+                if location_item is not None:
+                    pois.append(poi)
+                    yield {"type": "poi", "page": page, "location": location_item}
+            last_page = page
+        
+        # 逐条产出的POI按到达顺序展示，完整结果再按需排序
+        result = self._build_ranked_result(pois, suggestion, query)
+        result["pagination"] = self._build_pagination(query, last_page, total_count)
+        yield {"type": "result", "result": result}
+
+    def _resolve_query(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        """整理查询参数；带游标时以游标中的查询条件和页码为准"""
+        query = {
+            'keyword': parameters.get('keyword', ''),
+            'location': parameters.get('location', ''),
+            'city': parameters.get('city', '长沙'),
+            'radius': parameters.get('radius', '5000'),
+            'type': parameters.get('type', ''),
+            'page': int(parameters.get('page') or 1),
+            'page_size': min(int(parameters.get('page_size') or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE),
+            'sort_by': parameters.get('sort_by') or 'default',
+            'preferences': parameters.get('preferences') or {},
+            'top_k': parameters.get('top_k')
+        }
+        cursor = parameters.get('cursor')
+        if cursor:
+            query.update(decode_page_cursor(cursor))
+        query['pages'] = max(1, min(int(parameters.get('pages') or 1), MAX_PAGES_PER_CALL))
+        return query
+
+    def _build_search_request(self, query: Dict[str, Any]) -> tuple:
+        """构建搜索接口地址和请求参数（不含页码）"""
+        search_params = {
+            'key': self.api_key,
+            'keywords': query['keyword'],
+            'city': query['city'],
+            'output': 'json',
+            'offset': str(query['page_size']),
+            'extensions': 'all'  # 返回详细信息
+        }
+        
+        # 如果有坐标，进行周边搜索
+        if query['location']:
+            search_params['location'] = query['location']
+            search_params['radius'] = query['radius']
+            endpoint = f"{self.base_url}/place/around"
+        else:
+            # 关键词搜索
+            endpoint = f"{self.base_url}/place/text"
+        
+        # 如果指定了POI类型
+        if query['type']:
+            search_params['types'] = query['type']
+        
+        return endpoint, search_params
+
+    def _is_default_page(self, query: Dict[str, Any]) -> bool:
+        """是否为从默认首页开始的查询（本地POI索引只记录默认每页数量下的首页）"""
+        return query['page'] == 1 and query['page_size'] == DEFAULT_PAGE_SIZE
+
+    async def _iter_pages(
+        self,
+        endpoint: str,
+        search_params: Dict[str, Any],
+        query: Dict[str, Any]
+    ) -> AsyncGenerator[tuple, None]:
+        """
+        按页码顺序产出 (页码, 原始响应)
+        
+        先请求起始页得到结果总数，再以 page_concurrency 为上限并发请求其余页；
+        后续页按完成顺序到达，但按页码顺序产出。提前退出时取消未完成的请求。
+        """
+        first_page = query['page']
+        first = await self._fetch_search(endpoint, {**search_params, 'page': str(first_page)})
+        yield first_page, first
+        
+        if first.get('status') != '1' or query['pages'] == 1:
+            return
+        
+        total_pages = math.ceil(self._total_count(first) / query['page_size'])
+        last_page = min(first_page + query['pages'] - 1, total_pages)
+        if last_page <= first_page:
+            return
+        
+        semaphore = asyncio.Semaphore(self.page_concurrency)
+        
+        async def fetch(page: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._fetch_search(endpoint, {**search_params, 'page': str(page)})
+        
+        tasks = [asyncio.create_task(fetch(page)) for page in range(first_page + 1, last_page + 1)]
+        try:
+            for page, task in zip(range(first_page + 1, last_page + 1), tasks):
+                yield page, await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _total_count(data: Dict[str, Any]) -> int:
+        try:
+            return int(data.get('count') or 0)
+        except (TypeError, ValueError):
+            return 0
+
+    def _build_pagination(self, query: Dict[str, Any], last_page: int, total_count: int) -> Dict[str, Any]:
+        """构建分页信息，还有更多结果时附带继续翻页的游标"""
+        has_more = last_page * query['page_size'] < total_count
+        return {
+            "page": query['page'],
+            "last_page": last_page,
+            "page_size": query['page_size'],
+            "total_count": total_count,
+            "has_more": has_more,
+            "next_cursor": encode_page_cursor(query, last_page + 1) if has_more else None
+        }
+
+    async def _fetch_search(self, endpoint: str, search_params: Dict[str, Any]) -> Dict[str, Any]:
+        """请求高德POI搜索接口，返回原始响应"""
+        session = self.get_http_session()
+        async with session.get(endpoint, params=search_params, timeout=self.client_timeout()) as response:
+            if response.status == 200:
+                return await response.json()
+            elif response.status >= 500:
+                raise TransientToolError(f"API请求失败: {response.status}")
+            else:
+                raise Exception(f"API请求失败: {response.status}")
+
+    def _search_local_index(
+        self,
+        query: Dict[str, Any],
+        endpoint: str,
+        search_params: Dict[str, Any],
+        complete: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        从本地POI索引回答查询，无法完整覆盖时返回None
+        
+        complete 为 True 时（多页或流式查询）只在索引包含全部结果（线上没有下一页）时回答，
+        并附带 has_more 为 False 的分页信息。
+        """
+        if self.poi_index is None:
+            return None
+
+        try:
+            if query['location']:
+                lng, lat = (float(v) for v in query['location'].split(',')[:2])
+                hit = self.poi_index.search_around(
+                    query['keyword'], query['type'], lng, lat, float(query['radius']),
+                    limit=query['page_size'] * query['pages']
+                )
+            else:
+                hit = self.poi_index.search_text(
+                    query['city'], query['keyword'], query['type'], complete=complete
+                )
+        except ValueError:
+            return None
+
+        if hit is None:
+            return None
+
+        pois, needs_refresh = hit
+        if needs_refresh:
+            self._schedule_refresh(query, endpoint, search_params)
+
+        logger.info(f"🗺️ 本地POI索引命中: {query['keyword']} ({len(pois)} 个结果)")
+        result = self._build_ranked_result(pois, {}, query)
+        result["source"] = "local_index"
+        if complete:
+            result["pagination"] = self._build_pagination(query, query['page'], len(pois))
+        return result
+
+    def _update_local_index(self, query: Dict[str, Any], data: Dict[str, Any]):
+        """用线上响应更新本地POI索引"""
+        if self.poi_index is None or data.get('status') != '1':
+            return
+
+        pois = data.get('pois') or []
+        try:
+            if query['location']:
+                lng, lat = (float(v) for v in query['location'].split(',')[:2])
+                self.poi_index.record_around_query(
+                    query['keyword'], query['type'], lng, lat, float(query['radius']), pois
+                )
+            else:
+                self.poi_index.record_text_query(query['city'], query['keyword'], query['type'], pois)
+        except ValueError as e:
+            logger.warning(f"更新本地POI索引失败: {e}")
+
+    def _schedule_refresh(self, query: Dict[str, Any], endpoint: str, search_params: Dict[str, Any]):
+        """索引结果偏旧时在后台重新请求线上数据（同一查询只刷新一次）"""
+        refresh_key = (query['keyword'], query['location'], query['city'], query['radius'], query['type'])
+        if refresh_key in self._refreshing:
+            return
+        self._refreshing.add(refresh_key)
+
+        async def refresh():
+            # 后台刷新不受触发它的那次请求的截止时间约束
+            token = set_current_deadline(None)
+            try:
+                data = await self._fetch_search(endpoint, {**search_params, 'page': '1'})
+                self._update_local_index(query, data)
+                logger.info(f"🔄 本地POI索引已刷新: {query['keyword']}")
+            except Exception as e:
+                logger.warning(f"后台刷新POI索引失败: {e}")
+            finally:
+                reset_current_deadline(token)
+                self._refreshing.discard(refresh_key)
+
+        task = asyncio.create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def cleanup(self):
+        """取消未完成的后台刷新并释放资源"""
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        if self._refresh_tasks:
+            await asyncio.gather(*self._refresh_tasks, return_exceptions=True)
+        await super().cleanup()
+
     async def get_location_by_ip(self, ip_address: Optional[str] = None) -> Dict[str, Any]:
         """
         通过IP地址获取位置信息
@@ -94,6 +430,12 @@ class AmapTool(BaseMCPTool):
         try:
             logger.info(f"开始IP定位，IP地址: {ip_address or '自动检测'}")
             
+            # 先查本地：内网地址、网段缓存、IP段数据库
+            if ip_address:
+                local_result = self._lookup_ip_location_locally(ip_address)
+                if local_result is not None:
+                    return local_result
+            
             # 构建IP定位请求参数
             params = {
                 'key': self.api_key,
@@ -107,14 +449,18 @@ class AmapTool(BaseMCPTool):
             endpoint = f"{self.base_url}/ip"
             
             # 发送请求
-            async with aiohttp.ClientSession() as session:
-                async with session.get(endpoint, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._parse_ip_location_result(data)
-                    else:
-                        raise Exception(f"IP定位请求失败: {response.status}")
-                        
+            session = self.get_http_session()
+            async with session.get(endpoint, params=params, timeout=self.client_timeout()) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    result = self._parse_ip_location_result(data)
+                    # 只缓存上游正常应答（无法定位的IP做负缓存），接口级错误不缓存
+                    if ip_address and data.get('status') == '1':
+                        self._cache_ip_location(ip_address, result)
+                    return result
+                else:
+                    raise Exception(f"IP定位请求失败: {response.status}")
+                    
         except Exception as e:
             logger.error(f"IP定位失败: {e}")
             return {
@@ -123,6 +469,39 @@ class AmapTool(BaseMCPTool):
                 "message": "IP定位失败"
             }
 
+    def _lookup_ip_location_locally(self, ip_address: str) -> Optional[Dict[str, Any]]:
+        """不请求上游的IP定位，无法本地回答时返回None"""
+        try:
+            if is_unroutable(ip_address):
+                return {
+                    "success": False,
+                    "error": f"{ip_address} 为内网或保留地址，无法定位",
+                    "message": "IP定位失败",
+                    "source": "local"
+                }
+            
+            cached = self.ip_cache.get(ip_address)
+            if cached is not None:
+                logger.info(f"IP定位缓存命中: {ip_address}")
+                return {**cached, "source": "cache"}
+            
+            location = self.ip_cache.lookup_range_db(ip_address)
+            if location is not None:
+                logger.info(f"IP段数据库命中: {ip_address}")
+                result = self._parse_ip_location_result({"status": "1", **location})
+                return {**result, "source": "range_db"}
+        except ValueError:
+            # 无效IP交给上游处理
+            pass
+        return None
+    
+    def _cache_ip_location(self, ip_address: str, result: Dict[str, Any]):
+        """缓存上游IP定位结果"""
+        try:
+            self.ip_cache.put(ip_address, result)
+        except ValueError:
+            pass
+    
     def _parse_ip_location_result(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """解析IP定位结果"""
         try:
@@ -180,6 +559,33 @@ class AmapTool(BaseMCPTool):
                 "message": "解析IP定位结果失败"
             }
     
+    def _build_ranked_result(
+        self,
+        pois: List[Dict[str, Any]],
+        suggestion: Dict[str, Any],
+        query: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """解析POI列表，sort_by 为 "score" 时按综合得分排序并附带得分"""
+        top_k = query.get('top_k')
+        if query.get('sort_by') != 'score':
+            locations = [item for item in map(self._parse_poi, pois) if item is not None]
+            return self._build_location_result(locations[:top_k] if top_k else locations, suggestion)
+
+        max_distance = None
+        if query.get('location'):
+            try:
+                max_distance = float(query['radius'])
+            except (TypeError, ValueError):
+                pass
+
+        locations = []
+        for poi, score in rank_pois(pois, query.get('preferences'), top_k, max_distance):
+            location_item = self._parse_poi(poi)
+            if location_item is not None:
+                location_item["score"] = round(score, 3)
+                locations.append(location_item)
+        return self._build_location_result(locations, suggestion)
+    
     def _parse_search_results(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """解析搜索结果"""
         if data.get('status') != '1':
@@ -190,88 +596,16 @@ class AmapTool(BaseMCPTool):
                 "results": []
             }
         
-        pois = data.get('pois', [])
         locations = []
+        for poi in data.get('pois', []):
+            location_item = self._parse_poi(poi)
+            if location_item is not None:
+                locations.append(location_item)
         
-        for poi in pois:
-            # 解析坐标用于地图链接
-            location_str = poi.get('location', '')
-            logger.info(f"处理POI: {poi.get('name', 'unknown')} - 原始坐标: {location_str}")
-            
-            coordinates = location_str.split(',') if location_str else ['', '']
-            longitude = coordinates[0].strip() if len(coordinates) > 0 else ''
-            latitude = coordinates[1].strip() if len(coordinates) > 1 else ''
-            
-            # 验证坐标格式
-            if not longitude or not latitude:
-                logger.warning(f"POI {poi.get('name', 'unknown')} 坐标信息不完整: {location_str}")
-                continue  # 跳过坐标不完整的POI
-            
-            try:
-                # 验证坐标是否为有效数字
-                lng_float = float(longitude)
-                lat_float = float(latitude)
-                logger.info(f"坐标验证通过: {poi.get('name', 'unknown')} - 经度: {lng_float}, 纬度: {lat_float}")
-            except ValueError:
-                logger.warning(f"POI {poi.get('name', 'unknown')} 坐标格式无效: 经度={longitude}, 纬度={latitude}")
-                continue  # 跳过坐标格式无效的POI
-            
-            # 生成高德地图链接
-            map_url = ""
-            if longitude and latitude:
-                map_url = f"https://uri.amap.com/marker?position={longitude},{latitude}&name={poi.get('name', '')}"
-            
-            # 解析评分
-            rating = self._parse_rating(poi.get('biz_ext', {}))
-            rating_display = f"{rating}" if rating > 0 else "暂无评分"
-            
-            # 解析距离显示
-            distance = poi.get('distance', '')
-            distance_display = ""
-            if distance and distance != '':
-                try:
-                    dist_num = float(distance)
-                    if dist_num >= 1000:
-                        distance_display = f"{dist_num/1000:.1f}km"
-                    else:
-                        distance_display = f"{int(dist_num)}m"
-                except:
-                    distance_display = distance
-            
-            # 解析价格等级
-            biz_ext = poi.get('biz_ext', {})
-            cost = biz_ext.get('cost', '')
-            price_level = ""
-            if cost:
-                try:
-                    cost_num = int(cost)
-                    if cost_num <= 30:
-                        price_level = "经济实惠"
-                    elif cost_num <= 80:
-                        price_level = "中等消费"
-                    else:
-                        price_level = "高档消费"
-                except:
-                    price_level = f"人均{cost}元"
-            
-            location_item = {
-                "id": poi.get('id'),
-                "name": poi.get('name', ''),
-                "address": poi.get('address', ''),
-                "distance": distance_display,
-                "rating": rating_display,
-                "price_level": price_level,
-                "map_url": map_url,
-                "tel": poi.get('tel', ''),
-                "type": poi.get('type', ''),
-                "location_coords": location_str,  # 确保坐标格式为 "经度,纬度"
-                "business_area": poi.get('business_area', ''),
-                "tags": biz_ext.get('tag', '').split(';') if biz_ext.get('tag') else []
-            }
-            
-            logger.info(f"成功处理POI: {location_item['name']} - 坐标: {location_item['location_coords']}")
-            locations.append(location_item)
-        
+        return self._build_location_result(locations, data.get('suggestion', {}))
+    
+    def _build_location_result(self, locations: List[Dict[str, Any]], suggestion: Dict[str, Any]) -> Dict[str, Any]:
+        """组装位置列表结果"""
         logger.info(f"搜索完成，返回 {len(locations)} 个有效位置")
         
         return {
@@ -286,9 +620,89 @@ class AmapTool(BaseMCPTool):
                 "show_ratings": True,
                 "show_distance": True
             },
-            "suggestion": data.get('suggestion', {})
+            "suggestion": suggestion
         }
     
+    def _parse_poi(self, poi: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """解析单个POI，坐标无效时返回None"""
+        # 解析坐标用于地图链接
+        location_str = poi.get('location', '')
+        logger.info(f"处理POI: {poi.get('name', 'unknown')} - 原始坐标: {location_str}")
+        
+        coordinates = location_str.split(',') if location_str else ['', '']
+        longitude = coordinates[0].strip() if len(coordinates) > 0 else ''
+        latitude = coordinates[1].strip() if len(coordinates) > 1 else ''
+        
+        # 验证坐标格式
+        if not longitude or not latitude:
+            logger.warning(f"POI {poi.get('name', 'unknown')} 坐标信息不完整: {location_str}")
+            return None  # 跳过坐标不完整的POI
+        
+        try:
+            # 验证坐标是否为有效数字
+            lng_float = float(longitude)
+            lat_float = float(latitude)
+            logger.info(f"坐标验证通过: {poi.get('name', 'unknown')} - 经度: {lng_float}, 纬度: {lat_float}")
+        except ValueError:
+            logger.warning(f"POI {poi.get('name', 'unknown')} 坐标格式无效: 经度={longitude}, 纬度={latitude}")
+            return None  # 跳过坐标格式无效的POI
+        
+        # 生成高德地图链接
+        map_url = ""
+        if longitude and latitude:
+            map_url = f"https://uri.amap.com/marker?position={longitude},{latitude}&name={poi.get('name', '')}"
+        
+        # 解析评分
+        rating = self._parse_rating(poi.get('biz_ext', {}))
+        rating_display = f"{rating}" if rating > 0 else "暂无评分"
+        
+        # 解析距离显示
+        distance = poi.get('distance', '')
+        distance_display = ""
+        if distance and distance != '':
+            try:
+                dist_num = float(distance)
+                if dist_num >= 1000:
+                    distance_display = f"{dist_num/1000:.1f}km"
+                else:
+                    distance_display = f"{int(dist_num)}m"
+            except:
+                distance_display = distance
+        
+        # 解析价格等级
+        biz_ext = poi.get('biz_ext', {})
+        cost = biz_ext.get('cost', '')
+        price_level = ""
+        if cost:
+            try:
+                cost_num = int(cost)
+                if cost_num <= 30:
+                    price_level = "经济实惠"
+                elif cost_num <= 80:
+                    price_level = "中等消费"
+                else:
+                    price_level = "高档消费"
+            except:
+                price_level = f"人均{cost}元"
+        
+        location_item = {
+            "id": poi.get('id'),
+            "name": poi.get('name', ''),
+            "address": poi.get('address', ''),
+            "distance": distance_display,
+            "rating": rating_display,
+            "price_level": price_level,
+            "map_url": map_url,
+            "tel": poi.get('tel', ''),
+            "type": poi.get('type', ''),
+            "location_coords": location_str,  # 确保坐标格式为 "经度,纬度"
+            "business_area": poi.get('business_area', ''),
+            "tags": biz_ext.get('tag', '').split(';') if biz_ext.get('tag') else []
+        }
+        
+        logger.info(f"成功处理POI: {location_item['name']} - 坐标: {location_item['location_coords']}")
+        return location_item
+    
     def _parse_rating(self, biz_ext: Dict[str, Any]) -> float:
         """解析评分"""
         try:
@@ -344,6 +758,45 @@ class AmapTool(BaseMCPTool):
                         "050400",  # 休闲餐饮场所
                         "050500"   # 咖啡厅
                     ]
+                },
+                "page": {
+                    "type": "integer",
+                    "description": "起始页码",
+                    "minimum": 1,
+                    "default": 1
+                },
+                "page_size": {
+                    "type": "integer",
+                    "description": "每页数量，最多25",
+                    "minimum": 1,
+                    "maximum": MAX_PAGE_SIZE,
+                    "default": DEFAULT_PAGE_SIZE
+                },
+                "pages": {
+                    "type": "integer",
+                    "description": "本次连续获取的页数（并发请求）",
+                    "minimum": 1,
+                    "maximum": MAX_PAGES_PER_CALL,
+                    "default": 1
+                },
+                "cursor": {
+                    "type": "string",
+                    "description": "上一次结果中的 next_cursor，用于继续翻页"
+                },
+                "sort_by": {
+                    "type": "string",
+                    "description": "排序方式：default(高德默认顺序) 或 score(按距离、评分、价格和偏好综合排序)",
+                    "enum": ["default", "score"],
+                    "default": "default"
+                },
+                "preferences": {
+                    "type": "object",
+                    "description": "用户偏好，如 {\"spicy_preference\": \"high\", \"budget\": 80}"
+                },
+                "top_k": {
+                    "type": "integer",
+                    "description": "只返回排序后的前k个结果",
+                    "minimum": 1
                 }
             },
             "required": ["keyword"]
@@ -393,14 +846,14 @@ class AmapTool(BaseMCPTool):
             
             endpoint = f"{self.base_url}/place/detail"
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(endpoint, params=detail_params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._parse_detail_result(data)
-                    else:
-                        raise Exception(f"获取详情失败: {response.status}")
-                        
+            session = self.get_http_session()
+            async with session.get(endpoint, params=detail_params, timeout=self.client_timeout()) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return self._parse_detail_result(data)
+                else:
+                    raise Exception(f"获取详情失败: {response.status}")
+                    
         except Exception as e:
             logger.error(f"获取餐厅详情失败: {e}")
             return {"error": str(e)}
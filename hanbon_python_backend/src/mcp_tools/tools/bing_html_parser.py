@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: bing_html_parser.py
+@description: Bing图片搜索结果页解析（可插拔解析后端 + 流式提取）
+@author: AI Assistant
+@created: 2024
+"""
+
+import logging
+from html.parser import HTMLParser
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+from urllib import parse
+
+logger = logging.getLogger(__name__)
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:  # 可选依赖
+    SelectolaxParser = None
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # 可选依赖
+    lxml_html = None
+
+# 图片容器：(容器属性, 容器内第一个img的属性)
+Container = Tuple[Dict[str, Any], Optional[Dict[str, Any]]]
+
+# 流式解析每次送入的字符数
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# 图片URL中应包含的扩展名或路径特征
+_IMAGE_INDICATORS = (
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp',
+    'images/', '/image/', 'photo', 'pic'
+)
+
+# 无结束标签的元素
+_VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+))
+
+
+def _has_class(attrs: Dict[str, Any], name: str) -> bool:
+    value = attrs.get('class') or ''
+    if isinstance(value, (list, tuple)):
+        return name in value
+    return name in value.split()
+
+
+# ---------- 容器提取（与解析后端无关） ----------
+
+def extract_image_url(attrs: Dict[str, Any], img_attrs: Optional[Dict[str, Any]]) -> Optional[str]:
+    """从容器属性中提取图片URL：href中的mediaurl > data-src > src > 子元素img"""
+    href = attrs.get('href')
+    if href:
+        decoded_href = parse.unquote(href)
+        if 'mediaurl=' in decoded_href:
+            return decoded_href.split('mediaurl=')[1].split('&')[0]
+    if attrs.get('data-src'):
+        return attrs['data-src']
+    if attrs.get('src'):
+        return attrs['src']
+    if img_attrs:
+        return img_attrs.get('src') or img_attrs.get('data-src')
+    return None
+
+
+def extract_image_title(attrs: Dict[str, Any], img_attrs: Optional[Dict[str, Any]]) -> str:
+    """提取图片标题：容器的alt/title/aria-label，没有时取子元素img的alt/title"""
+    title = attrs.get('alt') or attrs.get('title') or attrs.get('aria-label') or ""
+    if not title and img_attrs:
+        title = img_attrs.get('alt') or img_attrs.get('title') or ""
+    return title.strip()
+
+
+def is_valid_image_url(url: str) -> bool:
+    """验证是否为有效的图片URL（包含图片文件扩展名或图片相关路径）"""
+    if not url or len(url) < 10:
+        return False
+    url_lower = url.lower()
+    return any(indicator in url_lower for indicator in _IMAGE_INDICATORS)
+
+
+def extract_thumbnail_url(img_attrs: Optional[Dict[str, Any]]) -> Optional[str]:
+    """容器内img的缩略图地址（Bing结果页中为 tse*.mm.bing.net 的小图）"""
+    if not img_attrs:
+        return None
+    url = img_attrs.get('src') or img_attrs.get('data-src') or ''
+    return url if url.startswith(('http://', 'https://')) else None
+
+
+def extract_images(
+    html: str,
+    limit: int,
+    is_valid: Callable[[str], bool],
+    backend: str = 'auto'
+) -> List[Tuple[str, str, Optional[str]]]:
+    """
+    从Bing结果页提取图片
+
+    按文档顺序遍历图片容器，得到 limit 个有效URL后立即停止。
+
+    Args:
+        html: 结果页HTML
+        limit: 需要的图片数量
+        is_valid: 图片URL校验函数
+        backend: 解析后端，见 resolve_backend
+
+    Returns:
+        [(图片URL, 标题, 缩略图URL), ...]
+    """
+    results = []
+    for attrs, img_attrs in iter_containers(html, backend):
+        try:
+            url = extract_image_url(attrs, img_attrs)
+            if url and is_valid(url):
+                results.append((
+                    url, extract_image_title(attrs, img_attrs), extract_thumbnail_url(img_attrs)
+                ))
+                if len(results) >= limit:
+                    break
+        except Exception as e:
+            logger.debug(f"解析单个图片失败: {e}")
+    return results
+
+
+# ---------- 解析后端 ----------
+
+def available_backends() -> List[str]:
+    """当前环境可用的解析后端"""
+    backends = []
+    if SelectolaxParser is not None:
+        backends.append('selectolax')
+    if lxml_html is not None:
+        backends.append('lxml')
+    backends += ['stream', 'bs4']
+    return backends
+
+
+def resolve_backend(backend: str = 'auto') -> str:
+    """
+    选择解析后端
+
+    auto 依次选择 selectolax、lxml（已安装时），否则使用标准库的流式解析；
+    bs4 为原有的 BeautifulSoup html.parser 实现。
+    """
+    available = available_backends()
+    if backend == 'auto':
+        return available[0]
+    if backend not in available:
+        logger.warning(f"HTML解析后端 {backend} 不可用，改用 {available[0]}")
+        return available[0]
+    return backend
+
+
+def iter_containers(html: str, backend: str = 'auto') -> Iterator[Container]:
+    """
+    按文档顺序产出图片容器
+
+    优先匹配 .iusc 容器；整页都没有时依次退回到 [data-src] 和 img[src]。
+    """
+    backend = resolve_backend(backend)
+    if backend == 'selectolax':
+        return _iter_selectolax(html)
+    if backend == 'lxml':
+        return _iter_lxml(html)
+    if backend == 'bs4':
+        return _iter_bs4(html)
+    return _iter_stream(html)
+
+
+def _iter_selectolax(html: str) -> Iterator[Container]:
+    tree = SelectolaxParser(html)
+    nodes = tree.css('.iusc')
+    if not nodes:
+        logger.warning("未找到图片容器，可能页面结构已变化")
+        nodes = tree.css('[data-src]') or tree.css('img[src]')
+    for node in nodes:
+        img = node.css_first('img')
+        yield node.attributes, (img.attributes if img is not None else None)
+
+
+def _iter_lxml(html: str) -> Iterator[Container]:
+    root = lxml_html.fromstring(html)
+    nodes = root.xpath("//*[contains(concat(' ', normalize-space(@class), ' '), ' iusc ')]")
+    if not nodes:
+        logger.warning("未找到图片容器，可能页面结构已变化")
+        nodes = root.xpath('//*[@data-src]') or root.xpath('//img[@src]')
+    for node in nodes:
+        img = next(node.iterdescendants('img'), None)
+        yield dict(node.attrib), (dict(img.attrib) if img is not None else None)
+
+
+def _iter_bs4(html: str) -> Iterator[Container]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    nodes = soup.select('.iusc')
+    if not nodes:
+        logger.warning("未找到图片容器，可能页面结构已变化")
+        nodes = soup.select('[data-src]') or soup.select('img[src]')
+    for node in nodes:
+        img = node.find('img')
+        yield node.attrs, (img.attrs if img is not None else None)
+
+
+class _StreamingContainerParser(HTMLParser):
+    """
+    增量解析器：不建DOM树，只记录图片容器及其第一个img子元素
+
+    .iusc 容器在结束标签出现后即可产出；[data-src] 和 img[src] 只作为整页
+    没有 .iusc 时的备选，单独收集。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.containers: List[list] = []        # [容器属性, img属性, 是否完整]
+        self.data_src: List[list] = []
+        self.img_src: List[list] = []
+        self._open: List[list] = []             # [标签名, 嵌套深度, 记录]
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        for item in self._open:
+            if item[0] == tag:
+                item[1] += 1
+        if tag == 'img':
+            for _, _, record in self._open:
+                if record[1] is None:
+                    record[1] = attrs
+
+        records = []
+        if _has_class(attrs, 'iusc'):
+            records.append((self.containers, [attrs, None, False]))
+        if 'data-src' in attrs:
+            records.append((self.data_src, [attrs, None, False]))
+        if tag == 'img' and attrs.get('src'):
+            self.img_src.append([attrs, None, True])
+
+        for target, record in records:
+            target.append(record)
+            if tag in _VOID_TAGS:
+                record[2] = True
+            else:
+                self._open.append([tag, 0, record])
+
+    def handle_endtag(self, tag):
+        for item in list(self._open):
+            if item[0] != tag:
+                continue
+            if item[1] > 0:
+                item[1] -= 1
+            else:
+                item[2][2] = True
+                self._open.remove(item)
+
+
+def _iter_stream(html: str) -> Iterator[Container]:
+    parser = _StreamingContainerParser()
+    emitted = 0
+    for start in range(0, len(html), STREAM_CHUNK_SIZE):
+        parser.feed(html[start:start + STREAM_CHUNK_SIZE])
+        # 按文档顺序产出已完整的容器，调用方停止迭代时后续内容不再解析
+        while emitted < len(parser.containers) and parser.containers[emitted][2]:
+            attrs, img_attrs, _ = parser.containers[emitted]
+            emitted += 1
+            yield attrs, img_attrs
+    parser.close()
+
+    for attrs, img_attrs, _ in parser.containers[emitted:]:
+        yield attrs, img_attrs
+    if not parser.containers:
+        logger.warning("未找到图片容器，可能页面结构已变化")
+        for attrs, img_attrs, _ in (parser.data_src or parser.img_src):
+            yield attrs, img_attrs
@@ -7,41 +7,105 @@
 @created: 2024
 """
 
-import aiohttp
 import logging
 from typing import Dict, Any
 from ..base_tool import BaseMCPTool
+from ..execution_policy import ExecutionPolicy, TransientToolError, TRANSIENT_ERRORS
+from .search_cache import SearchResultCache, SearchQuota, QuotaExceededError, normalize_query
 
 logger = logging.getLogger(__name__)
 
+# 每次向上游请求的结果数（按调用次数计费，多取的结果可供更大的 count 复用缓存）
+FETCH_COUNT = 10
+MAX_COUNT = 50
+
 class BingSearchTool(BaseMCPTool):
     """必应搜索工具"""
     
+    execution_policy = ExecutionPolicy(timeout=8.0, max_retries=1)
+    
     def __init__(self, name: str, description: str, api_key: str, **config):
+        """
+        Args:
+            api_key: Bing搜索API密钥
+            cache_path: 搜索结果缓存数据库（默认 cache/bing_search.db）
+            cache_ttl: 搜索结果有效期（秒）
+            monthly_quota: 每月调用上限，0 表示不限
+            max_concurrency: 最大并发请求数
+        """
         super().__init__(name, description, **config)
         self.api_key = api_key
         self.base_url = "https://api.bing.microsoft.com/v7.0/search"
         self.category = "search"
         
+        # 搜索结果缓存：按归一化查询持久化缓存，配额用完或上游故障时返回过期结果
+        self.search_cache = SearchResultCache(
+            path=config.get('cache_path') or None,
+            ttl=float(config.get('cache_ttl') or 6 * 3600)
+        )
+        self.quota = SearchQuota(
+            store=self.search_cache,
+            monthly_limit=int(config.get('monthly_quota') or 0),
+            max_concurrency=int(config.get('max_concurrency') or 3),
+            max_per_second=float(config.get('max_per_second') or 3.0)
+        )
+        
     async def execute(self, **parameters) -> Dict[str, Any]:
-        """执行搜索"""
+        """执行搜索（同一归一化查询复用缓存，并发的相同查询只请求一次）"""
         try:
-            query = parameters.get('query', '')
-            count = parameters.get('count', 5)
+            query = (parameters.get('query') or '').strip()
+            count = min(max(int(parameters.get('count', 5)), 1), MAX_COUNT)
+            normalized = normalize_query(query)
+            if not normalized:
+                return {"error": "搜索查询不能为空", "results": []}
             
-            headers = {'Ocp-Apim-Subscription-Key': self.api_key}
-            params = {'q': query, 'count': count, 'responseFilter': 'Webpages'}
+            fetch_count = max(count, FETCH_COUNT)
+            cache_key = f"{normalized}|{fetch_count}" if fetch_count > FETCH_COUNT else normalized
+            try:
+                result = await self.search_cache.get_or_fetch(
+                    cache_key, lambda: self.quota.call(lambda: self._search(query, fetch_count))
+                )
+            except (QuotaExceededError, *TRANSIENT_ERRORS) as e:
+                stale = await self.search_cache.get_stale(cache_key)
+                if stale is None:
+                    if isinstance(e, QuotaExceededError):
+                        return {"error": str(e), "results": []}
+                    raise
+                logger.warning(f"搜索不可用，返回过期的缓存结果: {e}")
+                result = dict(stale, stale=True)
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.base_url, headers=headers, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._parse_results(data)
-                    else:
-                        return {"error": f"搜索失败: {response.status}", "results": []}
+            if not result.get("success"):
+                return result
+            return dict(result, results=result["results"][:count])
+        except TRANSIENT_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"搜索失败: {e}")
-            return {"error": str(e), "results": []}
+            return {"success": False, "error": str(e), "results": []}
+    
+    async def _search(self, query: str, count: int) -> Dict[str, Any]:
+        """请求Bing搜索API"""
+        headers = {'Ocp-Apim-Subscription-Key': self.api_key}
+        params = {'q': query, 'count': count, 'responseFilter': 'Webpages'}
+        
+        session = self.get_http_session()
+        async with session.get(self.base_url, headers=headers, params=params, timeout=self.client_timeout()) as response:
+            if response.status == 200:
+                data = await response.json()
+                return self._parse_results(data)
+            elif response.status == 429 or response.status >= 500:
+                raise TransientToolError(f"搜索失败: {response.status}")
+            else:
+                return {"error": f"搜索失败: {response.status}", "results": []}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存和配额统计"""
+        return {"cache": self.search_cache.get_stats(), "quota": self.quota.get_stats()}
+    
+    async def cleanup(self):
+        """关闭缓存数据库并释放资源"""
+        self.search_cache.close()
+        await super().cleanup()
     
     def _parse_results(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """解析搜索结果"""
@@ -63,7 +127,7 @@ class BingSearchTool(BaseMCPTool):
             "type": "object",
             "properties": {
                 "query": {"type": "string", "description": "搜索查询"},
-                "count": {"type": "integer", "description": "结果数量", "default": 5}
+                "count": {"type": "integer", "description": "结果数量", "default": 5, "minimum": 1, "maximum": MAX_COUNT}
             },
             "required": ["query"]
         } 
\ No newline at end of file
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: dish_embeddings.py
+@description: 菜品向量索引（float32 .npy 内存映射，精确检索 + IVF 近似检索，完全离线）
+@author: AI Assistant
+@created: 2024
+"""
+
+import argparse
+import json
+import logging
+import os
+import zlib
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = 'vectors.npy'
+META_FILE = 'meta.json'
+IVF_CENTROIDS_FILE = 'ivf_centroids.npy'
+IVF_IDS_FILE = 'ivf_ids.npy'
+IVF_OFFSETS_FILE = 'ivf_offsets.npy'
+
+HASHING_DIM = 256
+# 菜品数不超过该值时 auto 使用精确检索
+EXACT_SEARCH_LIMIT = 20000
+DEFAULT_NPROBE = 8
+# 训练IVF聚类中心时最多使用的样本数
+IVF_TRAIN_SAMPLES = 20000
+IVF_ITERATIONS = 10
+
+EXACT = 'exact'
+IVF = 'ivf'
+AUTO = 'auto'
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """按行L2归一化（零向量保持为零）"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+# ---------- 嵌入模型 ----------
+
+class HashingEmbedder:
+    """
+    特征哈希嵌入（无需模型文件）
+
+    菜名按字符二元组、菜系/标签/季节/心情和食材按整词哈希到固定维度，带符号累加后
+    归一化。名字相近、食材和口味重合多的菜品向量相近；主料（食材列表第一项）权重最高，
+    菜系只作为次要特征，避免同菜系但主料无关的菜排在前面。
+    """
+
+    # 各类特征的权重
+    WEIGHTS = {
+        'name': 1.0, 'main_ingredient': 2.0, 'ingredient': 1.0, 'cuisine': 0.8,
+        'tag': 0.6, 'season': 0.4, 'mood': 0.4
+    }
+
+    def __init__(self, dim: int = HASHING_DIM, vocabulary: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            dim: 向量维度
+            vocabulary: 编码自由文本时识别的词表（词 -> 特征类别，如 "鸡蛋" -> "ingredient"）
+        """
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+        self.vocabulary = vocabulary or {}
+
+    def _add(self, vector: np.ndarray, token: str, weight: float):
+        code = zlib.crc32(token.encode('utf-8'))
+        vector[code % self.dim] += weight if (code >> 31) & 1 else -weight
+
+    def _add_text(self, vector: np.ndarray, text: str, weight: float):
+        text = text.strip().lower()
+        if len(text) == 1:
+            self._add(vector, f"name:{text}", weight)
+        for i in range(len(text) - 1):
+            self._add(vector, f"name:{text[i:i + 2]}", weight)
+
+    def embed_dishes(self, dishes: List[Dict[str, Any]]) -> np.ndarray:
+        vectors = np.zeros((len(dishes), self.dim), dtype=np.float32)
+        for vector, dish in zip(vectors, dishes):
+            self._add_text(vector, dish['name'], self.WEIGHTS['name'])
+            if dish.get('cuisine'):
+                self._add(vector, f"cuisine:{dish['cuisine']}", self.WEIGHTS['cuisine'])
+            for i, value in enumerate(dish.get('ingredients', [])):
+                self._add(vector, f"ingredient:{value}", self.WEIGHTS['main_ingredient' if i == 0 else 'ingredient'])
+            for field, key in (('tag', 'tags'), ('season', 'seasons'), ('mood', 'moods')):
+                for value in dish.get(key, []):
+                    self._add(vector, f"{field}:{value}", self.WEIGHTS[field])
+        return _normalize(vectors)
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """自由文本：名称特征，加上文本中出现的词表词（食材、菜系等）"""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for vector, text in zip(vectors, texts):
+            self._add_text(vector, text, self.WEIGHTS['name'])
+            for term, field in self.vocabulary.items():
+                if term in text:
+                    self._add(vector, f"{field}:{term}", self.WEIGHTS[field])
+        return _normalize(vectors)
+
+
+class LocalModelEmbedder:
+    """
+    本地句向量模型（sentence-transformers，可选依赖）
+
+    只从本地目录加载模型，不访问网络。
+    """
+
+    def __init__(self, model_path: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_path, local_files_only=True)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"local:{os.path.basename(os.path.normpath(model_path))}"
+
+    @staticmethod
+    def dish_text(dish: Dict[str, Any]) -> str:
+        parts = [dish['name'], dish.get('cuisine', '')]
+        parts += dish.get('ingredients', []) + dish.get('tags', [])
+        return ' '.join(part for part in parts if part)
+
+    def embed_dishes(self, dishes: List[Dict[str, Any]]) -> np.ndarray:
+        return self.embed_texts([self.dish_text(dish) for dish in dishes])
+
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def get_embedder(name: str, model_path: Optional[str] = None, vocabulary: Optional[Dict[str, str]] = None):
+    """按索引记录的嵌入模型名称创建查询用的嵌入模型，无法创建时返回None"""
+    if name.startswith('hashing-'):
+        return HashingEmbedder(int(name.split('-', 1)[1]), vocabulary)
+    if name.startswith('local:') and model_path:
+        try:
+            return LocalModelEmbedder(model_path)
+        except Exception as e:  # 可选依赖或模型缺失
+            logger.warning(f"加载本地嵌入模型失败 {model_path}: {e}")
+    return None
+
+
+# ---------- IVF ----------
+
+def train_ivf(vectors: np.ndarray, nlist: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    训练IVF倒排表（球面k-means）
+
+    Returns:
+        (聚类中心, 按列表顺序排列的向量ID, 各列表在ID数组中的起始位置)
+    """
+    rng = np.random.default_rng(seed)
+    count = len(vectors)
+    nlist = max(1, min(nlist, count))
+    sample = vectors if count <= IVF_TRAIN_SAMPLES else vectors[np.sort(rng.choice(count, IVF_TRAIN_SAMPLES, replace=False))]
+    sample = np.asarray(sample, dtype=np.float32)
+
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(IVF_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = ~np.bincount(assignment, minlength=nlist).astype(bool)
+        sums[empty] = centroids[empty]
+        centroids = _normalize(sums)
+
+    assignment = np.empty(count, dtype=np.int32)
+    for start in range(0, count, 8192):
+        block = np.asarray(vectors[start:start + 8192], dtype=np.float32)
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    ids = np.argsort(assignment, kind='stable').astype(np.int32)
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(assignment, minlength=nlist))
+    return centroids, ids, offsets
+
+
+class DishEmbeddingIndex:
+    """
+    菜品向量索引
+
+    向量按行归一化后以内积作为余弦相似度。索引目录包含 vectors.npy（float32，
+    启动时内存映射）、meta.json（菜名与嵌入模型）和可选的IVF倒排表。
+    菜品较少时精确检索为一次矩阵-向量乘法；较多时用IVF只计算最近的
+    nprobe 个聚类中的菜品。
+    """
+
+    def __init__(self, vectors: np.ndarray, names: List[str], embedder_name: str,
+                 ivf: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None):
+        self.vectors = vectors
+        self.names = names
+        self.embedder_name = embedder_name
+        self.rows: Dict[str, int] = {}
+        for row, name in enumerate(names):
+            self.rows.setdefault(name, row)
+        # resolve 时按从长到短的菜名长度在查询文本中查找子串
+        self._name_lengths = sorted({len(name) for name in self.rows if len(name) >= 2}, reverse=True)
+        self._ivf = ivf
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @classmethod
+    def build(cls, dishes: List[Dict[str, Any]], embedder=None) -> "DishEmbeddingIndex":
+        """由菜品记录计算向量建立索引（内存中）"""
+        embedder = embedder or HashingEmbedder()
+        return cls(embedder.embed_dishes(dishes), [dish['name'] for dish in dishes], embedder.name)
+
+    @classmethod
+    def load(cls, directory: str) -> "DishEmbeddingIndex":
+        """内存映射加载索引目录"""
+        with open(os.path.join(directory, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode='r')
+        if vectors.dtype != np.float32 or vectors.ndim != 2 or len(vectors) != len(meta['names']):
+            raise ValueError(f"向量文件与菜名不匹配: {vectors.shape}/{vectors.dtype}")
+
+        ivf = None
+        if os.path.exists(os.path.join(directory, IVF_CENTROIDS_FILE)):
+            ivf = tuple(
+                np.asarray(np.load(os.path.join(directory, name), mmap_mode='r'))
+                for name in (IVF_CENTROIDS_FILE, IVF_IDS_FILE, IVF_OFFSETS_FILE)
+            )
+        logger.info(f"内存映射加载菜品向量索引 {directory}: {vectors.shape}")
+        return cls(np.asarray(vectors), meta['names'], meta.get('embedder', ''), ivf)
+
+    def save(self, directory: str, nlist: Optional[int] = None):
+        """保存索引目录，nlist 不为0时同时训练并保存IVF倒排表"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, VECTORS_FILE), np.ascontiguousarray(self.vectors, dtype=np.float32))
+        if nlist is None:
+            nlist = int(np.sqrt(len(self))) if len(self) > EXACT_SEARCH_LIMIT else 0
+        if nlist:
+            for name, array in zip((IVF_CENTROIDS_FILE, IVF_IDS_FILE, IVF_OFFSETS_FILE), self.ivf(nlist)):
+                np.save(os.path.join(directory, name), array)
+        with open(os.path.join(directory, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"embedder": self.embedder_name, "dim": self.dim, "names": self.names}, f, ensure_ascii=False)
+
+    def ivf(self, nlist: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """IVF倒排表，没有预先训练时在首次使用时训练"""
+        if self._ivf is None:
+            nlist = nlist or max(1, int(np.sqrt(len(self))))
+            self._ivf = train_ivf(self.vectors, nlist)
+            logger.info(f"训练菜品向量IVF索引: {nlist} 个聚类")
+        return self._ivf
+
+    def row(self, name: str) -> Optional[int]:
+        return self.rows.get(name)
+
+    def resolve(self, text: str) -> Optional[int]:
+        """
+        查询文本对应的菜品行：完全匹配，否则取文本中包含的最长菜名（同样长时取靠前的行）
+
+        按菜名长度从长到短查找文本的子串，耗时只与文本长度和菜名长度种类有关，与菜品数无关。
+        """
+        text = text.strip()
+        row = self.rows.get(text)
+        if row is not None:
+            return row
+        for length in self._name_lengths:
+            rows = [
+                self.rows[text[i:i + length]]
+                for i in range(len(text) - length + 1)
+                if text[i:i + length] in self.rows
+            ]
+            if rows:
+                return min(rows)
+        return None
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        method: str = AUTO,
+        exclude: Optional[int] = None,
+        nprobe: int = DEFAULT_NPROBE
+    ) -> Tuple[List[Tuple[int, float]], str]:
+        """
+        检索与 query 最相似的 k 个菜品
+
+        Returns:
+            ([(菜品行, 相似度), ...] 按相似度降序, 实际使用的检索方式)
+        """
+        query = _normalize(query)
+        if method == AUTO:
+            method = EXACT if len(self) <= EXACT_SEARCH_LIMIT else IVF
+        wanted = k + (exclude is not None)
+
+        if method == IVF:
+            centroids, ids, offsets = self.ivf()
+            lists = np.argsort(-(centroids @ query))[:nprobe]
+            candidates = np.sort(np.concatenate([ids[offsets[i]:offsets[i + 1]] for i in lists]))
+            scores = np.asarray(self.vectors[candidates] @ query)
+        else:
+            candidates = None
+            scores = np.asarray(self.vectors @ query)
+
+        wanted = min(wanted, len(scores))
+        if wanted <= 0:
+            return [], method
+        top = np.argpartition(-scores, wanted - 1)[:wanted] if wanted < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        rows = candidates[top] if candidates is not None else top
+
+        results = [(int(row), float(score)) for row, score in zip(rows, scores[top]) if row != exclude]
+        return results[:k], method
+
+
+def main():
+    """离线构建菜品向量索引：python -m src.mcp_tools.tools.dish_embeddings --output <目录>"""
+    from .food_knowledge_base import FoodKnowledgeBase
+
+    parser = argparse.ArgumentParser(description="构建菜品向量索引")
+    parser.add_argument('--kb', help="美食知识库文件，默认使用内置知识库")
+    parser.add_argument('--output', required=True, help="索引输出目录")
+    parser.add_argument('--model', help="本地句向量模型目录，不指定时使用特征哈希")
+    parser.add_argument('--nlist', type=int, help="IVF聚类数，0表示不建IVF，默认按菜品数自动选择")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    kb = FoodKnowledgeBase(args.kb)
+    dishes = kb.dishes(kb.query())
+    embedder = LocalModelEmbedder(args.model) if args.model else HashingEmbedder()
+    index = DishEmbeddingIndex.build(dishes, embedder)
+    index.save(args.output, args.nlist)
+    print(f"已保存 {len(index)} 道菜品的向量（{index.dim}维，{embedder.name}）到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: food_knowledge_base.py
+@description: 美食知识库（JSON/CSV/SQLite加载 + 倒排索引，大文件编译后内存映射）
+@author: AI Assistant
+@created: 2024
+"""
+
+import csv
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 内置知识库
+DEFAULT_KB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'food_knowledge_base.json'
+)
+
+# 查询字段 -> 菜品记录中的字段
+INDEX_FIELDS = {
+    'cuisine': 'cuisine',
+    'season': 'seasons',
+    'mood': 'moods',
+    'tag': 'tags',
+    'difficulty': 'difficulty',
+    'ingredient': 'ingredients'
+}
+_LIST_FIELDS = ('seasons', 'moods', 'tags', 'ingredients')
+
+SEASONS = ('春季', '夏季', '秋季', '冬季')
+ALL_YEAR = '全年'
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+# 数值字段及缺省值：烹饪时间（分钟）、每份热量（千卡）、蛋白质（克）、受欢迎程度（0-100）
+NUMERIC_FIELDS = {
+    'cooking_minutes': 40,
+    'calories': 400,
+    'protein': 15,
+    'popularity': 60
+}
+
+# 源文件超过该大小时编译为索引目录并内存映射加载
+DEFAULT_MMAP_THRESHOLD = 4 * 1024 * 1024
+INDEX_FORMAT_VERSION = 2
+INDEX_DIR_SUFFIX = '.kbidx'
+
+_EMPTY = np.empty(0, dtype=np.int32)
+
+Filter = Union[str, Iterable[str]]
+
+
+def _split_list(value: Any) -> List[str]:
+    """列表字段：JSON数组或以 | 分隔的字符串"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        text = str(value).strip()
+        if text.startswith('['):
+            items = json.loads(text)
+        else:
+            items = text.split('|')
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+def normalize_dish(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    规范化一条菜品记录，缺少菜名时抛出 ValueError
+
+    seasons 中的"全年"展开为四季；difficulty 只保留 easy/medium/hard。
+    """
+    name = str(raw.get('name') or '').strip()
+    if not name:
+        raise ValueError("菜品缺少名称")
+
+    dish = {field: _split_list(raw.get(field)) for field in _LIST_FIELDS}
+    if ALL_YEAR in dish['seasons']:
+        dish['seasons'] = list(SEASONS)
+
+    difficulty = str(raw.get('difficulty') or 'medium').strip().lower()
+    dish.update({
+        'name': name,
+        'cuisine': str(raw.get('cuisine') or '').strip(),
+        'difficulty': difficulty if difficulty in DIFFICULTIES else 'medium'
+    })
+    for field, default in NUMERIC_FIELDS.items():
+        try:
+            dish[field] = int(float(raw.get(field) or default))
+        except (TypeError, ValueError):
+            dish[field] = default
+    return dish
+
+
+# ---------- 数据源加载 ----------
+
+def load_json(path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """JSON：{"cuisines": {...}, "dishes": [...]} 或直接为菜品数组"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data, {}
+    return data.get('dishes', []), data.get('cuisines', {})
+
+
+def load_csv(path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """CSV：表头为菜品字段名，列表字段以 | 分隔"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f)), {}
+
+
+def load_sqlite(path: str, table: str = 'dishes') -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """SQLite：dishes 表的列为菜品字段名；可选的 cuisines 表提供菜系信息"""
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    connection.row_factory = sqlite3.Row
+    try:
+        dishes = [dict(row) for row in connection.execute(f'SELECT * FROM "{table}"')]
+        cuisines = {}
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if 'cuisines' in tables:
+            for row in connection.execute('SELECT * FROM cuisines'):
+                row = dict(row)
+                name = row.pop('name')
+                cuisines[name] = {
+                    key: (_split_list(value) if key != 'difficulty' else value)
+                    for key, value in row.items()
+                }
+    finally:
+        connection.close()
+    return dishes, cuisines
+
+
+def load_source(path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """按扩展名加载知识库源文件，返回 (规范化后的菜品列表, 菜系信息)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        raw_dishes, cuisines = load_csv(path)
+    elif extension in ('.db', '.sqlite', '.sqlite3'):
+        raw_dishes, cuisines = load_sqlite(path)
+    else:
+        raw_dishes, cuisines = load_json(path)
+
+    dishes, seen, skipped = [], set(), 0
+    for raw in raw_dishes:
+        try:
+            dish = normalize_dish(raw)
+        except (ValueError, TypeError):
+            skipped += 1
+            continue
+        if dish['name'] in seen:
+            skipped += 1
+            continue
+        seen.add(dish['name'])
+        dishes.append(dish)
+    if skipped:
+        logger.warning(f"美食知识库 {path} 跳过 {skipped} 条无效或重复的菜品")
+    return dishes, cuisines
+
+
+def build_postings(dishes: List[Dict[str, Any]]) -> Tuple[np.ndarray, Dict[str, Dict[str, List[int]]]]:
+    """
+    构建倒排索引
+
+    所有倒排表拼接为一个 int32 数组，每个 (字段, 取值) 记录其 [起始位置, 长度]；
+    表内菜品ID升序，便于求交集。
+    """
+    lists: Dict[str, Dict[str, List[int]]] = {field: {} for field in INDEX_FIELDS}
+    for dish_id, dish in enumerate(dishes):
+        for field, key in INDEX_FIELDS.items():
+            values = dish[key] if key in _LIST_FIELDS else [dish[key]]
+            for value in dict.fromkeys(values):
+                if value:
+                    lists[field].setdefault(value, []).append(dish_id)
+
+    chunks, index, offset = [], {}, 0
+    for field, values in lists.items():
+        index[field] = {}
+        for value, ids in values.items():
+            index[field][value] = [offset, len(ids)]
+            chunks.append(ids)
+            offset += len(ids)
+    postings = np.fromiter((i for ids in chunks for i in ids), dtype=np.int32, count=offset)
+    return postings, index
+
+
+def intersect_sorted(small: np.ndarray, large: np.ndarray) -> np.ndarray:
+    """两个升序无重复ID数组求交集：在较长的数组中二分查找较短数组的每个元素"""
+    if not len(small) or not len(large):
+        return _EMPTY
+    positions = np.searchsorted(large, small)
+    positions[positions == len(large)] = 0
+    return small[large[positions] == small]
+
+
+def build_numeric(dishes: List[Dict[str, Any]]) -> np.ndarray:
+    """数值字段矩阵（菜品数 × NUMERIC_FIELDS），列顺序与 NUMERIC_FIELDS 一致"""
+    numeric = np.empty((len(dishes), len(NUMERIC_FIELDS)), dtype=np.float32)
+    for column, field in enumerate(NUMERIC_FIELDS):
+        numeric[:, column] = [dish[field] for dish in dishes]
+    return numeric
+
+
+class _MappedRecords:
+    """内存映射的菜品记录（每行一条JSON），按需解码单条记录"""
+
+    def __init__(self, records_path: str, offsets_path: str):
+        self._file = open(records_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if os.path.getsize(records_path) else b''
+        self._offsets = np.load(offsets_path, mmap_mode='r')
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, dish_id: int) -> Dict[str, Any]:
+        start, end = int(self._offsets[dish_id]), int(self._offsets[dish_id + 1])
+        return json.loads(self._mmap[start:end])
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+
+class FoodKnowledgeBase:
+    """
+    美食知识库
+
+    菜品按加载顺序编号，按菜系、季节、心情、饮食标签、难度、食材建立倒排索引，
+    组合查询为倒排表求交集，不扫描全部菜品。首次查询时才加载数据源；源文件
+    超过 mmap_threshold 时编译为索引目录（<源文件>.kbidx），之后启动直接
+    内存映射倒排表和菜品记录，只解码实际用到的菜品。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        mmap_threshold: int = DEFAULT_MMAP_THRESHOLD,
+        index_dir: Optional[str] = None
+    ):
+        """
+        初始化知识库（不加载数据）
+
+        Args:
+            path: 知识库文件（.json/.csv/.db），默认使用内置知识库
+            mmap_threshold: 源文件超过该字节数时编译索引并内存映射加载
+            index_dir: 编译索引目录，默认为源文件旁的 <源文件>.kbidx
+        """
+        self.path = path or DEFAULT_KB_PATH
+        self.mmap_threshold = mmap_threshold
+        self.index_dir = index_dir or self.path + INDEX_DIR_SUFFIX
+        self.mapped = False
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._records: Union[List[Dict[str, Any]], _MappedRecords] = []
+        self._postings: np.ndarray = _EMPTY
+        self._numeric: np.ndarray = np.empty((0, len(NUMERIC_FIELDS)), dtype=np.float32)
+        self._index: Dict[str, Dict[str, List[int]]] = {}
+        self._name_to_id: Dict[str, int] = {}
+        self.cuisines: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._name_to_id)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def load(self):
+        """立即加载知识库（各查询方法也会在首次调用时自动加载）"""
+        self._ensure_loaded()
+
+    # ---------- 查询 ----------
+
+    def postings(self, field: str, value: str) -> np.ndarray:
+        """单个 (字段, 取值) 的菜品ID数组（升序，只读）"""
+        self._ensure_loaded()
+        entry = self._index.get(field, {}).get(value)
+        if entry is None:
+            return _EMPTY
+        offset, length = entry
+        return self._postings[offset:offset + length]
+
+    def query(self, **filters: Filter) -> np.ndarray:
+        """
+        组合查询
+
+        关键字参数为 INDEX_FIELDS 中的字段，取值为字符串或字符串列表：同一字段的
+        多个取值取并集，不同字段之间取交集。None 或空列表的字段不参与过滤；
+        没有任何过滤条件时返回全部菜品。
+
+        Returns:
+            菜品ID数组（升序）
+        """
+        self._ensure_loaded()
+        groups = []
+        for field, values in filters.items():
+            if field not in INDEX_FIELDS:
+                raise ValueError(f"不支持的查询字段: {field}")
+            if values is None or (not isinstance(values, str) and not values):
+                continue
+            if isinstance(values, str):
+                groups.append(self.postings(field, values))
+            else:
+                groups.append(self._union([self.postings(field, value) for value in values]))
+
+        if not groups:
+            return np.arange(len(self._name_to_id), dtype=np.int32)
+        # 从最短的倒排表开始求交集
+        groups.sort(key=len)
+        result = groups[0]
+        for ids in groups[1:]:
+            if not len(result):
+                break
+            result = self._intersect(result, ids)
+        return result
+
+    def _intersect(self, small: np.ndarray, large: np.ndarray) -> np.ndarray:
+        """求交集：长度相差悬殊时二分查找，否则用位图标记"""
+        if len(small) * 16 < len(large):
+            return intersect_sorted(small, large)
+        mask = np.zeros(len(self._name_to_id), dtype=bool)
+        mask[large] = True
+        return small[mask[small]]
+
+    def _union(self, arrays: List[np.ndarray]) -> np.ndarray:
+        """多个倒排表求并集（按菜品数分配位图，避免排序）"""
+        if len(arrays) == 1:
+            return arrays[0]
+        mask = np.zeros(len(self._name_to_id), dtype=bool)
+        for ids in arrays:
+            mask[ids] = True
+        return np.flatnonzero(mask).astype(np.int32)
+
+    def numeric(self, field: str) -> np.ndarray:
+        """所有菜品某个数值字段的数组（按菜品ID排列）"""
+        self._ensure_loaded()
+        return self._numeric[:, list(NUMERIC_FIELDS).index(field)]
+
+    def get(self, dish_id: int) -> Dict[str, Any]:
+        """按ID获取菜品记录"""
+        self._ensure_loaded()
+        return self._records[int(dish_id)]
+
+    def find(self, name: str) -> Optional[Dict[str, Any]]:
+        """按菜名获取菜品记录"""
+        self._ensure_loaded()
+        dish_id = self._name_to_id.get(name)
+        return None if dish_id is None else self._records[dish_id]
+
+    def dish_id(self, name: str) -> Optional[int]:
+        """菜名对应的菜品ID"""
+        self._ensure_loaded()
+        return self._name_to_id.get(name)
+
+    def dishes(self, ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """批量获取菜品记录（保持ID顺序）"""
+        self._ensure_loaded()
+        return [self._records[int(dish_id)] for dish_id in ids]
+
+    def values(self, field: str) -> List[str]:
+        """字段的所有取值（按首次出现顺序）"""
+        self._ensure_loaded()
+        return list(self._index.get(field, {}))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取知识库统计信息（不触发加载）"""
+        return {
+            "path": self.path,
+            "loaded": self._loaded,
+            "mapped": self.mapped,
+            "dishes": len(self._name_to_id),
+            "index_terms": {field: len(values) for field, values in self._index.items()},
+            "postings": int(len(self._postings))
+        }
+
+    def close(self):
+        """释放内存映射"""
+        with self._lock:
+            if isinstance(self._records, _MappedRecords):
+                self._records.close()
+            self._records, self._postings, self._index, self._name_to_id = [], _EMPTY, {}, {}
+            self._numeric = self._numeric[:0]
+            self._loaded = self.mapped = False
+
+    # ---------- 加载 ----------
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def _load(self):
+        size = os.path.getsize(self.path)
+        if size >= self.mmap_threshold:
+            if self._load_index_dir():
+                return
+            dishes, cuisines = load_source(self.path)
+            try:
+                self._write_index_dir(dishes, cuisines)
+            except OSError as e:
+                logger.warning(f"写入美食知识库索引失败，改为内存加载: {e}")
+            else:
+                if self._load_index_dir():
+                    return
+        else:
+            dishes, cuisines = load_source(self.path)
+
+        self._records = dishes
+        self._postings, self._index = build_postings(dishes)
+        self._numeric = build_numeric(dishes)
+        self._name_to_id = {dish['name']: dish_id for dish_id, dish in enumerate(dishes)}
+        self.cuisines = cuisines
+        logger.info(f"加载美食知识库 {self.path}: {len(dishes)} 道菜品")
+
+    def _source_signature(self) -> Dict[str, Any]:
+        stat = os.stat(self.path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "version": INDEX_FORMAT_VERSION}
+
+    def _load_index_dir(self) -> bool:
+        """内存映射加载编译索引，索引不存在或与源文件不一致时返回False"""
+        meta_path = os.path.join(self.index_dir, 'meta.json')
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('source') != self._source_signature():
+                logger.info(f"美食知识库已更新，重新编译索引: {self.index_dir}")
+                return False
+            # 转为普通ndarray视图（仍由映射内存支撑），避免 np.memmap 子类的运算开销
+            postings = np.asarray(np.load(os.path.join(self.index_dir, 'postings.npy'), mmap_mode='r'))
+            numeric = np.asarray(np.load(os.path.join(self.index_dir, 'numeric.npy'), mmap_mode='r'))
+            records = _MappedRecords(
+                os.path.join(self.index_dir, 'records.jsonl'),
+                os.path.join(self.index_dir, 'record_offsets.npy')
+            )
+        except (OSError, ValueError, KeyError):
+            return False
+
+        self._records = records
+        self._postings = postings
+        self._numeric = numeric
+        self._index = meta['index']
+        self._name_to_id = {name: dish_id for dish_id, name in enumerate(meta['names'])}
+        self.cuisines = meta.get('cuisines', {})
+        self.mapped = True
+        logger.info(f"内存映射加载美食知识库索引 {self.index_dir}: {len(records)} 道菜品")
+        return True
+
+    def _write_index_dir(self, dishes: List[Dict[str, Any]], cuisines: Dict[str, Any]):
+        """编译索引目录，meta.json 最后写入，作为索引完整的标志"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        postings, index = build_postings(dishes)
+
+        offsets = np.zeros(len(dishes) + 1, dtype=np.int64)
+        records_path = os.path.join(self.index_dir, 'records.jsonl')
+        with open(records_path + '.tmp', 'wb') as f:
+            for dish_id, dish in enumerate(dishes):
+                line = json.dumps(dish, ensure_ascii=False).encode('utf-8') + b'\n'
+                f.write(line)
+                offsets[dish_id + 1] = offsets[dish_id] + len(line)
+        os.replace(records_path + '.tmp', records_path)
+
+        arrays = (('postings.npy', postings), ('record_offsets.npy', offsets), ('numeric.npy', build_numeric(dishes)))
+        for name, array in arrays:
+            target = os.path.join(self.index_dir, name)
+            with open(target + '.tmp', 'wb') as f:
+                np.save(f, array)
+            os.replace(target + '.tmp', target)
+
+        meta = {
+            "source": self._source_signature(),
+            "names": [dish['name'] for dish in dishes],
+            "index": index,
+            "cuisines": cuisines
+        }
+        meta_path = os.path.join(self.index_dir, 'meta.json')
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + '.tmp', meta_path)
+        logger.info(f"编译美食知识库索引 {self.index_dir}: {len(dishes)} 道菜品")
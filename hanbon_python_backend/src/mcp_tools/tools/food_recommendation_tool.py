@@ -7,73 +7,54 @@
 @created: 2024
 """
 
+import copy
+import json
 import logging
-import random
-from typing import Dict, Any, List
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+from datetime import datetime, date
 from ..base_tool import BaseMCPTool
+from ..execution_policy import ExecutionPolicy
+from .food_knowledge_base import FoodKnowledgeBase
+from .food_scoring import (
+    FoodScorer, RANKING_VARIANTS, DEFAULT_VARIANT, request_seed, parse_variant_split, assign_variant
+)
 
 logger = logging.getLogger(__name__)
 
+# 难度 -> 展示文本
+DIFFICULTY_LABELS = {"easy": "简单", "medium": "中等", "hard": "困难"}
+
+# 每次最多返回的推荐数
+MAX_RECOMMENDATIONS = 8
+
+# 推荐结果缓存条数（相同请求、种子和日期的结果完全相同）
+RESPONSE_CACHE_SIZE = 1024
+
 class FoodRecommendationTool(BaseMCPTool):
     """智能美食推荐工具"""
     
+    execution_policy = ExecutionPolicy(timeout=5.0)
+    
     def __init__(self, name: str, description: str, **config):
+        """
+        Args:
+            knowledge_base: 美食知识库文件
+            ranking_variants: A/B分流配置，如 "default=50,popular=50"，不配置时全部使用默认方案
+        """
         super().__init__(name, description, **config)
         self.category = "recommendation"
         
-        # 美食数据库
-        self.food_database = self._initialize_food_database()
+        # 美食知识库（首次推荐时才加载）
+        self.knowledge_base = FoodKnowledgeBase(config.get('knowledge_base') or None)
+        self.scorer = FoodScorer(self.knowledge_base)
+        self.variant_split = parse_variant_split(config.get('ranking_variants') or '')
+        
+        # 推荐结果缓存：结果只取决于请求参数、种子、日期和排序方案
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         
-    def _initialize_food_database(self) -> Dict[str, Any]:
-        """初始化美食数据库"""
-        return {
-            "cuisines": {
-                "川菜": {
-                    "dishes": ["麻婆豆腐", "回锅肉", "宫保鸡丁", "鱼香肉丝", "水煮鱼", "麻辣香锅"],
-                    "characteristics": ["麻辣", "鲜香", "重口味"],
-                    "weather_suitable": ["冬季", "阴雨"],
-                    "difficulty": "medium"
-                },
-                "粤菜": {
-                    "dishes": ["白切鸡", "烧鹅", "蒸排骨", "虾饺", "叉烧", "煲仔饭"],
-                    "characteristics": ["清淡", "鲜美", "精致"],
-                    "weather_suitable": ["夏季", "春季"],
-                    "difficulty": "hard"
-                },
-                "湘菜": {
-                    "dishes": ["剁椒鱼头", "口味虾", "辣椒炒肉", "东安子鸡", "糖醋排骨"],
-                    "characteristics": ["辣", "鲜", "香"],
-                    "weather_suitable": ["冬季", "秋季"],
-                    "difficulty": "medium"
-                },
-                "家常菜": {
-                    "dishes": ["番茄炒蛋", "青椒肉丝", "红烧肉", "糖醋里脊", "蒜蓉菠菜"],
-                    "characteristics": ["简单", "营养", "家庭味"],
-                    "weather_suitable": ["全年"],
-                    "difficulty": "easy"
-                }
-            },
-            "dietary_preferences": {
-                "素食": ["麻婆豆腐", "蒜蓉菠菜", "红烧茄子", "干煸四季豆"],
-                "低热量": ["蒸蛋羹", "清蒸鱼", "白灼菜心", "冬瓜汤"],
-                "高蛋白": ["白切鸡", "蒸蛋", "牛肉汤", "豆腐炖鱼"],
-                "儿童适宜": ["番茄炒蛋", "蒸蛋羹", "胡萝卜炖牛肉", "玉米排骨汤"]
-            },
-            "seasonal_foods": {
-                "春季": ["春笋炒肉", "韭菜炒蛋", "菠菜汤", "豌豆尖"],
-                "夏季": ["凉拌黄瓜", "冬瓜汤", "绿豆汤", "清蒸鱼"],
-                "秋季": ["栗子烧鸡", "莲藕排骨汤", "银耳汤", "秋梨汤"],
-                "冬季": ["羊肉汤", "红烧肉", "火锅", "炖牛肉"]
-            },
-            "mood_foods": {
-                "开心": ["糖醋排骨", "可乐鸡翅", "红烧肉", "蛋炒饭"],
-                "减压": ["小米粥", "银耳汤", "蒸蛋羹", "绿茶"],
-                "聚会": ["火锅", "烤肉", "麻辣香锅", "干锅"],
-                "浪漫": ["红酒牛排", "三文鱼", "意面", "提拉米苏"]
-            }
-        }
-    
     async def execute(self, **parameters) -> Dict[str, Any]:
         """
         执行美食推荐
@@ -85,24 +66,52 @@ class FoodRecommendationTool(BaseMCPTool):
             dietary_restrictions: 饮食限制
             skill_level: 烹饪技能水平
             occasion: 场合
+            user_id: 用户ID（与日期一起派生推荐种子，并决定A/B分组）
+            date: 推荐日期 YYYY-MM-DD（默认今天，决定季节和种子）
+            seed: 显式指定推荐种子（用于复现和回放）
+            variant: 显式指定排序方案（不指定时按用户ID分流）
         """
         try:
-            preferences = parameters.get('preferences', {})
+            preferences = parameters.get('preferences') or {}
             weather = parameters.get('weather', '')
             mood = parameters.get('mood', '')
-            dietary_restrictions = parameters.get('dietary_restrictions', [])
+            dietary_restrictions = sorted(parameters.get('dietary_restrictions') or [])
             skill_level = parameters.get('skill_level', 'medium')
             occasion = parameters.get('occasion', 'daily')
+            user_id = str(parameters.get('user_id') or '')
+            day = self._parse_date(parameters.get('date'))
+            
+            variant = parameters.get('variant') or assign_variant(user_id, self.variant_split)
+            if variant not in RANKING_VARIANTS:
+                return {"success": False, "error": f"未知的排序方案: {variant}", "recommendations": []}
+            seed = parameters.get('seed')
+            seed = int(seed) if seed is not None else request_seed(user_id, day.isoformat())
             
-            # 生成推荐
-            recommendations = self._generate_recommendations(
-                preferences, weather, mood, dietary_restrictions, skill_level, occasion
+            cache_key = json.dumps(
+                [preferences, weather, mood, dietary_restrictions, skill_level, occasion,
+                 day.isoformat(), seed, variant],
+                ensure_ascii=False, sort_keys=True
             )
+            recommendations = self._cache_get(cache_key)
+            if recommendations is None:
+                # 首次加载知识库（可能需要编译索引）和构建特征矩阵不在事件循环中执行
+                if not self.scorer.ready:
+                    await self.run_cpu(self.scorer.prepare)
+                
+                # 生成推荐
+                recommendations = self._generate_recommendations(
+                    preferences, weather, mood, dietary_restrictions, skill_level, occasion,
+                    self._get_season(day), seed, variant
+                )
+                self._cache_put(cache_key, recommendations)
             
             return {
                 "success": True,
                 "recommendations": recommendations,
                 "total_count": len(recommendations),
+                "seed": seed,
+                "variant": variant,
+                "date": day.isoformat(),
                 "generated_at": datetime.now().isoformat()
             }
             
@@ -121,63 +130,71 @@ class FoodRecommendationTool(BaseMCPTool):
         mood: str,
         dietary_restrictions: List[str],
         skill_level: str,
-        occasion: str
+        occasion: str,
+        season: str,
+        seed: Optional[int] = None,
+        variant: str = DEFAULT_VARIANT
     ) -> List[Dict[str, Any]]:
-        """生成推荐列表"""
+        """
+        生成推荐列表：按偏好权重给全部菜品打分，取分数最高的若干道
+
+        排序中的随机扰动全部来自 seed，相同参数和种子的结果完全相同。
+        """
+        ranking = RANKING_VARIANTS[variant]
+        weights = self.scorer.weights(
+            preferences, weather, mood, dietary_restrictions, skill_level, occasion, season, ranking
+        )
+        candidates = self.scorer.candidates(dietary_restrictions, skill_level)
+        dish_ids, _ = self.scorer.top_k(
+            weights, MAX_RECOMMENDATIONS, candidates, seed=seed, exploration=ranking.exploration
+        )
         
         recommendations = []
-        
-        # 基于心情推荐
-        if mood and mood in self.food_database["mood_foods"]:
-            mood_foods = self.food_database["mood_foods"][mood]
-            for food in mood_foods[:2]:  # 取前2个
-                recommendations.append(self._create_recommendation(
-                    food, "心情推荐", f"适合{mood}时享用"
-                ))
-        
-        # 基于季节推荐
-        season = self._get_current_season()
-        if season in self.food_database["seasonal_foods"]:
-            seasonal_foods = self.food_database["seasonal_foods"][season]
-            for food in random.sample(seasonal_foods, min(2, len(seasonal_foods))):
-                recommendations.append(self._create_recommendation(
-                    food, "时令推荐", f"{season}时令美食"
-                ))
-        
-        # 基于饮食偏好推荐
-        for restriction in dietary_restrictions:
-            if restriction in self.food_database["dietary_preferences"]:
-                diet_foods = self.food_database["dietary_preferences"][restriction]
-                for food in diet_foods[:2]:
-                    recommendations.append(self._create_recommendation(
-                        food, "健康推荐", f"适合{restriction}饮食"
-                    ))
-        
-        # 基于技能水平推荐
-        skill_recommendations = self._get_skill_based_recommendations(skill_level)
-        recommendations.extend(skill_recommendations)
-        
-        # 去重并限制数量
-        unique_recommendations = self._deduplicate_recommendations(recommendations)
-        
-        return unique_recommendations[:8]  # 最多返回8个推荐
+        for dish_id in dish_ids:
+            category, reason = self.scorer.reason(dish_id, weights, skill_level)
+            recommendations.append(self._create_recommendation(
+                int(dish_id), category, reason
+            ))
+        return recommendations
     
-    def _create_recommendation(self, dish_name: str, category: str, reason: str) -> Dict[str, Any]:
+    def _create_recommendation(self, dish_id: int, category: str, reason: str) -> Dict[str, Any]:
         """创建推荐项"""
+        dish = self.knowledge_base.get(dish_id)
         return {
-            "dish_name": dish_name,
+            "dish_name": dish["name"],
             "category": category,
             "reason": reason,
-            "difficulty": self._get_dish_difficulty(dish_name),
-            "cooking_time": self._estimate_cooking_time(dish_name),
-            "ingredients": self._get_basic_ingredients(dish_name),
-            "nutrition_score": random.randint(70, 95),  # 模拟营养评分
-            "popularity": random.randint(60, 100)  # 模拟受欢迎程度
+            "difficulty": DIFFICULTY_LABELS.get(dish["difficulty"], "中等"),
+            "cooking_time": self._format_cooking_time(dish["cooking_minutes"]),
+            "ingredients": dish["ingredients"] or ["根据菜谱准备"],
+            "nutrition_score": self.scorer.nutrition_score(dish_id),
+            "popularity": dish["popularity"]
         }
     
-    def _get_current_season(self) -> str:
-        """获取当前季节"""
-        month = datetime.now().month
+    def _cache_get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is None:
+                return None
+            self._cache.move_to_end(key)
+        return copy.deepcopy(cached)
+    
+    def _cache_put(self, key: str, recommendations: List[Dict[str, Any]]):
+        with self._cache_lock:
+            self._cache[key] = copy.deepcopy(recommendations)
+            self._cache.move_to_end(key)
+            while len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+    
+    def _parse_date(self, value: Optional[str]) -> date:
+        """解析推荐日期，缺省为今天"""
+        if not value:
+            return date.today()
+        return date.fromisoformat(str(value)[:10])
+    
+    def _get_season(self, day: date) -> str:
+        """获取日期所在季节"""
+        month = day.month
         if month in [3, 4, 5]:
             return "春季"
         elif month in [6, 7, 8]:
@@ -187,69 +204,15 @@ class FoodRecommendationTool(BaseMCPTool):
         else:
             return "冬季"
     
-    def _get_skill_based_recommendations(self, skill_level: str) -> List[Dict[str, Any]]:
-        """基于技能水平的推荐"""
-        recommendations = []
-        
-        for cuisine, info in self.food_database["cuisines"].items():
-            if (skill_level == "easy" and info["difficulty"] == "easy") or \
-               (skill_level == "medium" and info["difficulty"] in ["easy", "medium"]) or \
-               (skill_level == "hard"):
-                
-                dish = random.choice(info["dishes"])
-                recommendations.append(self._create_recommendation(
-                    dish, "技能推荐", f"适合{skill_level}水平制作"
-                ))
-        
-        return recommendations[:3]
-    
-    def _get_dish_difficulty(self, dish_name: str) -> str:
-        """获取菜品难度"""
-        easy_dishes = ["番茄炒蛋", "蒸蛋羹", "青椒肉丝"]
-        hard_dishes = ["烧鹅", "叉烧", "蒸排骨"]
-        
-        if dish_name in easy_dishes:
-            return "简单"
-        elif dish_name in hard_dishes:
-            return "困难"
-        else:
-            return "中等"
-    
-    def _estimate_cooking_time(self, dish_name: str) -> str:
-        """估算烹饪时间"""
-        quick_dishes = ["番茄炒蛋", "青椒肉丝", "蒜蓉菠菜"]
-        slow_dishes = ["红烧肉", "炖牛肉", "羊肉汤"]
-        
-        if dish_name in quick_dishes:
+    def _format_cooking_time(self, minutes: int) -> str:
+        """烹饪时间展示文本"""
+        if minutes <= 20:
             return "15-20分钟"
-        elif dish_name in slow_dishes:
+        elif minutes >= 60:
             return "1-2小时"
         else:
             return "30-45分钟"
     
-    def _get_basic_ingredients(self, dish_name: str) -> List[str]:
-        """获取基本食材"""
-        ingredient_map = {
-            "番茄炒蛋": ["鸡蛋", "番茄", "盐", "糖", "葱"],
-            "麻婆豆腐": ["豆腐", "肉末", "豆瓣酱", "花椒", "葱"],
-            "宫保鸡丁": ["鸡胸肉", "花生米", "青椒", "干辣椒", "生抽"],
-            "红烧肉": ["五花肉", "冰糖", "生抽", "老抽", "料酒"]
-        }
-        
-        return ingredient_map.get(dish_name, ["根据菜谱准备"])
-    
-    def _deduplicate_recommendations(self, recommendations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """去除重复推荐"""
-        seen_dishes = set()
-        unique_recommendations = []
-        
-        for rec in recommendations:
-            if rec["dish_name"] not in seen_dishes:
-                seen_dishes.add(rec["dish_name"])
-                unique_recommendations.append(rec)
-        
-        return unique_recommendations
-    
     def get_parameters_schema(self) -> Dict[str, Any]:
         """获取参数模式"""
         return {
@@ -283,9 +246,11 @@ class FoodRecommendationTool(BaseMCPTool):
                 },
                 "dietary_restrictions": {
                     "type": "array",
-                    "items": {"type": "string"},
-                    "description": "饮食限制",
-                    "enum": ["素食", "低热量", "高蛋白", "儿童适宜"]
+                    "items": {
+                        "type": "string",
+                        "enum": ["素食", "低热量", "高蛋白", "儿童适宜"]
+                    },
+                    "description": "饮食限制"
                 },
                 "skill_level": {
                     "type": "string",
@@ -298,6 +263,23 @@ class FoodRecommendationTool(BaseMCPTool):
                     "description": "用餐场合",
                     "enum": ["daily", "party", "date", "family"],
                     "default": "daily"
+                },
+                "user_id": {
+                    "type": "string",
+                    "description": "用户ID，与日期一起决定推荐种子和排序方案分组"
+                },
+                "date": {
+                    "type": "string",
+                    "description": "推荐日期 YYYY-MM-DD，默认今天"
+                },
+                "seed": {
+                    "type": "integer",
+                    "description": "推荐种子，指定后结果可复现"
+                },
+                "variant": {
+                    "type": "string",
+                    "description": "排序方案",
+                    "enum": list(RANKING_VARIANTS)
                 }
             }
         } 
\ No newline at end of file
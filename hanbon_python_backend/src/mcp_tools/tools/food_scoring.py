@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: food_scoring.py
+@description: 美食推荐打分引擎（菜品特征矩阵 × 偏好权重向量，argpartition 取 top-k）
+@author: AI Assistant
+@created: 2024
+"""
+
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field as dataclass_field
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from .food_knowledge_base import FoodKnowledgeBase
+
+logger = logging.getLogger(__name__)
+
+# 独热编码的特征分组（与知识库索引字段一致）
+ONE_HOT_FIELDS = ('cuisine', 'season', 'mood', 'tag', 'difficulty')
+
+# 数值特征，取值均归一化到 [0, 1]
+NUMERIC_FEATURES = ('light', 'protein', 'popularity', 'quick', 'spicy')
+
+# 各类偏好的权重
+MOOD_WEIGHT = 3.0
+TAG_WEIGHT = 2.5
+CUISINE_WEIGHT = 2.0
+SEASON_WEIGHT = 1.5
+OCCASION_WEIGHT = 1.5
+WEATHER_WEIGHT = 1.0
+SKILL_WEIGHT = 0.5
+NUTRITION_WEIGHT = 1.5
+
+# 没有任何偏好时的基础权重：人气为主，兼顾清淡和蛋白质
+BASE_WEIGHTS = {'popularity': 1.0, 'light': 0.3, 'protein': 0.3}
+
+SPICY_WEIGHTS = {"不辣": -3.0, "微辣": -1.0, "中辣": 0.5, "重辣": 1.5}
+
+# 饮食限制 -> 额外加权的数值特征
+RESTRICTION_FEATURES = {"低热量": 'light', "高蛋白": 'protein'}
+# 作为硬性条件的饮食限制（候选菜品必须带该标签）
+HARD_RESTRICTIONS = ("素食",)
+
+# 场合 -> 加权的特征
+OCCASION_FEATURES = {
+    "party": ('mood', "聚会"),
+    "date": ('mood', "浪漫"),
+    "family": ('tag', "儿童适宜"),
+    "daily": ('numeric', 'quick')
+}
+
+# 天气 -> 对应季节；天气 -> 菜系 weather_suitable 中的取值
+WEATHER_SEASONS = {"炎热": "夏季", "寒冷": "冬季"}
+WEATHER_CONDITIONS = {"雨天": "阴雨", "阴天": "阴雨"}
+
+# 技能水平 -> 可推荐的菜品难度
+SKILL_DIFFICULTIES = {
+    "easy": ["easy"],
+    "medium": ["easy", "medium"],
+    "hard": ["easy", "medium", "hard"]
+}
+
+# 推荐理由：贡献最大的特征分组 -> (类别, 理由模板)
+REASONS = {
+    'mood': ("心情推荐", "适合{value}时享用"),
+    'season': ("时令推荐", "{value}时令美食"),
+    'tag': ("健康推荐", "适合{value}饮食"),
+    'cuisine': ("口味推荐", "{value}风味"),
+    'difficulty': ("技能推荐", "适合{skill_level}水平制作")
+}
+DEFAULT_REASON = ("综合推荐", "综合口味、时令与人气推荐")
+
+Feature = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class RankingVariant:
+    """
+    排序方案（A/B测试中的一个分组）
+
+    exploration 为按请求种子生成的随机扰动幅度（0 表示严格按分数排序）；
+    weight_scale 按特征分组（如 'mood'）或单个数值特征（如 'numeric:popularity'）
+    放大或缩小请求权重。
+    """
+    name: str
+    exploration: float = 0.0
+    weight_scale: Dict[str, float] = dataclass_field(default_factory=dict)
+
+
+RANKING_VARIANTS = {
+    "default": RankingVariant("default", exploration=0.3),
+    "greedy": RankingVariant("greedy"),
+    "popular": RankingVariant("popular", exploration=0.3, weight_scale={'numeric:popularity': 2.5}),
+    "healthy": RankingVariant(
+        "healthy", exploration=0.3, weight_scale={'numeric:light': 4.0, 'numeric:protein': 3.0}
+    )
+}
+DEFAULT_VARIANT = "default"
+
+
+def request_seed(*parts: Any) -> int:
+    """由请求信息（如用户ID和日期）派生稳定的64位种子，不受进程哈希随机化影响"""
+    text = '|'.join(str(part) for part in parts)
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def parse_variant_split(spec: str) -> Dict[str, int]:
+    """解析分流配置 "default=50,popular=50"，忽略未知方案和非法权重"""
+    split = {}
+    for item in (spec or '').split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name in RANKING_VARIANTS and weight.strip().isdigit() and int(weight) > 0:
+            split[name] = int(weight)
+    return split
+
+
+def assign_variant(user_id: str, split: Dict[str, int]) -> str:
+    """按用户ID稳定地分配排序方案（同一用户始终在同一分组）"""
+    if not split or not user_id:
+        return DEFAULT_VARIANT
+    bucket = request_seed('variant', user_id) % sum(split.values())
+    for name, weight in split.items():
+        if bucket < weight:
+            return name
+        bucket -= weight
+    return DEFAULT_VARIANT
+
+
+class DishFeatureMatrix:
+    """
+    菜品特征矩阵（菜品数 × 特征数，float32）
+
+    独热特征直接由知识库倒排表填充，不需要解码菜品记录；数值特征由知识库的
+    数值列归一化得到。
+    """
+
+    def __init__(self, kb: FoodKnowledgeBase):
+        self.labels: List[Feature] = []
+        for field in ONE_HOT_FIELDS:
+            self.labels += [(field, value) for value in kb.values(field)]
+        self.labels += [('numeric', name) for name in NUMERIC_FEATURES]
+        self.columns: Dict[Feature, int] = {label: column for column, label in enumerate(self.labels)}
+
+        matrix = np.zeros((len(kb), len(self.labels)), dtype=np.float32)
+        for (field, value), column in self.columns.items():
+            if field != 'numeric':
+                matrix[kb.postings(field, value), column] = 1.0
+
+        numeric = {
+            'light': np.clip((800.0 - kb.numeric('calories')) / 700.0, 0.0, 1.0),
+            'protein': np.clip(kb.numeric('protein') / 40.0, 0.0, 1.0),
+            'popularity': np.clip(kb.numeric('popularity') / 100.0, 0.0, 1.0),
+            'quick': np.clip((90.0 - kb.numeric('cooking_minutes')) / 70.0, 0.0, 1.0)
+        }
+        for name, values in numeric.items():
+            matrix[:, self.columns[('numeric', name)]] = values
+        spicy = self.columns[('numeric', 'spicy')]
+        for cuisine, info in kb.cuisines.items():
+            if any('辣' in item for item in info.get('characteristics', [])):
+                matrix[kb.postings('cuisine', cuisine), spicy] = 1.0
+
+        self.matrix = matrix
+        # 可以作为推荐理由的特征列
+        self.reason_columns = np.array(
+            [column for (field, _), column in self.columns.items() if field in REASONS], dtype=np.intp
+        )
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.matrix.shape
+
+    def column(self, field: str, value: str) -> Optional[int]:
+        return self.columns.get((field, value))
+
+
+class FoodScorer:
+    """
+    推荐打分引擎
+
+    用户请求转换为与特征矩阵同维的权重向量，打分为一次矩阵-向量乘法；硬性条件
+    （素食、技能水平）通过知识库索引求出候选掩码，不满足的菜品记为 -inf；
+    最后用 argpartition 取 top-k，只对这 k 个结果排序。
+    """
+
+    def __init__(self, kb: FoodKnowledgeBase):
+        self.kb = kb
+        self._features: Optional[DishFeatureMatrix] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._features is not None
+
+    @property
+    def features(self) -> DishFeatureMatrix:
+        """特征矩阵（首次访问时加载知识库并构建）"""
+        if self._features is None:
+            with self._lock:
+                if self._features is None:
+                    self._features = DishFeatureMatrix(self.kb)
+                    logger.info(f"构建菜品特征矩阵: {self._features.shape}")
+        return self._features
+
+    def prepare(self):
+        """预先构建特征矩阵"""
+        return self.features
+
+    def weights(
+        self,
+        preferences: Optional[Dict[str, Any]] = None,
+        weather: str = '',
+        mood: str = '',
+        dietary_restrictions: Optional[List[str]] = None,
+        skill_level: str = 'medium',
+        occasion: str = 'daily',
+        season: str = '',
+        variant: Optional[RankingVariant] = None
+    ) -> np.ndarray:
+        """把用户请求转换为权重向量，variant 的 weight_scale 在最后应用"""
+        features = self.features
+        weights = np.zeros(len(features.labels), dtype=np.float32)
+
+        def add(field: str, value: str, weight: float):
+            column = features.column(field, value)
+            if column is not None:
+                weights[column] += weight
+
+        for name, weight in BASE_WEIGHTS.items():
+            add('numeric', name, weight)
+
+        preferences = preferences if isinstance(preferences, dict) else {}
+        cuisines = preferences.get('cuisine_type') or []
+        for cuisine in ([cuisines] if isinstance(cuisines, str) else cuisines):
+            add('cuisine', cuisine, CUISINE_WEIGHT)
+        add('numeric', 'spicy', SPICY_WEIGHTS.get(preferences.get('spicy_level', ''), 0.0))
+
+        if mood:
+            add('mood', mood, MOOD_WEIGHT)
+        if season:
+            add('season', season, SEASON_WEIGHT)
+        for restriction in dietary_restrictions or []:
+            add('tag', restriction, TAG_WEIGHT)
+            if restriction in RESTRICTION_FEATURES:
+                add('numeric', RESTRICTION_FEATURES[restriction], NUTRITION_WEIGHT)
+
+        if weather in WEATHER_SEASONS:
+            add('season', WEATHER_SEASONS[weather], WEATHER_WEIGHT)
+            if weather == "炎热":
+                add('numeric', 'light', WEATHER_WEIGHT)
+        if weather in WEATHER_CONDITIONS:
+            condition = WEATHER_CONDITIONS[weather]
+            for cuisine, info in self.kb.cuisines.items():
+                if condition in info.get('weather_suitable', []):
+                    add('cuisine', cuisine, WEATHER_WEIGHT)
+
+        if occasion in OCCASION_FEATURES:
+            add(*OCCASION_FEATURES[occasion], OCCASION_WEIGHT)
+        add('difficulty', skill_level, SKILL_WEIGHT)
+
+        for key, scale in (variant.weight_scale.items() if variant else ()):
+            if ':' in key:
+                column = features.column(*key.split(':', 1))
+                if column is not None:
+                    weights[column] *= scale
+            else:
+                for (group, _), column in features.columns.items():
+                    if group == key:
+                        weights[column] *= scale
+        return weights
+
+    def candidates(
+        self,
+        dietary_restrictions: Optional[List[str]] = None,
+        skill_level: str = 'medium'
+    ) -> Optional[np.ndarray]:
+        """
+        硬性条件对应的候选菜品ID，没有硬性条件时返回None
+
+        同时满足饮食限制和技能水平的菜品为空时，放宽技能水平条件。
+        """
+        hard = [item for item in dietary_restrictions or [] if item in HARD_RESTRICTIONS]
+        difficulties = SKILL_DIFFICULTIES.get(skill_level, SKILL_DIFFICULTIES["medium"])
+        if not hard and len(difficulties) == len(SKILL_DIFFICULTIES):
+            return None
+        ids = self.kb.query(tag=hard, difficulty=difficulties)
+        if not len(ids) and hard:
+            ids = self.kb.query(tag=hard)
+        return ids
+
+    def top_k(
+        self,
+        weights: np.ndarray,
+        k: int,
+        candidates: Optional[np.ndarray] = None,
+        seed: Optional[int] = None,
+        exploration: float = 0.0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        打分并取分数最高的 k 个菜品
+
+        给定 seed 时每道菜的分数加上 [0, exploration) 的随机扰动：相同种子结果
+        完全相同（可缓存、可复现），不同用户或日期之间推荐有所变化。
+
+        Returns:
+            (菜品ID数组, 分数数组)，按分数降序
+        """
+        scores = self.features.matrix @ weights
+        if seed is not None and exploration > 0:
+            rng = np.random.default_rng(seed)
+            scores += rng.random(len(scores), dtype=np.float32) * np.float32(exploration)
+        if candidates is not None:
+            masked = np.full_like(scores, -np.inf)
+            masked[candidates] = scores[candidates]
+            scores = masked
+            available = len(candidates)
+        else:
+            available = len(scores)
+
+        k = min(k, available)
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return top, scores[top]
+
+    def reason(self, dish_id: int, weights: np.ndarray, skill_level: str = 'medium') -> Tuple[str, str]:
+        """推荐理由：该菜品上权重贡献最大的独热特征"""
+        features = self.features
+        columns = features.reason_columns
+        contributions = features.matrix[dish_id, columns] * weights[columns]
+        if not len(contributions) or contributions.max() <= 0:
+            return DEFAULT_REASON
+        field, value = features.labels[columns[int(contributions.argmax())]]
+        category, template = REASONS[field]
+        return category, template.format(value=value, skill_level=skill_level)
+
+    def nutrition_score(self, dish_id: int) -> int:
+        """营养评分（60-95）：清淡程度和蛋白质含量各占一半"""
+        features = self.features
+        row = features.matrix[dish_id]
+        light = row[features.columns[('numeric', 'light')]]
+        protein = row[features.columns[('numeric', 'protein')]]
+        return int(round(60 + 35 * (0.5 * light + 0.5 * protein)))
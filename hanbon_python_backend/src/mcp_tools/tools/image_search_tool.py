@@ -8,13 +8,14 @@
 """
 
 import asyncio
-import aiohttp
 import logging
 from typing import Dict, Any, List, Optional
 from urllib import parse
-from bs4 import BeautifulSoup
 from pydantic import BaseModel
 from ..base_tool import BaseMCPTool
+from ..execution_policy import ExecutionPolicy, TransientToolError, TRANSIENT_ERRORS
+from .bing_html_parser import extract_images, is_valid_image_url, resolve_backend
+from .image_validation import ImageValidator
 
 logger = logging.getLogger(__name__)
 
@@ -23,10 +24,13 @@ class ImageResult(BaseModel):
     url: str
     title: str
     source: str
+    thumbnail: Optional[str] = None
 
 class ImageSearchTool(BaseMCPTool):
     """Bing图片搜索工具"""
     
+    execution_policy = ExecutionPolicy(timeout=10.0, max_retries=1)
+    
     def __init__(self, name: str, description: str, **config):
         super().__init__(name, description, **config)
         self.category = "search"
@@ -34,6 +38,14 @@ class ImageSearchTool(BaseMCPTool):
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/84.0.4147.105 Safari/537.36"
         }
+        # 结果页解析后端：auto/selectolax/lxml/stream/bs4
+        self.html_parser = resolve_backend(config.get('html_parser', 'auto'))
+        # 可选的结果校验：探测失效链接、按URL和感知哈希去重（配置值可能是环境变量字符串）
+        self.validate_images = str(config.get('validate_images') or '').lower() in ('1', 'true', 'yes')
+        self.image_validator = ImageValidator(
+            concurrency=int(config.get('validate_concurrency') or 8),
+            timeout=float(config.get('validate_timeout') or 3.0)
+        )
         
     async def execute(self, **parameters) -> Dict[str, Any]:
         """
@@ -42,6 +54,7 @@ class ImageSearchTool(BaseMCPTool):
         Args:
             query: 搜索关键词
             count: 图片数量，默认10
+            validate: 是否探测链接有效性并去除重复图片，默认取配置 validate_images
             
         Returns:
             搜索结果
@@ -49,6 +62,9 @@ class ImageSearchTool(BaseMCPTool):
         try:
             query = parameters.get('query', '')
             count = parameters.get('count', 10)
+            validate = parameters.get('validate')
+            if validate is None:
+                validate = self.validate_images
             
             if not query.strip():
                 return {
@@ -58,7 +74,7 @@ class ImageSearchTool(BaseMCPTool):
                 }
             
             # 执行Bing图片搜索
-            images = await self._bing_crawler(query, count)
+            images = await self._bing_crawler(query, count, validate)
             
             if images:
                 return {
@@ -77,6 +93,8 @@ class ImageSearchTool(BaseMCPTool):
                     "message": f"未找到关于'{query}'的图片"
                 }
                 
+        except TRANSIENT_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"图片搜索失败: {e}")
             return {
@@ -86,13 +104,14 @@ class ImageSearchTool(BaseMCPTool):
                 "message": "图片搜索过程中发生错误"
             }
     
-    async def _bing_crawler(self, key_word: str, image_num: int) -> Optional[List[ImageResult]]:
+    async def _bing_crawler(self, key_word: str, image_num: int, validate: bool = False) -> Optional[List[ImageResult]]:
         """
         Bing图片爬虫核心方法
         
         Args:
             key_word: 搜索关键词
             image_num: 需要的图片数量
+            validate: 是否校验并去重（会多解析一些候选图片）
             
         Returns:
             图片搜索结果列表或None
@@ -110,121 +129,49 @@ class ImageSearchTool(BaseMCPTool):
             logger.info(f"开始搜索图片: {key_word}, URL: {url}")
             
             # 异步请求
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        logger.error(f"Bing请求失败: {response.status}")
-                        return None
-                    
-                    html_content = await response.text()
-            
-            # 解析HTML
-            soup = BeautifulSoup(html_content, "html.parser")
-            results = []
-            
-            # 查找图片容器
-            image_containers = soup.select('.iusc')
-            
-            if not image_containers:
-                logger.warning(f"未找到图片容器，可能页面结构已变化")
-                # 尝试其他选择器
-                image_containers = soup.select('[data-src]') or soup.select('img[src]')
+            session = self.get_http_session()
+            async with session.get(url, headers=self.headers, timeout=self.client_timeout()) as response:
+                if response.status >= 500:
+                    raise TransientToolError(f"Bing请求失败: {response.status}")
+                if response.status != 200:
+                    logger.error(f"Bing请求失败: {response.status}")
+                    return None
+                
+                html_content = await response.text()
             
-            for container in image_containers:
-                try:
-                    # 尝试多种方式提取图片URL
-                    img_url = self._extract_image_url(container)
-                    title = self._extract_image_title(container)
-                    
-                    if img_url and self._is_valid_image_url(img_url):
-                        results.append(ImageResult(
-                            url=img_url,
-                            title=title or f"{key_word}相关图片",
-                            source="bing"
-                        ))
-                        
-                        if len(results) >= image_num:
-                            break
-                            
-                except Exception as e:
-                    logger.debug(f"解析单个图片失败: {e}")
-                    continue
+            # 在CPU任务池中解析HTML，得到足够数量的有效图片后即停止
+            candidate_num = query_params['count'] if validate else image_num
+            images = await self.run_cpu(
+                extract_images, html_content, candidate_num, is_valid_image_url, self.html_parser
+            )
+            results = [
+                ImageResult(url=img_url, title=title or f"{key_word}相关图片", source="bing", thumbnail=thumbnail)
+                for img_url, title, thumbnail in images
+            ]
+            
+            if validate and results:
+                valid = await self.image_validator.validate(
+                    session,
+                    [img.dict() for img in results],
+                    image_num,
+                    self.run_cpu,
+                    self.client_timeout(self.image_validator.timeout)
+                )
+                logger.info(f"图片校验: {len(results)} 张候选，保留 {len(valid)} 张")
+                results = [ImageResult(**img) for img in valid]
             
             logger.info(f"成功解析到 {len(results)} 张图片")
             return results if results else None
             
+        except TRANSIENT_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Bing图片爬虫失败: {e}")
             return None
     
-    def _extract_image_url(self, container) -> Optional[str]:
-        """从容器中提取图片URL"""
-        try:
-            # 方法1: 从href中解析
-            if container.get('href'):
-                href = container.get('href')
-                decoded_href = parse.unquote(href)
-                
-                # 查找mediaurl参数
-                if 'mediaurl=' in decoded_href:
-                    parts = decoded_href.split('mediaurl=')
-                    if len(parts) > 1:
-                        media_url = parts[1].split('&')[0]
-                        return media_url
-            
-            # 方法2: 从data-src属性提取  
-            if container.get('data-src'):
-                return container.get('data-src')
-            
-            # 方法3: 从src属性提取
-            if container.get('src'):
-                return container.get('src')
-            
-            # 方法4: 查找子元素img标签
-            img_tag = container.find('img')
-            if img_tag:
-                return img_tag.get('src') or img_tag.get('data-src')
-                
-        except Exception as e:
-            logger.debug(f"提取图片URL失败: {e}")
-            
-        return None
-    
-    def _extract_image_title(self, container) -> str:
-        """提取图片标题"""
-        try:
-            # 尝试多种方式获取标题
-            title = (
-                container.get('alt') or 
-                container.get('title') or 
-                container.get('aria-label') or
-                ""
-            )
-            
-            # 如果容器没有标题，尝试查找子元素
-            if not title:
-                img_tag = container.find('img')
-                if img_tag:
-                    title = img_tag.get('alt') or img_tag.get('title') or ""
-            
-            return title.strip()
-            
-        except Exception:
-            return ""
-    
     def _is_valid_image_url(self, url: str) -> bool:
         """验证是否为有效的图片URL"""
-        if not url or len(url) < 10:
-            return False
-        
-        # 检查是否包含图片文件扩展名或图片相关参数
-        image_indicators = [
-            '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp',
-            'images/', '/image/', 'photo', 'pic'
-        ]
-        
-        url_lower = url.lower()
-        return any(indicator in url_lower for indicator in image_indicators)
+        return is_valid_image_url(url)
     
     def get_parameters_schema(self) -> Dict[str, Any]:
         """获取参数模式"""
@@ -241,6 +188,10 @@ class ImageSearchTool(BaseMCPTool):
                     "default": 10,
                     "minimum": 1,
                     "maximum": 50
+                },
+                "validate": {
+                    "type": "boolean",
+                    "description": "是否探测图片链接有效性并去除重复图片，不传时使用服务端配置"
                 }
             },
             "required": ["query"]
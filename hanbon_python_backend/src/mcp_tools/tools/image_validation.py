@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: image_validation.py
+@description: 图片搜索结果的可用性探测与去重（HEAD探测 + 感知哈希，按URL缓存）
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import io
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Awaitable, Callable, List, Optional, Tuple
+from urllib import parse
+
+import aiohttp
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# 部分站点不支持HEAD，返回这些状态码时改用只取1字节的GET
+_HEAD_UNSUPPORTED = (403, 405, 501)
+
+
+def canonical_url(url: str) -> str:
+    """用于去重的URL：协议和主机名小写，去掉片段"""
+    parts = parse.urlsplit(url.strip())
+    return parse.urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, ''))
+
+
+def dhash(data: bytes, size: int = 8) -> int:
+    """
+    计算图片的差值哈希（dHash）
+
+    缩放为 (size+1)×size 的灰度图，比较每行相邻像素的明暗，得到 size*size 位整数。
+    模块级函数，可提交到CPU任务池（包括进程池）执行。
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        pixels = list(image.convert('L').resize((size + 1, size), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个哈希值不同的位数"""
+    return bin(a ^ b).count('1')
+
+
+@dataclass
+class ProbeResult:
+    """单个图片URL的探测结果"""
+    ok: bool
+    content_type: str = ''
+    content_length: Optional[int] = None
+    phash: Optional[int] = None
+
+
+class ImageValidator:
+    """
+    图片URL校验与去重
+
+    - 并发探测候选URL（HEAD，不支持时退回1字节GET），丢弃失效链接和非图片响应；
+    - 丢弃重复URL，并按缩略图的感知哈希丢弃内容相同或近似的图片；
+    - 探测结果按URL缓存（LRU + TTL），失效链接以较短的TTL做负缓存。
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 8,
+        timeout: float = 3.0,
+        ttl: float = 6 * 3600,
+        negative_ttl: float = 1800,
+        max_entries: int = 5000,
+        hash_distance: int = 6,
+        max_hash_bytes: int = 512 * 1024
+    ):
+        """
+        初始化校验器
+
+        Args:
+            concurrency: 同时进行的探测请求数上限
+            timeout: 单个探测请求的超时时间（秒）
+            ttl: 有效图片探测结果的缓存时间（秒）
+            negative_ttl: 失效链接的缓存时间（秒）
+            max_entries: 最多缓存的URL数
+            hash_distance: 感知哈希相差不超过该位数时视为同一张图片
+            max_hash_bytes: 没有缩略图时，原图不超过该大小才下载计算哈希
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hash_distance = hash_distance
+        self.max_hash_bytes = max_hash_bytes
+        # 规范化URL -> (过期时间, 探测结果)
+        self._entries: "OrderedDict[str, Tuple[float, ProbeResult]]" = OrderedDict()
+
+        self.probes = 0
+        self.cache_hits = 0
+        self.dropped_dead = 0
+        self.dropped_duplicate_url = 0
+        self.dropped_duplicate_image = 0
+
+    async def validate(
+        self,
+        session: aiohttp.ClientSession,
+        candidates: List[Dict[str, Any]],
+        limit: int,
+        run_cpu: Callable[..., Awaitable[Any]],
+        timeout: Optional[aiohttp.ClientTimeout] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        校验并去重候选图片，保持原顺序
+
+        Args:
+            session: HTTP会话
+            candidates: 候选图片，包含 url 和可选的 thumbnail
+            limit: 最多返回的图片数
+            run_cpu: 执行CPU密集型函数的协程（计算感知哈希）
+            timeout: 探测请求的超时设置，默认使用 self.timeout
+
+        Returns:
+            通过校验的图片（按原顺序，最多 limit 张）
+        """
+        timeout = timeout or aiohttp.ClientTimeout(total=self.timeout)
+        unique, seen = [], set()
+        for candidate in candidates:
+            key = canonical_url(candidate['url'])
+            if key in seen:
+                self.dropped_duplicate_url += 1
+                continue
+            seen.add(key)
+            unique.append((key, candidate))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        probes = await asyncio.gather(*(
+            self._probe_cached(session, key, candidate, semaphore, run_cpu, timeout)
+            for key, candidate in unique
+        ))
+
+        results, hashes = [], []
+        for (_, candidate), probe in zip(unique, probes):
+            if not probe.ok:
+                self.dropped_dead += 1
+                continue
+            if probe.phash is not None:
+                if any(hamming_distance(probe.phash, h) <= self.hash_distance for h in hashes):
+                    self.dropped_duplicate_image += 1
+                    continue
+                hashes.append(probe.phash)
+            results.append(candidate)
+            if len(results) >= limit:
+                break
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取校验统计信息"""
+        return {
+            "entries": len(self._entries),
+            "probes": self.probes,
+            "cache_hits": self.cache_hits,
+            "dropped_dead": self.dropped_dead,
+            "dropped_duplicate_url": self.dropped_duplicate_url,
+            "dropped_duplicate_image": self.dropped_duplicate_image
+        }
+
+    # ---------- 内部方法 ----------
+
+    async def _probe_cached(
+        self,
+        session: aiohttp.ClientSession,
+        key: str,
+        candidate: Dict[str, Any],
+        semaphore: asyncio.Semaphore,
+        run_cpu: Callable[..., Awaitable[Any]],
+        timeout: aiohttp.ClientTimeout
+    ) -> ProbeResult:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.cache_hits += 1
+            return entry[1]
+
+        self.probes += 1
+        async with semaphore:
+            try:
+                probe = await self._probe(session, candidate['url'], timeout)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                logger.debug(f"图片探测失败 {candidate['url']}: {e}")
+                probe = ProbeResult(ok=False)
+            if probe.ok:
+                try:
+                    probe.phash = await self._image_hash(session, candidate, probe, run_cpu, timeout)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logger.debug(f"下载缩略图失败 {candidate['url']}: {e}")
+
+        ttl = self.ttl if probe.ok else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, probe)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return probe
+
+    async def _probe(self, session: aiohttp.ClientSession, url: str, timeout: aiohttp.ClientTimeout) -> ProbeResult:
+        """HEAD探测，站点不支持HEAD时只请求第1个字节"""
+        async with session.head(url, allow_redirects=True, timeout=timeout) as response:
+            status, headers = response.status, response.headers
+        if status in _HEAD_UNSUPPORTED:
+            async with session.get(
+                url, headers={'Range': 'bytes=0-0'}, allow_redirects=True, timeout=timeout
+            ) as response:
+                status, headers = response.status, response.headers
+
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        length = headers.get('Content-Length')
+        ok = status < 400 and (not content_type or content_type.startswith('image/')
+                               or content_type == 'application/octet-stream')
+        return ProbeResult(
+            ok=ok,
+            content_type=content_type,
+            content_length=int(length) if length and length.isdigit() and status != 206 else None
+        )
+
+    async def _image_hash(
+        self,
+        session: aiohttp.ClientSession,
+        candidate: Dict[str, Any],
+        probe: ProbeResult,
+        run_cpu: Callable[..., Awaitable[Any]],
+        timeout: aiohttp.ClientTimeout
+    ) -> Optional[int]:
+        """下载缩略图（没有时下载较小的原图）计算感知哈希，失败时返回None"""
+        source = candidate.get('thumbnail')
+        if not source:
+            if probe.content_length is None or probe.content_length > self.max_hash_bytes:
+                return None
+            source = candidate['url']
+
+        async with session.get(source, allow_redirects=True, timeout=timeout) as response:
+            if response.status != 200:
+                return None
+            data = await response.content.read(self.max_hash_bytes + 1)
+        if len(data) > self.max_hash_bytes:
+            return None
+        try:
+            return await run_cpu(dhash, data)
+        except Exception as e:
+            logger.debug(f"计算图片哈希失败 {source}: {e}")
+            return None
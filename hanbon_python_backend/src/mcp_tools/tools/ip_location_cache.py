@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: ip_location_cache.py
+@description: IP定位缓存（按网段缓存 + 本地IP段数据库）
+@author: AI Assistant
+@created: 2024
+"""
+
+import bisect
+import csv
+import ipaddress
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 同一网段内的IP定位结果视为相同（IPv4按/24，IPv6按/48）
+IPV4_PREFIX = 24
+IPV6_PREFIX = 48
+
+
+def prefix_key(ip: str) -> Tuple[int, int]:
+    """返回IP所在网段的缓存键 (IP版本, 网段起始地址)，IP无效时抛出 ValueError"""
+    address = ipaddress.ip_address(ip.strip())
+    prefix = IPV4_PREFIX if address.version == 4 else IPV6_PREFIX
+    network = ipaddress.ip_network(f"{address}/{prefix}", strict=False)
+    return address.version, int(network.network_address)
+
+
+def is_unroutable(ip: str) -> bool:
+    """内网、回环、链路本地、保留等无法定位的地址"""
+    address = ipaddress.ip_address(ip.strip())
+    return not address.is_global
+
+
+class IPRangeDatabase:
+    """
+    本地IP段数据库
+
+    每个IP版本维护按起始地址排序的不重叠区间数组，查询时用 bisect 二分定位，O(log n)。
+    """
+
+    def __init__(self):
+        # IP版本 -> (起始地址列表, 结束地址列表, 位置信息列表)
+        self._ranges: Dict[int, Tuple[List[int], List[int], List[Dict[str, Any]]]] = {
+            4: ([], [], []),
+            6: ([], [], [])
+        }
+
+    def __len__(self) -> int:
+        return sum(len(starts) for starts, _, _ in self._ranges.values())
+
+    def load_csv(self, path: str) -> int:
+        """
+        从CSV批量加载IP段
+
+        CSV需包含表头，IP段用 start_ip,end_ip 或 cidr 列表示，位置信息列为
+        province,city,adcode,rectangle（与高德IP定位接口字段一致）。
+
+        Returns:
+            成功加载的IP段数量
+        """
+        rows: Dict[int, List[Tuple[int, int, Dict[str, Any]]]] = {4: [], 6: []}
+        skipped = 0
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                try:
+                    if row.get('cidr'):
+                        network = ipaddress.ip_network(row['cidr'].strip(), strict=False)
+                        version = network.version
+                        start, end = int(network.network_address), int(network.broadcast_address)
+                    else:
+                        first = ipaddress.ip_address(row['start_ip'].strip())
+                        last = ipaddress.ip_address(row['end_ip'].strip())
+                        if first.version != last.version or int(first) > int(last):
+                            raise ValueError("起止地址不匹配")
+                        version, start, end = first.version, int(first), int(last)
+                except (KeyError, ValueError, AttributeError):
+                    skipped += 1
+                    continue
+
+                location = {
+                    field: (row.get(field) or '').strip()
+                    for field in ('province', 'city', 'adcode', 'rectangle')
+                }
+                rows[version].append((start, end, location))
+
+        loaded = 0
+        for version, items in rows.items():
+            if not items:
+                continue
+            starts, ends, locations = self._ranges[version]
+            merged = sorted(list(zip(starts, ends, locations)) + items, key=lambda item: item[0])
+
+            new_starts, new_ends, new_locations = [], [], []
+            for start, end, location in merged:
+                if new_ends and start <= new_ends[-1]:
+                    # 与上一个区间重叠，保留先出现的区间
+                    skipped += 1
+                    continue
+                new_starts.append(start)
+                new_ends.append(end)
+                new_locations.append(location)
+            loaded += len(new_starts) - len(starts)
+            self._ranges[version] = (new_starts, new_ends, new_locations)
+
+        logger.info(f"加载IP段数据库 {path}: {loaded} 条，跳过 {skipped} 条")
+        return loaded
+
+    def lookup(self, ip: str) -> Optional[Dict[str, Any]]:
+        """查找IP所在区间的位置信息"""
+        address = ipaddress.ip_address(ip.strip())
+        starts, ends, locations = self._ranges[address.version]
+        value = int(address)
+        index = bisect.bisect_right(starts, value) - 1
+        if index >= 0 and value <= ends[index]:
+            return locations[index]
+        return None
+
+
+class IPLocationCache:
+    """
+    IP定位结果缓存
+
+    按网段缓存上游定位结果（LRU + TTL）；无法定位的结果以较短的TTL做负缓存，
+    内网/保留地址不请求上游直接返回。可选加载本地IP段数据库，命中时完全离线。
+    """
+
+    def __init__(
+        self,
+        ttl: float = 24 * 3600,
+        negative_ttl: float = 3600,
+        max_entries: int = 10000,
+        range_db_path: Optional[str] = None
+    ):
+        """
+        初始化缓存
+
+        Args:
+            ttl: 定位成功结果的缓存时间（秒）
+            negative_ttl: 无法定位结果的缓存时间（秒）
+            max_entries: 最多缓存的网段数
+            range_db_path: 本地IP段数据库CSV路径
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # 缓存键 -> (过期时间, 定位结果)
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.range_db = IPRangeDatabase()
+        if range_db_path:
+            try:
+                self.range_db.load_csv(range_db_path)
+            except OSError as e:
+                logger.warning(f"IP段数据库加载失败: {e}")
+
+        self.hits = 0
+        self.misses = 0
+        self.range_db_hits = 0
+
+    def get(self, ip: str) -> Optional[Dict[str, Any]]:
+        """获取缓存的定位结果（包括负缓存），未命中或已过期时返回None"""
+        key = prefix_key(ip)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, ip: str, result: Dict[str, Any]):
+        """缓存定位结果，定位失败或没有坐标的结果按负缓存TTL保存"""
+        positive = result.get('success') and result.get('center_coordinates')
+        ttl = self.ttl if positive else self.negative_ttl
+        key = prefix_key(ip)
+        self._entries[key] = (time.monotonic() + ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def lookup_range_db(self, ip: str) -> Optional[Dict[str, Any]]:
+        """在本地IP段数据库中查找"""
+        if not len(self.range_db):
+            return None
+        location = self.range_db.lookup(ip)
+        if location is not None:
+            self.range_db_hits += 1
+        return location
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "range_db_ranges": len(self.range_db),
+            "hits": self.hits,
+            "misses": self.misses,
+            "range_db_hits": self.range_db_hits,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: poi_index.py
+@description: 高德POI本地索引（按线上查询的覆盖范围复用历史结果）
+@author: AI Assistant
+@created: 2024
+"""
+
+import math
+import time
+from collections import deque
+from itertools import islice
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+_EARTH_RADIUS = 6371000.0
+
+
+def haversine_distance(lng1: float, lat1: float, lng2: float, lat2: float) -> float:
+    """计算两点间的球面距离（米）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * _EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def _type_prefix(poi_type: str) -> str:
+    """POI类型码前缀：'050000' -> '05'，'050100' -> '0501'"""
+    prefix = poi_type.strip()
+    while prefix.endswith('00') and len(prefix) > 2:
+        prefix = prefix[:-2]
+    return prefix
+
+
+@dataclass
+class PoiRecord:
+    """索引中的单个POI"""
+    poi: Dict[str, Any]
+    lng: float
+    lat: float
+    indexed_at: float
+
+
+@dataclass
+class _Coverage:
+    """一次线上查询覆盖的范围，用于判断本地索引能否独立回答"""
+    fetched_at: float
+    lng: float = 0.0
+    lat: float = 0.0
+    radius: float = 0.0
+    poi_ids: List[str] = field(default_factory=list)
+
+
+class PoiIndex:
+    """
+    高德POI本地索引
+
+    由历史高德响应喂入。每次线上查询记录其覆盖范围（周边搜索为圆，关键词搜索为
+    城市+关键词）和返回的POI，只有当新查询完全落在一个未过期的覆盖范围内时才由本地
+    回答，且只从该次查询返回的POI中按距离、类型筛选。高德按类别和语义匹配关键词
+    （如"美食"匹配所有餐厅），本地不再按文本重新匹配，保证结果与线上一致。
+    """
+
+    def __init__(
+        self,
+        refresh_after: float = 6 * 3600,
+        max_age: float = 24 * 3600,
+        max_pois: int = 50000,
+        page_size: int = 20
+    ):
+        """
+        初始化索引
+
+        Args:
+            refresh_after: 覆盖范围超过该时长（秒）后返回本地结果并触发后台刷新
+            max_age: 覆盖范围超过该时长（秒）后不再使用本地结果
+            max_pois: 索引中保留的最大POI数量
+            page_size: 线上单页返回数量，用于判断结果是否被截断
+        """
+        self.refresh_after = refresh_after
+        self.max_age = max_age
+        self.max_pois = max_pois
+        self.page_size = page_size
+
+        # POI ID -> 记录，按写入顺序排列（重新写入的POI移到末尾），淘汰时从头部取
+        self._pois: Dict[str, PoiRecord] = {}
+        # 覆盖记录：周边搜索按 (关键词, 类型)，关键词搜索按 (城市, 关键词, 类型)
+        self._around_coverage: Dict[Tuple[str, str], deque] = {}
+        self._text_coverage: Dict[Tuple[str, str, str], _Coverage] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._pois)
+
+    # ---------- 写入 ----------
+
+    def ingest(self, pois: List[Dict[str, Any]], now: Optional[float] = None) -> List[str]:
+        """
+        写入一批高德POI（原始响应中的 pois 列表）
+
+        Returns:
+            成功写入的POI ID列表（保持原顺序）
+        """
+        now = now or time.time()
+        ids = []
+        for poi in pois:
+            poi_id = poi.get('id')
+            location = poi.get('location') or ''
+            if not poi_id or ',' not in location:
+                continue
+            try:
+                lng, lat = (float(v) for v in location.split(',')[:2])
+            except ValueError:
+                continue
+
+            # 重新写入的POI移到末尾
+            self._pois.pop(poi_id, None)
+            self._pois[poi_id] = PoiRecord(poi=poi, lng=lng, lat=lat, indexed_at=now)
+            ids.append(poi_id)
+
+        if len(self._pois) > self.max_pois:
+            self._evict(len(self._pois) - self.max_pois)
+        return ids
+
+    def record_around_query(
+        self,
+        keyword: str,
+        poi_type: str,
+        lng: float,
+        lat: float,
+        radius: float,
+        pois: List[Dict[str, Any]],
+        now: Optional[float] = None
+    ):
+        """写入周边搜索结果并记录其覆盖范围"""
+        now = now or time.time()
+        ids = self.ingest(pois, now)
+
+        # 结果按距离排序且被截断时，只有最远结果以内的范围是完整的
+        covered_radius = radius
+        if len(pois) >= self.page_size:
+            distances = [self._parse_distance(p.get('distance')) for p in pois]
+            distances = [d for d in distances if d is not None]
+            if not distances:
+                return
+            covered_radius = min(radius, max(distances))
+
+        key = (keyword.lower(), poi_type)
+        coverages = self._around_coverage.setdefault(key, deque(maxlen=64))
+        coverages.append(_Coverage(fetched_at=now, lng=lng, lat=lat, radius=covered_radius, poi_ids=ids))
+
+    def record_text_query(
+        self,
+        city: str,
+        keyword: str,
+        poi_type: str,
+        pois: List[Dict[str, Any]],
+        now: Optional[float] = None
+    ):
+        """写入关键词搜索结果并记录结果顺序"""
+        now = now or time.time()
+        ids = self.ingest(pois, now)
+        self._text_coverage[(city, keyword.lower(), poi_type)] = _Coverage(fetched_at=now, poi_ids=ids)
+
+    # ---------- 查询 ----------
+
+    def search_around(
+        self,
+        keyword: str,
+        poi_type: str,
+        lng: float,
+        lat: float,
+        radius: float,
+        limit: Optional[int] = None,
+        now: Optional[float] = None
+    ) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """
+        本地回答周边搜索
+
+        Returns:
+            (按距离排序的POI列表, 是否需要后台刷新)；无法本地回答时返回None
+        """
+        now = now or time.time()
+        coverage = self._find_around_coverage(keyword.lower(), poi_type, lng, lat, radius, now)
+        if coverage is None:
+            self.misses += 1
+            return None
+
+        # 覆盖记录中的POI即线上对该关键词的匹配结果，只需按类型和距离筛选
+        type_prefix = _type_prefix(poi_type) if poi_type else ''
+        results = []
+        for poi_id in dict.fromkeys(coverage.poi_ids):
+            record = self._pois[poi_id]
+            if type_prefix and not self._match_type(record, type_prefix):
+                continue
+            distance = haversine_distance(lng, lat, record.lng, record.lat)
+            if distance <= radius:
+                results.append((distance, record))
+
+        results.sort(key=lambda item: item[0])
+        limit = limit or self.page_size
+        pois = []
+        for distance, record in results[:limit]:
+            poi = dict(record.poi)
+            poi['distance'] = str(int(distance))
+            pois.append(poi)
+
+        self.hits += 1
+        return pois, now - coverage.fetched_at >= self.refresh_after
+
+    def search_text(
+        self,
+        city: str,
+        keyword: str,
+        poi_type: str,
+        now: Optional[float] = None,
+        complete: bool = False
+    ) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """
+        本地回答关键词搜索（复用同一城市+关键词的历史结果及顺序）
+
+        complete 为 True 时只在历史首页未满一页（即线上没有更多结果）时回答。
+
+        Returns:
+            (POI列表, 是否需要后台刷新)；无法本地回答时返回None
+        """
+        now = now or time.time()
+        coverage = self._text_coverage.get((city, keyword.lower(), poi_type))
+        if coverage is None or now - coverage.fetched_at > self.max_age:
+            self.misses += 1
+            return None
+        if complete and len(coverage.poi_ids) >= self.page_size:
+            self.misses += 1
+            return None
+
+        pois = [self._pois[poi_id].poi for poi_id in coverage.poi_ids if poi_id in self._pois]
+        if len(pois) < len(coverage.poi_ids):
+            # 部分POI已被淘汰，结果不完整
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return pois, now - coverage.fetched_at >= self.refresh_after
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计信息"""
+        total = self.hits + self.misses
+        return {
+            "pois": len(self._pois),
+            "around_coverages": sum(len(c) for c in self._around_coverage.values()),
+            "text_coverages": len(self._text_coverage),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    # ---------- 内部方法 ----------
+
+    def _find_around_coverage(
+        self,
+        keyword: str,
+        poi_type: str,
+        lng: float,
+        lat: float,
+        radius: float,
+        now: float
+    ) -> Optional[_Coverage]:
+        """查找完全包含查询圆、未过期且结果POI都还在索引中的覆盖记录（取最新的一条）"""
+        coverages = self._around_coverage.get((keyword, poi_type))
+        if not coverages:
+            return None
+
+        best = None
+        for coverage in coverages:
+            if now - coverage.fetched_at > self.max_age:
+                continue
+            center_distance = haversine_distance(lng, lat, coverage.lng, coverage.lat)
+            if center_distance + radius > coverage.radius:
+                continue
+            if best is not None and coverage.fetched_at <= best.fetched_at:
+                continue
+            # 部分POI已被淘汰，本地结果会不完整
+            if any(poi_id not in self._pois for poi_id in coverage.poi_ids):
+                continue
+            best = coverage
+        return best
+
+    @staticmethod
+    def _match_type(record: PoiRecord, type_prefix: str) -> bool:
+        typecode = str(record.poi.get('typecode') or '')
+        return any(code.startswith(type_prefix) for code in typecode.split('|'))
+
+    @staticmethod
+    def _parse_distance(distance: Any) -> Optional[float]:
+        try:
+            return float(distance)
+        except (TypeError, ValueError):
+            return None
+
+    def _evict(self, count: int):
+        """淘汰最早写入的POI（字典头部）"""
+        for poi_id in list(islice(self._pois, count)):
+            del self._pois[poi_id]
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: poi_ranking.py
+@description: 餐厅搜索结果的向量化排序（距离、评分、价格、偏好匹配）
+@author: AI Assistant
+@created: 2024
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence
+
+import numpy as np
+
+# 口味关键词（匹配POI名称、类型和标签）
+SPICY_KEYWORDS = ('辣', '麻', '川菜', '湘菜', '火锅', '串串', '冒菜', '烧烤', '小龙虾')
+LIGHT_KEYWORDS = ('粤菜', '清淡', '粥', '蒸', '素', '日本料理', '沙拉', '汤')
+VEGETARIAN_KEYWORDS = ('素食', '素菜', '斋', '蔬')
+
+# 缺失数据时的中性分
+_NEUTRAL = 0.5
+
+
+@dataclass(frozen=True)
+class RankingWeights:
+    """各项得分的权重"""
+    distance: float = 0.35
+    rating: float = 0.35
+    price: float = 0.15
+    preference: float = 0.15
+
+
+def _to_float_array(values: Sequence[Any]) -> np.ndarray:
+    """将高德返回的数字字符串批量转换为浮点数组，空值（''、None、[]）或无效值为NaN"""
+    array = np.empty(len(values), dtype=object)
+    array[:] = [v or '' for v in values]
+    array[array == ''] = np.nan
+    try:
+        return array.astype(float)
+    except (TypeError, ValueError):
+        # 存在无法解析的值时逐个转换
+        result = np.full(len(array), np.nan)
+        for i, value in enumerate(array):
+            try:
+                result[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return result
+
+
+def _keyword_mask(texts: np.ndarray, keywords: Sequence[str]) -> np.ndarray:
+    """返回每个文本是否包含任一关键词的布尔数组"""
+    mask = np.zeros(len(texts), dtype=bool)
+    for keyword in keywords:
+        mask |= np.char.find(texts, keyword) >= 0
+    return mask
+
+
+def extract_features(pois: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """从原始POI列表中提取排序所需的特征数组"""
+    # 高德在字段缺失时可能返回空列表而不是空字典
+    biz_exts = [p.get('biz_ext') or {} for p in pois]
+    biz_exts = [b if isinstance(b, dict) else {} for b in biz_exts]
+    texts = np.array([
+        f"{p.get('name', '')} {p.get('type', '')} {b.get('tag') or ''}"
+        for p, b in zip(pois, biz_exts)
+    ], dtype=str)
+    return {
+        "distance": _to_float_array([p.get('distance') for p in pois]),
+        "rating": _to_float_array([b.get('rating') for b in biz_exts]),
+        "cost": _to_float_array([b.get('cost') for b in biz_exts]),
+        "text": texts
+    }
+
+
+def score_features(
+    features: Dict[str, np.ndarray],
+    preferences: Optional[Dict[str, Any]] = None,
+    max_distance: Optional[float] = None,
+    weights: Optional[RankingWeights] = None
+) -> np.ndarray:
+    """
+    批量计算综合得分（0~1）
+
+    Args:
+        features: extract_features 的结果
+        preferences: 用户偏好，支持 spicy_preference(high/low)、diet_type、
+            budget(人均预算，元)、cuisine_preferences(菜系列表)
+        max_distance: 距离得分归零的距离（米），默认取结果中的最大距离
+        weights: 各项得分的权重
+    """
+    preferences = preferences or {}
+    weights = weights or RankingWeights()
+    distance, rating, cost, texts = features["distance"], features["rating"], features["cost"], features["text"]
+    count = len(texts)
+    if count == 0:
+        return np.zeros(0)
+
+    # 距离：越近越好
+    if max_distance is None:
+        max_distance = np.nanmax(distance) if not np.all(np.isnan(distance)) else 0.0
+    if max_distance and max_distance > 0:
+        distance_score = 1.0 - np.clip(distance / max_distance, 0.0, 1.0)
+    else:
+        distance_score = np.full(count, _NEUTRAL)
+    distance_score = np.where(np.isnan(distance), _NEUTRAL, distance_score)
+
+    # 评分：按5分制归一化，未评分取中性分
+    rating_score = np.where(np.isnan(rating) | (rating <= 0), _NEUTRAL, np.clip(rating / 5.0, 0.0, 1.0))
+
+    # 价格：有预算时超出预算按比例扣分，否则人均越低越好
+    budget = preferences.get('budget')
+    try:
+        budget = float(budget) if budget else None
+    except (TypeError, ValueError):
+        budget = None
+    if budget:
+        price_score = np.exp(-np.clip(cost - budget, 0.0, None) / budget)
+    else:
+        price_score = 1.0 - np.clip(cost / 200.0, 0.0, 1.0)
+    price_score = np.where(np.isnan(cost), _NEUTRAL, price_score)
+
+    # 偏好匹配
+    preference_score = np.full(count, _NEUTRAL)
+    spicy = preferences.get('spicy_preference')
+    if spicy == 'high':
+        preference_score = np.where(_keyword_mask(texts, SPICY_KEYWORDS), 1.0, 0.3)
+    elif spicy == 'low':
+        spicy_mask = _keyword_mask(texts, SPICY_KEYWORDS)
+        light_mask = _keyword_mask(texts, LIGHT_KEYWORDS)
+        preference_score = np.where(light_mask, 1.0, np.where(spicy_mask, 0.0, _NEUTRAL))
+    if preferences.get('diet_type') == 'vegetarian':
+        preference_score = np.where(_keyword_mask(texts, VEGETARIAN_KEYWORDS), 1.0, preference_score * 0.5)
+    cuisines = preferences.get('cuisine_preferences') or []
+    if isinstance(cuisines, str):
+        cuisines = [cuisines]
+    # 空字符串会匹配所有POI，去掉
+    cuisines = [cuisine.strip() for cuisine in cuisines if isinstance(cuisine, str) and cuisine.strip()]
+    if cuisines:
+        preference_score = np.where(
+            _keyword_mask(texts, cuisines), np.maximum(preference_score, 0.9), preference_score
+        )
+
+    return (
+        weights.distance * distance_score
+        + weights.rating * rating_score
+        + weights.price * price_score
+        + weights.preference * preference_score
+    )
+
+
+def top_k_indices(scores: np.ndarray, top_k: Optional[int] = None) -> np.ndarray:
+    """按得分从高到低返回前 top_k 个下标，同分时保持原顺序"""
+    count = len(scores)
+    if top_k is None or top_k >= count:
+        candidates = np.arange(count)
+    else:
+        # 先用 argpartition 在 O(n) 内选出前k个，再只对这k个排序
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def rank_pois(
+    pois: List[Dict[str, Any]],
+    preferences: Optional[Dict[str, Any]] = None,
+    top_k: Optional[int] = None,
+    max_distance: Optional[float] = None,
+    weights: Optional[RankingWeights] = None
+) -> List[tuple]:
+    """
+    对原始POI排序
+
+    Returns:
+        [(POI, 得分), ...]，按得分从高到低
+    """
+    if not pois:
+        return []
+    scores = score_features(extract_features(pois), preferences, max_distance, weights)
+    return [(pois[i], float(scores[i])) for i in top_k_indices(scores, top_k)]
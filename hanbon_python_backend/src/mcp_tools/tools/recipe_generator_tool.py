@@ -13,12 +13,16 @@ from typing import Dict, Any, List, Optional
 from datetime import datetime
 import json
 from ..base_tool import BaseMCPTool
+from ..execution_policy import ExecutionPolicy
 
 logger = logging.getLogger(__name__)
 
 class RecipeGeneratorTool(BaseMCPTool):
     """AI菜谱生成工具类"""
     
+    # 大模型生成耗时较长，且重试成本高，不做自动重试
+    execution_policy = ExecutionPolicy(timeout=60.0)
+    
     def __init__(self, name: str, description: str, model_manager=None, **config):
         """
         初始化菜谱生成工具
@@ -123,7 +127,7 @@ class RecipeGeneratorTool(BaseMCPTool):
             recipe_text = response.choices[0].message.content
             
             # 解析生成的菜谱
-            parsed_recipe = self._parse_recipe_response(recipe_text, dish_name)
+            parsed_recipe = await self._parse_recipe_response(recipe_text, dish_name)
             
             # 添加营养信息估算
             nutrition_info = await self._estimate_nutrition(parsed_recipe["ingredients"])
@@ -203,7 +207,7 @@ class RecipeGeneratorTool(BaseMCPTool):
         
         return prompt
     
-    def _parse_recipe_response(self, recipe_text: str, dish_name: str) -> Dict[str, Any]:
+    async def _parse_recipe_response(self, recipe_text: str, dish_name: str) -> Dict[str, Any]:
         """
         解析AI生成的菜谱响应
         
@@ -220,7 +224,8 @@ class RecipeGeneratorTool(BaseMCPTool):
                 start = recipe_text.find("{")
                 end = recipe_text.rfind("}") + 1
                 json_text = recipe_text[start:end]
-                recipe_data = json.loads(json_text)
+                # 长文本的JSON解析放到CPU任务池中执行
+                recipe_data = await self.run_cpu(json.loads, json_text)
                 
                 # 添加额外信息
                 recipe_data["generated_time"] = datetime.now().isoformat()
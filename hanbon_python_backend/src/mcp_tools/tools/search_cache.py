@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: search_cache.py
+@description: 网页搜索结果缓存（查询归一化、SQLite持久化TTL缓存、并发请求合并、并发与配额控制）
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent.parent.parent / 'cache' / 'bing_search.db'
+
+# 分隔词语的标点（NFKC 之后全角标点已转为半角，这里再覆盖中文特有标点）。
+# + # . - _ / @ & ' * $ % 等可能是词的一部分（c++、c#、node.js、wi-fi），不作为分隔符
+_SEPARATORS = re.compile(r"[\s!\"(),:;<=>?\[\\\]^`{|}~、。，；：？！“”‘’《》〈〉「」『』【】（）〔〕…—～·]+")
+# 词首尾的这些符号不属于词（如句末的 "."、引号），+ # % $ 保留（c++、c#、50%）
+_EDGE_SYMBOLS = ".-_/@&'*"
+
+
+def normalize_query(query: str) -> str:
+    """
+    归一化搜索查询
+
+    全角转半角、忽略大小写，按空白和分隔词语的标点分词，去掉词首尾的符号后去重排序，
+    例如 "北京 烤鸭，推荐！" 与 "推荐  北京 烤鸭" 归一化结果相同；词内的 + # 等符号保留，
+    "c++ 教程" 与 "c# 教程" 不会归一化为同一个查询。
+    """
+    text = unicodedata.normalize('NFKC', query or '').lower()
+    tokens = {token.strip(_EDGE_SYMBOLS) for token in _SEPARATORS.split(text)}
+    tokens.discard('')
+    return ' '.join(sorted(tokens))
+
+
+class QuotaExceededError(Exception):
+    """搜索API本月配额已用完"""
+    pass
+
+
+class SearchQuota:
+    """
+    付费搜索API的调用控制
+
+    - 同时进行的上游请求不超过 max_concurrency；
+    - 相邻请求的发起间隔不小于 1/max_per_second（API按秒限流）；
+    - 按月统计调用次数（持久化在缓存数据库中，重启不清零），超过 monthly_limit 时拒绝调用；
+      有持久化时检查与记账是同一条 UPDATE，多个工作进程并发调用也不会超出配额。
+    """
+
+    def __init__(
+        self,
+        store: Optional["SearchResultCache"] = None,
+        monthly_limit: int = 0,
+        max_concurrency: int = 3,
+        max_per_second: float = 3.0
+    ):
+        """
+        Args:
+            store: 持久化调用计数的缓存（为空时只在内存中计数）
+            monthly_limit: 每月调用上限，0 表示不限
+            max_concurrency: 最大并发请求数
+            max_per_second: 每秒最多发起的请求数，0 表示不限
+        """
+        self.store = store
+        self.monthly_limit = monthly_limit
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pace_lock: Optional[asyncio.Lock] = None
+        self._next_start = 0.0
+        self._counts: Dict[str, int] = {}
+
+        self.rejected = 0
+        self.waiting = 0
+
+    @staticmethod
+    def period(now: Optional[float] = None) -> str:
+        """配额计费周期（自然月）"""
+        return datetime.fromtimestamp(now or time.time()).strftime('%Y-%m')
+
+    def used(self, period: Optional[str] = None) -> int:
+        """本周期已使用的调用次数（有持久化时读数据库，多个工作进程共享计数）"""
+        period = period or self.period()
+        if self.store:
+            return self.store.quota_used(period)
+        return self._counts.get(period, 0)
+
+    def remaining(self) -> Optional[int]:
+        """本周期剩余调用次数，不限额时返回None"""
+        if not self.monthly_limit:
+            return None
+        return max(0, self.monthly_limit - self.used())
+
+    async def call(self, fetcher: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        在并发、速率和配额限制下调用上游
+
+        调用次数在发起请求前记账（失败的请求同样计费）。
+
+        Raises:
+            QuotaExceededError: 本月配额已用完
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._pace_lock = asyncio.Lock()
+
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            await self._pace()
+            await self._charge()
+            return await fetcher()
+        finally:
+            self._semaphore.release()
+
+    async def _pace(self):
+        """保证相邻请求的发起间隔"""
+        if not self.min_interval:
+            return
+        async with self._pace_lock:
+            delay = self._next_start - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = time.monotonic() + self.min_interval
+
+    async def _charge(self):
+        period = self.period()
+        if self.store:
+            charged = await asyncio.to_thread(self.store.charge_quota, period, self.monthly_limit)
+        else:
+            charged = not self.monthly_limit or self._counts.get(period, 0) < self.monthly_limit
+            if charged:
+                self._counts[period] = self._counts.get(period, 0) + 1
+        if not charged:
+            self.rejected += 1
+            raise QuotaExceededError(f"搜索API本月配额已用完（{self.monthly_limit}次）")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取配额统计信息"""
+        return {
+            "period": self.period(),
+            "used": self.used(),
+            "monthly_limit": self.monthly_limit or None,
+            "remaining": self.remaining(),
+            "rejected": self.rejected,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency
+        }
+
+
+class SearchResultCache:
+    """
+    搜索结果缓存
+
+    以归一化查询为键，内存LRU在前、SQLite（WAL模式）持久化在后，进程重启和
+    多个工作进程之间共享；数据库读写在线程池中执行，不阻塞事件循环。过期条目保留到
+    stale_ttl，配额用完或上游故障时可作为降级结果返回，超过 stale_ttl 的条目在打开
+    数据库时及之后每隔 purge_interval 秒的写入时删除。同一查询的并发未命中只发起
+    一次上游请求。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = 6 * 3600,
+        stale_ttl: float = 7 * 24 * 3600,
+        max_entries: int = 1000,
+        purge_interval: float = 3600
+    ):
+        """
+        Args:
+            path: SQLite数据库文件，":memory:" 表示不持久化
+            ttl: 结果有效期（秒）
+            stale_ttl: 过期结果最多保留多久（秒），用于降级
+            max_entries: 内存中最多缓存的条目数
+            purge_interval: 删除超过保留期条目的间隔（秒）
+        """
+        self.path = str(path or DEFAULT_CACHE_PATH)
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        # 键 -> (结果, 获取时间)
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_served = 0
+
+    # ---------- 读取 ----------
+
+    async def get(self, key: str, allow_stale: bool = False, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """获取缓存结果；allow_stale 为真时返回 stale_ttl 内的过期结果"""
+        now = now or time.time()
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = await asyncio.to_thread(self._db_get, key)
+            if entry is None:
+                return None
+            self._remember(key, entry)
+        data, fetched_at = entry
+        age = now - fetched_at
+        if age >= self.stale_ttl or (age >= self.ttl and not allow_stale):
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    async def get_or_fetch(self, key: str, fetcher: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        读取缓存，未命中时调用 fetcher 获取并缓存
+
+        并发的相同请求共享同一个上游调用；单个调用方被取消不会取消共享的上游请求。
+        """
+        data = await self.get(key)
+        if data is not None:
+            self.hits += 1
+            return data
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._fetch_and_store(key, fetcher))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def get_stale(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取过期但仍在保留期内的结果（降级用）"""
+        data = await self.get(key, allow_stale=True)
+        if data is not None:
+            self.stale_served += 1
+        return data
+
+    # ---------- 写入 ----------
+
+    async def put(self, key: str, data: Dict[str, Any], now: Optional[float] = None):
+        """写入结果（内存和数据库）"""
+        now = now or time.time()
+        self._remember(key, (data, now))
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO results (key, data, fetched_at) VALUES (?, ?, ?)",
+            (key, json.dumps(data, ensure_ascii=False), now)
+        )
+        if now - self._last_purge >= self.purge_interval:
+            self._last_purge = now
+            purged = await asyncio.to_thread(self.purge_expired, now)
+            if purged:
+                logger.info(f"搜索缓存删除 {purged} 条过期结果")
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """删除超过保留期的条目，返回删除数量"""
+        cursor = self._execute("DELETE FROM results WHERE fetched_at < ?", ((now or time.time()) - self.stale_ttl,))
+        return cursor.rowcount if cursor else 0
+
+    # ---------- 配额计数 ----------
+
+    def quota_used(self, period: str) -> int:
+        cursor = self._execute("SELECT calls FROM quota WHERE period = ?", (period,))
+        row = cursor.fetchone() if cursor else None
+        return row[0] if row else 0
+
+    def charge_quota(self, period: str, limit: int = 0) -> bool:
+        """
+        本周期调用次数加一，limit 为 0 表示不限；已达上限时不记账并返回False
+
+        检查和加一在同一条 UPDATE 中完成，多个工作进程并发记账也不会超过上限。
+        数据库不可用时放行。
+        """
+        if self._execute("INSERT OR IGNORE INTO quota (period, calls) VALUES (?, 0)", (period,)) is None:
+            return True
+        if limit:
+            cursor = self._execute(
+                "UPDATE quota SET calls = calls + 1 WHERE period = ? AND calls < ?", (period, limit)
+            )
+        else:
+            cursor = self._execute("UPDATE quota SET calls = calls + 1 WHERE period = ?", (period,))
+        return cursor is None or cursor.rowcount > 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced_requests": self.coalesced,
+            "stale_served": self.stale_served,
+            "inflight": len(self._inflight),
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    def close(self):
+        with self._db_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    # ---------- 内部方法 ----------
+
+    async def _fetch_and_store(self, key: str, fetcher: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        data = await fetcher()
+        # 只缓存成功的结果
+        if data.get("success"):
+            await self.put(key, data)
+        return data
+
+    def _remember(self, key: str, entry: Tuple[Dict[str, Any], float]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        cursor = self._execute("SELECT data, fetched_at FROM results WHERE key = ?", (key,))
+        row = cursor.fetchone() if cursor else None
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0]), row[1]
+        except ValueError:
+            return None
+
+    def _execute(self, sql: str, params: Tuple = ()) -> Optional[sqlite3.Cursor]:
+        """执行SQL；数据库不可用时只记录警告，缓存退化为纯内存"""
+        with self._db_lock:
+            try:
+                if self._connection is None:
+                    self._connection = self._connect()
+                return self._connection.execute(sql, params)
+            except sqlite3.Error as e:
+                logger.warning(f"搜索缓存数据库操作失败: {e}")
+                return None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS results_fetched_at ON results (fetched_at)")
+        connection.execute("CREATE TABLE IF NOT EXISTS quota (period TEXT PRIMARY KEY, calls INTEGER NOT NULL)")
+        # 打开时清理超过保留期的条目（运行期间由 put 定期清理）
+        now = time.time()
+        connection.execute("DELETE FROM results WHERE fetched_at < ?", (now - self.stale_ttl,))
+        self._last_purge = now
+        return connection
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: similar_dishes_tool.py
+@description: 相似菜品检索工具（"类似X的菜"，基于菜品向量索引，完全离线）
+@author: AI Assistant
+@created: 2024
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+from ..base_tool import BaseMCPTool
+from ..execution_policy import ExecutionPolicy
+from .dish_embeddings import DishEmbeddingIndex, get_embedder, AUTO, EXACT, IVF
+from .food_knowledge_base import FoodKnowledgeBase
+from .food_recommendation_tool import DIFFICULTY_LABELS
+
+logger = logging.getLogger(__name__)
+
+
+class SimilarDishesTool(BaseMCPTool):
+    """相似菜品检索工具"""
+
+    execution_policy = ExecutionPolicy(timeout=5.0)
+
+    def __init__(self, name: str, description: str, **config):
+        """
+        初始化相似菜品检索工具
+
+        Args:
+            name: 工具名称
+            description: 工具描述
+            embeddings_path: 预先计算的菜品向量索引目录（见 dish_embeddings.main），
+                不配置时按知识库用特征哈希即时计算
+            embedding_model: 本地句向量模型目录（索引由本地模型生成时用于编码查询）
+            knowledge_base: 美食知识库文件
+        """
+        super().__init__(name, description, **config)
+        self.category = "recommendation"
+        self.embeddings_path = config.get('embeddings_path') or None
+        self.embedding_model = config.get('embedding_model') or None
+        self.knowledge_base = FoodKnowledgeBase(config.get('knowledge_base') or None)
+        self.index: Optional[DishEmbeddingIndex] = None
+        self.query_embedder = None
+        self._lock = threading.Lock()
+
+    async def execute(self, **parameters) -> Dict[str, Any]:
+        """
+        检索相似菜品
+
+        Args:
+            dish_name: 参照菜品（菜名，或包含菜名的描述）
+            count: 返回数量
+            method: 检索方式 auto/exact/ivf
+        """
+        try:
+            dish_name = (parameters.get('dish_name') or '').strip()
+            count = int(parameters.get('count', 5))
+            method = parameters.get('method', AUTO)
+            if not dish_name:
+                return {"success": False, "error": "请提供菜品名称", "similar_dishes": []}
+
+            if self.index is None:
+                await self.run_cpu(self._load_index)
+
+            row, query = await self.run_cpu(self._resolve_query, dish_name)
+            if query is None:
+                return {"success": False, "error": f"未找到菜品: {dish_name}", "similar_dishes": []}
+
+            matches, used_method = await self.run_cpu(self.index.search, query, count, method, row)
+            # 与查询没有任何共同特征的菜品不算相似
+            matches = [(match_row, similarity) for match_row, similarity in matches if similarity > 0]
+            if not matches:
+                return {"success": False, "error": f"未找到菜品: {dish_name}", "similar_dishes": []}
+            similar_dishes = [self._create_item(match_row, similarity) for match_row, similarity in matches]
+
+            return {
+                "success": True,
+                "query": dish_name,
+                "matched_dish": self.index.names[row] if row is not None else None,
+                "method": used_method,
+                "similar_dishes": similar_dishes,
+                "total_count": len(similar_dishes),
+                "generated_at": datetime.now().isoformat()
+            }
+
+        except Exception as e:
+            logger.error(f"相似菜品检索失败: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "similar_dishes": []
+            }
+
+    def _resolve_query(self, dish_name: str):
+        """
+        查询文本 -> (匹配的菜品行, 查询向量)
+
+        未匹配到菜名时按自由文本编码；无法编码或文本不含任何已知特征（零向量）时向量为None。
+        """
+        row = self.index.resolve(dish_name)
+        if row is not None:
+            return row, self.index.vectors[row]
+        if self.query_embedder is not None:
+            query = self.query_embedder.embed_texts([dish_name])[0]
+            if np.any(query):
+                return None, query
+        return None, None
+
+    def _load_index(self):
+        """加载向量索引：优先内存映射预计算的索引，否则由知识库即时计算"""
+        with self._lock:
+            if self.index is not None:
+                return
+            kb = self.knowledge_base
+            if self.embeddings_path and os.path.isdir(self.embeddings_path):
+                index = DishEmbeddingIndex.load(self.embeddings_path)
+            else:
+                if self.embeddings_path:
+                    logger.warning(f"菜品向量索引不存在，改为即时计算: {self.embeddings_path}")
+                index = DishEmbeddingIndex.build(kb.dishes(kb.query()))
+            vocabulary = {value: 'ingredient' for value in kb.values('ingredient') if len(value) >= 2}
+            vocabulary.update({value: 'cuisine' for value in kb.values('cuisine')})
+            self.query_embedder = get_embedder(index.embedder_name, self.embedding_model, vocabulary)
+            self.index = index
+
+    def _create_item(self, row: int, similarity: float) -> Dict[str, Any]:
+        """相似菜品结果项（与美食推荐卡片字段一致，前端可直接展示）"""
+        name = self.index.names[row]
+        item = {
+            "dish_name": name,
+            "category": "相似推荐",
+            "reason": f"相似度 {similarity:.0%}",
+            "similarity": round(similarity, 4)
+        }
+        dish = self.knowledge_base.find(name)
+        if dish is not None:
+            item.update({
+                "cuisine": dish["cuisine"],
+                "difficulty": DIFFICULTY_LABELS.get(dish["difficulty"], "中等"),
+                "ingredients": dish["ingredients"],
+                "popularity": dish["popularity"]
+            })
+        return item
+
+    def get_parameters_schema(self) -> Dict[str, Any]:
+        """获取参数模式"""
+        return {
+            "type": "object",
+            "properties": {
+                "dish_name": {
+                    "type": "string",
+                    "description": "参照菜品名称，如'红烧肉'"
+                },
+                "count": {
+                    "type": "integer",
+                    "description": "返回的相似菜品数量",
+                    "default": 5,
+                    "minimum": 1,
+                    "maximum": 20
+                },
+                "method": {
+                    "type": "string",
+                    "description": "检索方式：auto（按菜品数自动选择）、exact（精确）、ivf（近似）",
+                    "enum": [AUTO, EXACT, IVF],
+                    "default": AUTO
+                }
+            },
+            "required": ["dish_name"]
+        }
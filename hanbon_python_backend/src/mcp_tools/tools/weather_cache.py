@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: weather_cache.py
+@description: 天气数据缓存（按城市/坐标网格缓存，按观测时间过期，并发请求合并）
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+CURRENT = 'current'
+FORECAST = 'forecast'
+
+# 预报时段长度（OpenWeather 5天预报为3小时一个时段）
+FORECAST_SLOT_SECONDS = 3 * 3600
+
+
+def weather_location_key(
+    city: Optional[str] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    grid: float = 0.1
+) -> str:
+    """
+    生成缓存位置键
+
+    有坐标时按网格取整（默认0.1度，约10公里），否则按城市名（忽略大小写和空白）。
+    """
+    if lat is not None and lon is not None:
+        lat_cell = round(float(lat) / grid) * grid
+        lon_cell = round(float(lon) / grid) * grid
+        return f"grid:{lat_cell:.2f},{lon_cell:.2f}"
+    return f"city:{(city or '').replace(' ', '').lower()}"
+
+
+@dataclass
+class WeatherEntry:
+    """缓存的原始天气数据"""
+    data: Dict[str, Any]
+    fetched_at: float     # 获取时间（time.time()）
+    expires_at: float     # 过期时间（time.time()）
+
+
+class WeatherCache:
+    """
+    天气数据缓存
+
+    缓存 OpenWeather 的原始响应：
+    - 实况天气的有效期从数据自身的观测时间（dt）起算，而不是从获取时间起算；
+    - 存在新鲜的预报时，实况可由最接近当前时间的预报时段推算，无需再请求；
+    - 同一位置的并发未命中只发起一次上游请求，其余请求等待同一结果。
+    """
+
+    def __init__(
+        self,
+        current_ttl: float = 600,
+        forecast_ttl: float = 3 * 3600,
+        min_ttl: float = 60,
+        grid: float = 0.1,
+        max_entries: int = 1000
+    ):
+        """
+        初始化缓存
+
+        Args:
+            current_ttl: 实况数据自观测时间起的有效期（秒）
+            forecast_ttl: 预报数据自获取时间起的有效期（秒）
+            min_ttl: 获取后至少保留的时间（秒），避免观测时间较旧时反复请求
+            grid: 坐标网格大小（度）
+            max_entries: 最多缓存的条目数
+        """
+        self.current_ttl = current_ttl
+        self.forecast_ttl = forecast_ttl
+        self.min_ttl = min_ttl
+        self.grid = grid
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], WeatherEntry]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.derived_hits = 0
+        self.coalesced = 0
+        self.refreshes = 0
+
+    # ---------- 读取 ----------
+
+    def get(self, kind: str, key: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """获取未过期的原始数据"""
+        now = now or time.time()
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            del self._entries[(kind, key)]
+            return None
+        self._entries.move_to_end((kind, key))
+        return entry.data
+
+    def derive_current(self, key: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        由新鲜的预报推算实况数据
+
+        取与当前时间相差不超过半个时段的预报时段，组装成与实况接口相同结构的数据。
+        """
+        now = now or time.time()
+        forecast = self.get(FORECAST, key, now)
+        if not forecast:
+            return None
+
+        slot = min(forecast.get('list') or [], key=lambda item: abs(item.get('dt', 0) - now), default=None)
+        if slot is None or abs(slot.get('dt', 0) - now) > FORECAST_SLOT_SECONDS / 2:
+            return None
+
+        city = forecast.get('city', {})
+        current = {
+            "coord": city.get('coord', {}),
+            "weather": slot.get('weather', [{}]),
+            "main": slot.get('main', {}),
+            "wind": slot.get('wind', {}),
+            "dt": slot.get('dt'),
+            "sys": {"country": city.get('country', '')},
+            "name": city.get('name', ''),
+            "derived_from_forecast": True
+        }
+        # 与实况接口一致：没有能见度数据时不带该字段
+        if slot.get('visibility') is not None:
+            current["visibility"] = slot['visibility']
+        return current
+
+    async def get_or_fetch(
+        self,
+        kind: str,
+        key: str,
+        fetcher: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        读取缓存，未命中时调用 fetcher 获取并缓存
+
+        实况未命中时先尝试由预报推算。并发的相同请求共享同一个上游调用；
+        单个调用方被取消不会取消共享的上游请求。
+        """
+        data = self.get(kind, key)
+        if data is None and kind == CURRENT:
+            data = self.derive_current(key)
+            if data is not None:
+                self.derived_hits += 1
+        if data is not None:
+            self.hits += 1
+            return data
+
+        if (kind, key) not in self._inflight:
+            self.misses += 1
+        return await self._shared_fetch(kind, key, fetcher)
+
+    async def refresh(
+        self,
+        kind: str,
+        key: str,
+        fetcher: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """不论缓存是否新鲜都重新获取并写入（用于到期前的后台刷新），与并发请求共享上游调用"""
+        self.refreshes += 1
+        return await self._shared_fetch(kind, key, fetcher)
+
+    def remaining_ttl(self, kind: str, key: str, now: Optional[float] = None) -> Optional[float]:
+        """返回条目剩余有效时间（秒），不存在或已过期时返回None"""
+        now = now or time.time()
+        entry = self._entries.get((kind, key))
+        if entry is None or entry.expires_at <= now:
+            return None
+        return entry.expires_at - now
+
+    # ---------- 写入 ----------
+
+    def put(self, kind: str, key: str, data: Dict[str, Any], now: Optional[float] = None):
+        """写入原始数据，并以响应中的坐标网格作为别名键一并写入"""
+        now = now or time.time()
+        entry = WeatherEntry(data=data, fetched_at=now, expires_at=self._expires_at(kind, data, now))
+
+        keys = {key}
+        coord = data.get('coord') if kind == CURRENT else data.get('city', {}).get('coord')
+        if coord and 'lat' in coord and 'lon' in coord:
+            keys.add(weather_location_key(lat=coord['lat'], lon=coord['lon'], grid=self.grid))
+
+        for cache_key in keys:
+            self._entries[(kind, cache_key)] = entry
+            self._entries.move_to_end((kind, cache_key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def expiring_within(self, seconds: float, now: Optional[float] = None) -> Dict[Tuple[str, str], float]:
+        """返回将在 seconds 秒内过期的条目及其剩余时间"""
+        now = now or time.time()
+        return {
+            cache_key: entry.expires_at - now
+            for cache_key, entry in self._entries.items()
+            if entry.expires_at - now <= seconds
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "derived_from_forecast": self.derived_hits,
+            "misses": self.misses,
+            "coalesced_requests": self.coalesced,
+            "refreshes": self.refreshes,
+            "inflight": len(self._inflight),
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+    # ---------- 内部方法 ----------
+
+    async def _shared_fetch(
+        self,
+        kind: str,
+        key: str,
+        fetcher: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """同一位置同时只有一个上游请求；调用方被取消不会取消共享的请求"""
+        task = self._inflight.get((kind, key))
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(kind, key, fetcher))
+            self._inflight[(kind, key)] = task
+            task.add_done_callback(lambda _: self._inflight.pop((kind, key), None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _fetch_and_store(
+        self,
+        kind: str,
+        key: str,
+        fetcher: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        data = await fetcher()
+        self.put(kind, key, data)
+        return data
+
+    def _expires_at(self, kind: str, data: Dict[str, Any], now: float) -> float:
+        """计算过期时间：实况按观测时间，预报按获取时间且不超过最后一个时段"""
+        if kind == CURRENT:
+            observed_at = data.get('dt')
+            if isinstance(observed_at, (int, float)) and observed_at <= now:
+                expires_at = observed_at + self.current_ttl
+            else:
+                expires_at = now + self.current_ttl
+        else:
+            expires_at = now + self.forecast_ttl
+            slots = data.get('list') or []
+            if slots and isinstance(slots[-1].get('dt'), (int, float)):
+                expires_at = min(expires_at, slots[-1]['dt'])
+        return max(expires_at, now + self.min_ttl)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: weather_prefetch.py
+@description: 天气数据后台预取（热门城市 + 最近查询过的位置，在缓存过期前刷新）
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WEATHER_TOOL_NAME = 'weather_api'
+
+
+class WeatherPrefetcher:
+    """
+    天气预取调度器
+
+    在应用生命周期内周期运行：对配置的热门城市和最近 recent_hours 小时内查询过的位置，
+    在实况/预报缓存过期前 refresh_ahead 秒内重新请求，使聊天时的天气查询基本都命中内存缓存。
+    每次上游请求都经过管理器计入熔断器和执行统计；天气工具熔断或未配置API密钥时跳过本轮。
+    """
+
+    def __init__(
+        self,
+        mcp_manager,
+        hot_cities: Optional[List[str]] = None,
+        recent_hours: float = 6,
+        interval: float = 120,
+        refresh_ahead: float = 180,
+        concurrency: int = 4
+    ):
+        """
+        初始化预取调度器
+
+        Args:
+            mcp_manager: MCP工具管理器（按需加载天气工具）
+            hot_cities: 始终保持新鲜的城市列表（OpenWeather 城市名，如 "Changsha,CN"）
+            recent_hours: 最近多少小时内查询过的位置也参与预取
+            interval: 两轮检查之间的间隔（秒）
+            refresh_ahead: 距离过期多少秒内开始刷新
+            concurrency: 同时进行的上游请求数上限
+        """
+        self.mcp_manager = mcp_manager
+        self.hot_cities = list(hot_cities or [])
+        self.recent_hours = recent_hours
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.concurrency = max(1, concurrency)
+        self._task: Optional[asyncio.Task] = None
+
+        self.rounds = 0
+        self.refreshed = 0
+        self.failures = 0
+        self.last_run: Optional[float] = None
+
+    def start(self) -> asyncio.Task:
+        """在后台启动预取循环"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        """停止预取循环"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def run_once(self) -> int:
+        """
+        执行一轮预取
+
+        Returns:
+            本轮请求上游的次数
+        """
+        if self.mcp_manager.is_circuit_open(WEATHER_TOOL_NAME):
+            logger.info("天气工具处于熔断状态，跳过本轮预取")
+            return 0
+        tool = await self.mcp_manager.get_tool(WEATHER_TOOL_NAME)
+        if tool is None or not tool.enabled or not getattr(tool, 'api_key', None):
+            return 0
+
+        targets = self._collect_targets(tool)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        def guarded_call(fetch):
+            return self.mcp_manager.run_background_call(WEATHER_TOOL_NAME, fetch)
+
+        async def prefetch(location: Dict[str, Any]) -> int:
+            async with semaphore:
+                try:
+                    return await tool.prefetch(location, self.refresh_ahead, call=guarded_call)
+                except Exception as e:
+                    self.failures += 1
+                    logger.warning(f"预取天气失败 {location}: {e}")
+                    return 0
+
+        refreshed = sum(await asyncio.gather(*(prefetch(location) for location in targets)))
+        self.rounds += 1
+        self.refreshed += refreshed
+        self.last_run = time.time()
+        if refreshed:
+            logger.info(f"天气预取完成: {len(targets)} 个位置，刷新 {refreshed} 项")
+        return refreshed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预取统计信息"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "hot_cities": len(self.hot_cities),
+            "rounds": self.rounds,
+            "refreshed": self.refreshed,
+            "failures": self.failures,
+            "last_run": self.last_run
+        }
+
+    # ---------- 内部方法 ----------
+
+    def _collect_targets(self, tool) -> List[Dict[str, Any]]:
+        """合并热门城市和最近查询的位置，按缓存键去重"""
+        targets: Dict[str, Dict[str, Any]] = {}
+        locations = [{'city': city} for city in self.hot_cities]
+        locations += tool.get_recent_locations(self.recent_hours * 3600)
+        for location in locations:
+            targets.setdefault(tool.location_key(location), location)
+        return list(targets.values())
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"天气预取异常: {e}")
+            await asyncio.sleep(self.interval)
@@ -7,16 +7,21 @@
 @created: 2024
 """
 
-import aiohttp
 import logging
-from typing import Dict, Any, Optional
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Tuple
 from ..base_tool import BaseMCPTool
+from ..execution_policy import ExecutionPolicy, TransientToolError, TRANSIENT_ERRORS
+from .weather_cache import WeatherCache, weather_location_key, CURRENT, FORECAST
 
 logger = logging.getLogger(__name__)
 
 class WeatherTool(BaseMCPTool):
     """天气查询工具 - 基于OpenWeather API"""
     
+    execution_policy = ExecutionPolicy(timeout=6.0, max_retries=2)
+    
     def __init__(self, name: str, description: str, api_key: str = "", **config):
         super().__init__(name, description, **config)
         self.api_key = api_key or self._get_default_weather_key()
@@ -24,6 +29,16 @@ class WeatherTool(BaseMCPTool):
         self.base_url = "https://api.openweathermap.org/data/2.5/weather"
         self.forecast_url = "https://api.openweathermap.org/data/2.5/forecast"
         
+        # 天气数据缓存：按城市或坐标网格，实况有效期从观测时间起算
+        self.weather_cache = WeatherCache(
+            current_ttl=config.get('weather_current_ttl', 600),
+            forecast_ttl=config.get('weather_forecast_ttl', 3 * 3600),
+            grid=config.get('weather_grid', 0.1)
+        )
+        # 最近查询过的位置：缓存键 -> (位置参数, 最后查询时间)，供后台预取使用
+        self.recent_locations: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.max_recent_locations = config.get('weather_recent_locations', 200)
+        
     def _get_default_weather_key(self) -> str:
         """获取默认的OpenWeather API密钥"""
         import os
@@ -51,40 +66,112 @@ class WeatherTool(BaseMCPTool):
             if not city and not (lat and lon):
                 city = 'Changsha,CN'  # 确保有查询参数
             
-            # 构建请求参数
-            params = {
-                'appid': self.api_key,
-                'units': 'metric',  # 使用摄氏度
-                'lang': 'zh_cn'     # 中文描述
-            }
+            location = {'lat': lat, 'lon': lon} if lat and lon else {'city': city}
+            params, cache_key = self._location_params(location)
+            self._remember_location(cache_key, location)
             
-            # 根据参数类型添加位置信息
-            if lat and lon:
-                params['lat'] = lat
-                params['lon'] = lon
+            # 优先使用缓存（实况可由新鲜的预报推算），并发的相同查询只请求一次
+            if extensions == 'forecast':
+                data = await self.weather_cache.get_or_fetch(
+                    FORECAST, cache_key, lambda: self._fetch_weather_data(self.forecast_url, params, 'list')
+                )
+                return self._parse_forecast_result(data)
             else:
-                params['q'] = city
-            
-            # 选择API端点
-            url = self.forecast_url if extensions == 'forecast' else self.base_url
-            
-            # 发送请求
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if extensions == 'forecast':
-                            return self._parse_forecast_result(data)
-                        else:
-                            return self._parse_weather_result(data)
-                    else:
-                        logger.error(f"OpenWeather API请求失败，状态码: {response.status}")
-                        return self._create_error_result(f"天气API请求失败: {response.status}")
-                        
+                data = await self.weather_cache.get_or_fetch(
+                    CURRENT, cache_key, lambda: self._fetch_weather_data(self.base_url, params, 'main')
+                )
+                return self._parse_weather_result(data)
+                    
+        except TRANSIENT_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"天气查询失败: {e}")
             return self._create_error_result(str(e))
     
+    def _location_params(self, location: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """根据位置（city 或 lat/lon）构建请求参数和缓存键"""
+        params = {
+            'appid': self.api_key,
+            'units': 'metric',  # 使用摄氏度
+            'lang': 'zh_cn'     # 中文描述
+        }
+        
+        # 根据参数类型添加位置信息
+        if location.get('lat') and location.get('lon'):
+            params['lat'] = location['lat']
+            params['lon'] = location['lon']
+            cache_key = weather_location_key(lat=location['lat'], lon=location['lon'], grid=self.weather_cache.grid)
+        else:
+            params['q'] = location.get('city') or 'Changsha,CN'
+            cache_key = weather_location_key(params['q'])
+        return params, cache_key
+    
+    def location_key(self, location: Dict[str, Any]) -> str:
+        """位置对应的缓存键"""
+        return self._location_params(location)[1]
+    
+    def _remember_location(self, cache_key: str, location: Dict[str, Any]):
+        """记录最近查询的位置"""
+        self.recent_locations[cache_key] = (location, time.time())
+        self.recent_locations.move_to_end(cache_key)
+        while len(self.recent_locations) > self.max_recent_locations:
+            self.recent_locations.popitem(last=False)
+    
+    def get_recent_locations(self, within_seconds: float) -> List[Dict[str, Any]]:
+        """返回最近 within_seconds 秒内查询过的位置"""
+        since = time.time() - within_seconds
+        return [location for location, seen_at in self.recent_locations.values() if seen_at >= since]
+    
+    async def prefetch(
+        self,
+        location: Dict[str, Any],
+        refresh_ahead: float,
+        call: Optional[Callable[[Callable[[], Awaitable[Dict[str, Any]]]], Awaitable[Dict[str, Any]]]] = None
+    ) -> int:
+        """
+        预取某个位置的实况和预报数据
+        
+        缓存中不存在或将在 refresh_ahead 秒内过期的数据会重新请求，其余跳过。
+        
+        Args:
+            location: 位置参数（city 或 lat/lon）
+            refresh_ahead: 距离过期多少秒内重新请求
+            call: 包装每次上游请求的函数（如 MCPToolManager.run_background_call，计入熔断和执行统计）
+        
+        Returns:
+            实际请求上游的次数
+        """
+        params, cache_key = self._location_params(location)
+        targets = (
+            (CURRENT, self.base_url, 'main'),
+            (FORECAST, self.forecast_url, 'list')
+        )
+        refreshed = 0
+        for kind, url, required_field in targets:
+            remaining = self.weather_cache.remaining_ttl(kind, cache_key)
+            if remaining is not None and remaining > refresh_ahead:
+                continue
+            def fetch(url=url, required_field=required_field):
+                return self._fetch_weather_data(url, params, required_field)
+            await self.weather_cache.refresh(kind, cache_key, (lambda fetch=fetch: call(fetch)) if call else fetch)
+            refreshed += 1
+        return refreshed
+    
+    async def _fetch_weather_data(self, url: str, params: Dict[str, Any], required_field: str) -> Dict[str, Any]:
+        """请求OpenWeather接口，只有包含 required_field 的正常响应才返回（用于写入缓存）"""
+        session = self.get_http_session()
+        async with session.get(url, params=params, timeout=self.client_timeout()) as response:
+            if response.status == 200:
+                data = await response.json()
+                if required_field not in data:
+                    raise ValueError(data.get('message', '未知错误'))
+                return data
+            elif response.status >= 500:
+                raise TransientToolError(f"天气API请求失败: {response.status}")
+            else:
+                logger.error(f"OpenWeather API请求失败，状态码: {response.status}")
+                raise ValueError(f"天气API请求失败: {response.status}")
+    
     def _parse_weather_result(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """解析当前天气查询结果"""
         try:
@@ -144,7 +231,7 @@ class WeatherTool(BaseMCPTool):
                     "feels_like": f"{main.get('feels_like', '--'):.1f}°C",
                     "pressure": f"{main.get('pressure', '--')} hPa",
                     "visibility": f"{data.get('visibility', '--')} m" if 'visibility' in data else '--',
-                    "report_time": "当前"
+                    "report_time": "预报推算" if data.get('derived_from_forecast') else "当前"
                 },
                 "food_suggestions": self._get_weather_food_suggestions(
                     weather.get('description', ''),
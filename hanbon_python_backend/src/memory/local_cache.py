@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: local_cache.py
+@description: 本地记忆缓存（记忆ID索引 + 按用户、按类型的时间有序存储 + 全文索引）
+@author: AI Assistant
+@created: 2024
+"""
+
+import logging
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Any, List, Optional, Tuple
+
+from .memory_index import MemoryTextIndex
+
+logger = logging.getLogger(__name__)
+
+
+class LocalMemoryCache:
+    """
+    本地记忆缓存
+
+    每个用户的记忆存放在按时间排列的字典中（记忆ID -> 记忆，最旧的在前），每种
+    记忆类型另有一份同样有序的二级字典；另有记忆ID -> 用户ID 的索引：按ID删除、
+    更新都是 O(1)，不随进程中记忆总数增长；超出每用户上限时从最旧的一端淘汰，也是 O(1)。
+
+    读取"某类型最新N条"直接从对应字典的最新一端取 N 条，不排序、不扫描。
+    新记忆的时间一般不早于已有记忆，直接追加；时间较早的记忆（如从远端或磁盘载入）
+    按时间插入到对应位置。
+    """
+
+    def __init__(self, max_per_user: int = 100):
+        """
+        Args:
+            max_per_user: 每个用户最多保留的记忆数
+        """
+        self.max_per_user = max_per_user
+        # 用户ID -> {记忆ID: 记忆}，按时间排列
+        self._users: Dict[str, "OrderedDict[str, Any]"] = {}
+        # 用户ID -> 记忆类型 -> {记忆ID: 记忆}，按时间排列
+        self._types: Dict[str, Dict[str, "OrderedDict[str, Any]"]] = {}
+        # 记忆ID -> 用户ID
+        self._owners: Dict[str, str] = {}
+        # 用户ID -> 全文索引
+        self._text_index: Dict[str, MemoryTextIndex] = {}
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._owners
+
+    @property
+    def user_count(self) -> int:
+        return len(self._users)
+
+    def add(self, memory: Any):
+        """写入一条记忆（需有 id、user_id、content、memory_type、timestamp 属性）"""
+        if memory.id in self._owners:
+            self.delete(memory.id)
+        memories = self._users.setdefault(memory.user_id, OrderedDict())
+        types = self._types.setdefault(memory.user_id, {})
+        _insert_ordered(memories, memory)
+        _insert_ordered(types.setdefault(memory.memory_type, OrderedDict()), memory)
+        self._owners[memory.id] = memory.user_id
+        index = self._text_index.setdefault(memory.user_id, MemoryTextIndex())
+        index.add(memory)
+
+        while len(memories) > self.max_per_user:
+            _, expired = memories.popitem(last=False)
+            del self._owners[expired.id]
+            self._remove_typed(types, expired)
+            index.remove(expired.id)
+
+    def get(self, memory_id: str) -> Optional[Any]:
+        user_id = self._owners.get(memory_id)
+        if user_id is None:
+            return None
+        return self._users[user_id][memory_id]
+
+    def update(self, memory_id: str, content: Dict[str, Any], timestamp) -> Optional[Any]:
+        """合并更新记忆内容并刷新时间（移到对应的时间位置），记忆不存在时返回None"""
+        memory = self.get(memory_id)
+        if memory is None:
+            return None
+        memory.content.update(content)
+        memory.timestamp = timestamp
+        for memories in (self._users[memory.user_id], self._types[memory.user_id][memory.memory_type]):
+            del memories[memory_id]
+            _insert_ordered(memories, memory)
+        self._text_index[memory.user_id].add(memory)
+        return memory
+
+    def delete(self, memory_id: str) -> bool:
+        user_id = self._owners.pop(memory_id, None)
+        if user_id is None:
+            return False
+        memories = self._users[user_id]
+        memory = memories.pop(memory_id)
+        self._remove_typed(self._types[user_id], memory)
+        self._text_index[user_id].remove(memory_id)
+        if not memories:
+            del self._users[user_id]
+            del self._types[user_id]
+            del self._text_index[user_id]
+        return True
+
+    def latest(self, user_id: str, memory_type: Optional[str] = None, limit: int = 50) -> List[Any]:
+        """用户最新的 limit 条记忆（最新的在前），只读取最新一端的 limit 条"""
+        if memory_type:
+            memories = self._types.get(user_id, {}).get(memory_type)
+        else:
+            memories = self._users.get(user_id)
+        if not memories:
+            return []
+        return list(islice(reversed(memories.values()), max(limit, 0)))
+
+    def search(self, user_id: str, query: str, limit: int = 10) -> List[Tuple[Any, float]]:
+        """全文检索，返回 [(记忆, 相关度)]"""
+        index = self._text_index.get(user_id)
+        if index is None:
+            return []
+        return index.search(query, limit)
+
+    def count(self, user_id: str, memory_type: Optional[str] = None) -> int:
+        if memory_type:
+            return len(self._types.get(user_id, {}).get(memory_type, ()))
+        return len(self._users.get(user_id, ()))
+
+    def _remove_typed(self, types: Dict[str, "OrderedDict[str, Any]"], memory: Any):
+        typed = types[memory.memory_type]
+        del typed[memory.id]
+        if not typed:
+            del types[memory.memory_type]
+
+
+def _insert_ordered(memories: "OrderedDict[str, Any]", memory: Any):
+    """
+    按时间插入记忆
+
+    不早于最新一条时直接追加（O(1)，通常情况）；否则从最新一端往回收集比它新的条目，
+    追加后再把这些条目依次移到末尾，耗时只与比它新的条目数有关。
+    """
+    if not memories or next(reversed(memories.values())).timestamp <= memory.timestamp:
+        memories[memory.id] = memory
+        return
+    newer = []
+    for existing in reversed(memories.values()):
+        if existing.timestamp <= memory.timestamp:
+            break
+        if existing.id != memory.id:
+            newer.append(existing.id)
+    memories[memory.id] = memory
+    for memory_id in reversed(newer):
+        memories.move_to_end(memory_id)
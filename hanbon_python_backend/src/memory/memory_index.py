@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: memory_index.py
+@description: 记忆全文索引（中文字二元组分词、倒排索引、BM25打分、时间衰减加权）
+@author: AI Assistant
+@created: 2024
+"""
+
+import math
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# 连续的中日韩文字，或连续的字母数字
+_TOKEN_RUNS = re.compile(r"[㐀-䶿一-鿿豈-﫿]+|[a-z0-9]+")
+_CJK = re.compile(r"[㐀-䶿一-鿿豈-﫿]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    分词：中文按相邻两字切分（单字成词时保留单字），字母数字按整词
+
+    "喜欢吃辣 spicy" -> ["喜欢", "欢吃", "吃辣", "spicy"]
+    """
+    tokens = []
+    for run in _TOKEN_RUNS.findall(unicodedata.normalize('NFKC', text or '').lower()):
+        if _CJK.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def memory_text(content: Any) -> str:
+    """把记忆内容（嵌套的字典/列表）展开为可检索的文本，包括字典的键"""
+    if isinstance(content, dict):
+        return ' '.join(f"{key} {memory_text(value)}" for key, value in content.items())
+    if isinstance(content, (list, tuple, set)):
+        return ' '.join(memory_text(value) for value in content)
+    if content is None:
+        return ''
+    return str(content)
+
+
+class MemoryTextIndex:
+    """
+    单个用户记忆的倒排索引
+
+    记忆写入时增量建索引，检索只访问查询词的倒排列表，不再逐条序列化记忆内容。
+    每条记忆占一个槽位，文档长度和时间戳按槽位存放在数组中；倒排列表在变化后
+    首次被查询时才转换为数组，打分和取前 N 条都是向量运算。
+    相关度为 BM25 分数乘以时间衰减加权 (1 + recency_weight * 0.5 ** (天数 / half_life_days))。
+    """
+
+    def __init__(
+        self,
+        k1: float = 1.2,
+        b: float = 0.75,
+        recency_weight: float = 0.3,
+        half_life_days: float = 30.0
+    ):
+        """
+        Args:
+            k1: BM25 词频饱和参数
+            b: BM25 文档长度归一化参数
+            recency_weight: 最新记忆相对于很久以前的记忆的最大加权
+            half_life_days: 时间加权的半衰期（天）
+        """
+        self.k1 = k1
+        self.b = b
+        self.recency_weight = recency_weight
+        self.half_life = half_life_days * 86400
+        # 词 -> {槽位: 词频}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self._posting_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # 记忆ID -> 槽位；槽位 -> (记忆, 词频表)
+        self._slots: Dict[str, int] = {}
+        self._documents: List[Optional[Tuple[Any, Counter]]] = []
+        self._free_slots: List[int] = []
+        self._lengths = np.zeros(16, dtype=np.float64)
+        self._timestamps = np.zeros(16, dtype=np.float64)
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._slots
+
+    def add(self, memory: Any):
+        """索引一条记忆（需有 id、content、timestamp 属性），已存在时重新索引"""
+        if memory.id in self._slots:
+            self.remove(memory.id)
+        terms = Counter(tokenize(memory_text(memory.content)))
+        length = sum(terms.values())
+
+        slot = self._free_slots.pop() if self._free_slots else self._new_slot()
+        self._slots[memory.id] = slot
+        self._documents[slot] = (memory, terms)
+        self._lengths[slot] = length
+        self._timestamps[slot] = memory.timestamp.timestamp()
+        self.total_length += length
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[slot] = count
+            self._posting_arrays.pop(term, None)
+
+    def remove(self, memory_id: str) -> bool:
+        """移除一条记忆的索引"""
+        slot = self._slots.pop(memory_id, None)
+        if slot is None:
+            return False
+        _, terms = self._documents[slot]
+        self._documents[slot] = None
+        self._free_slots.append(slot)
+        self.total_length -= int(self._lengths[slot])
+        self._lengths[slot] = 0
+        for term in terms:
+            posting = self.postings[term]
+            del posting[slot]
+            if not posting:
+                del self.postings[term]
+            self._posting_arrays.pop(term, None)
+        return True
+
+    def search(self, query: str, limit: int = 10, now: Optional[float] = None) -> List[Tuple[Any, float]]:
+        """
+        检索记忆
+
+        Returns:
+            [(记忆, 相关度)]，按相关度降序
+        """
+        count = len(self._slots)
+        query_terms = Counter(tokenize(query))
+        if not count or not query_terms or limit <= 0:
+            return []
+
+        average_length = self.total_length / count or 1.0
+        scores = np.zeros(len(self._documents), dtype=np.float64)
+        for term, query_count in query_terms.items():
+            if term not in self.postings:
+                continue
+            slots, tf = self._term_arrays(term)
+            idf = math.log(1 + (count - len(slots) + 0.5) / (len(slots) + 0.5)) * query_count
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[slots] / average_length)
+            scores[slots] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        age = np.maximum((now or time.time()) - self._timestamps[matched], 0.0)
+        final = scores[matched] * (1 + self.recency_weight * np.exp2(-age / self.half_life))
+        if len(matched) > limit:
+            top = np.argpartition(-final, limit - 1)[:limit]
+        else:
+            top = np.arange(len(matched))
+        top = top[np.argsort(-final[top], kind='stable')]
+        return [(self._documents[matched[i]][0], float(final[i])) for i in top]
+
+    def _term_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._posting_arrays.get(term)
+        if arrays is None:
+            posting = self.postings[term]
+            arrays = (
+                np.fromiter(posting.keys(), dtype=np.intp, count=len(posting)),
+                np.fromiter(posting.values(), dtype=np.float64, count=len(posting))
+            )
+            self._posting_arrays[term] = arrays
+        return arrays
+
+    def _new_slot(self) -> int:
+        slot = len(self._documents)
+        self._documents.append(None)
+        if slot >= len(self._lengths):
+            self._lengths = np.resize(self._lengths, slot * 2)
+            self._timestamps = np.resize(self._timestamps, slot * 2)
+        return slot
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: models.py
+@description: 记忆数据结构
+@author: AI Assistant
+@created: 2024
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Any
+
+
+@dataclass
+class Memory:
+    """记忆数据结构"""
+    id: str
+    user_id: str
+    content: Dict[str, Any]
+    memory_type: str
+    timestamp: datetime
+    relevance_score: float = 0.0
+    metadata: Dict[str, Any] = None
@@ -13,42 +13,71 @@ import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+
+from .local_cache import LocalMemoryCache
+from .models import Memory
+from .sqlite_store import SQLiteMemoryStore
+from .write_behind import MemoryWriteQueue
 
 logger = logging.getLogger(__name__)
 
-@dataclass
-class Memory:
-    """记忆数据结构"""
-    id: str
-    user_id: str
-    content: Dict[str, Any]
-    memory_type: str
-    timestamp: datetime
-    relevance_score: float = 0.0
-    metadata: Dict[str, Any] = None
+# 本地存储的使用方式
+STORE_FALLBACK = 'fallback'  # 优先远端API，API不可用时读写本地
+STORE_CACHE = 'cache'        # 写入同时写远端和本地，读取优先本地（本地为空时再请求远端）
+STORE_PRIMARY = 'primary'    # 只使用本地存储，不连接远端API
+STORE_MODES = (STORE_FALLBACK, STORE_CACHE, STORE_PRIMARY)
 
 class OpenMemoryClient:
     """OpenMemory API客户端"""
     
-    def __init__(self, api_key: str, base_url: str = "https://api.openmemory.ai"):
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.openmemory.ai",
+        store_path: Optional[str] = None,
+        store_mode: str = STORE_FALLBACK,
+        write_behind: Optional[Dict[str, Any]] = None,
+        api_concurrency: int = 8
+    ):
         """
         初始化OpenMemory客户端
         
         Args:
             api_key: API密钥
             base_url: API基础URL
+            store_path: 本地持久化存储（SQLite）文件，不配置时本地只在内存中缓存每个用户最近100条
+            store_mode: 本地存储的使用方式 fallback/cache/primary
+            write_behind: 异步写回队列参数（见 MemoryWriteQueue），不配置时 enqueue_memory 直接写入
+            api_concurrency: 批量写入时同时进行的API请求数上限
         """
         self.api_key = api_key
         self.base_url = base_url.rstrip('/')
         self.session: Optional[aiohttp.ClientSession] = None
+        if store_mode not in STORE_MODES:
+            logger.warning(f"未知的记忆存储模式 {store_mode}，使用 {STORE_FALLBACK}")
+            store_mode = STORE_FALLBACK
+        self.store_mode = store_mode
         
-        # 本地缓存（生产环境中应使用Redis等外部缓存）
-        self.local_cache: Dict[str, List[Memory]] = {}
+        # 本地存储：持久化的SQLite存储，或进程内缓存
+        if store_path:
+            self.local_cache = SQLiteMemoryStore(store_path)
+        else:
+            self.local_cache = LocalMemoryCache(max_per_user=100)
         self.cache_expiry: Dict[str, datetime] = {}
         
+        # 对话记忆的异步写回队列
+        self.api_concurrency = max(1, api_concurrency)
+        self.write_queue: Optional[MemoryWriteQueue] = None
+        if write_behind is not None:
+            self.write_queue = MemoryWriteQueue(self.write_memories, **write_behind)
+        
     async def initialize(self):
         """初始化客户端连接"""
+        if self.store_mode == STORE_PRIMARY:
+            logger.info("记忆客户端使用本地存储模式，不连接OpenMemory API")
+            self._start_write_queue()
+            return
+        
         try:
             self.session = aiohttp.ClientSession(
                 headers={
@@ -81,15 +110,26 @@ class OpenMemoryClient:
         
         # 无论是否连接到API，都确保本地缓存可用
         if not hasattr(self, 'local_cache'):
-            self.local_cache = {}
+            self.local_cache = LocalMemoryCache(max_per_user=100)
             self.cache_expiry = {}
         
+        # 连接结果确定后再开始写回（包括上次退出时未写完的记忆）
+        self._start_write_queue()
         logger.info("记忆客户端初始化完成（本地缓存已就绪）")
 
+    def _start_write_queue(self):
+        if self.write_queue is not None:
+            self.write_queue.start()
+            logger.info(f"记忆异步写回已启动（恢复 {self.write_queue.restored} 条未写入的记忆）")
+
     async def close(self):
-        """关闭客户端连接"""
+        """关闭客户端连接（先写完写回队列中的记忆）"""
+        if self.write_queue is not None:
+            await self.write_queue.stop()
         if self.session:
             await self.session.close()
+        if hasattr(self.local_cache, 'close'):
+            await self._run_local(self.local_cache.close)
 
     async def _test_connection(self):
         """测试API连接"""
@@ -143,35 +183,96 @@ class OpenMemoryClient:
             是否成功添加
         """
         try:
-            memory = Memory(
-                id=f"{user_id}_{datetime.now().isoformat()}",
-                user_id=user_id,
-                content=memory_data,
-                memory_type=memory_type,
-                timestamp=datetime.now(),
-                metadata={"created_by": "food_agent"}
-            )
+            memory = self._new_memory(user_id, memory_data, memory_type)
             
             # 尝试通过API添加
             if self.session:
                 success = await self._add_memory_via_api(memory)
                 if success:
                     # 同时更新本地缓存
-                    self._add_to_local_cache(memory)
+                    await self._add_to_local_cache(memory)
                     return True
             
             # API失败时使用本地缓存
-            self._add_to_local_cache(memory)
+            await self._add_to_local_cache(memory)
             return True
             
         except Exception as e:
             logger.error(f"添加记忆失败: {e}")
             return False
 
+    async def enqueue_memory(
+        self, 
+        user_id: str, 
+        memory_data: Dict[str, Any], 
+        memory_type: str = "conversation"
+    ) -> bool:
+        """
+        添加新记忆，不等待写入完成
+        
+        记忆放入异步写回队列后立即返回，由后台批量写入远端API和本地存储；
+        未配置写回队列时等同于 add_memory。
+        
+        Returns:
+            是否已加入队列（队列已满时返回 False）
+        """
+        if self.write_queue is None:
+            return await self.add_memory(user_id, memory_data, memory_type)
+        try:
+            return self.write_queue.submit(self._new_memory(user_id, memory_data, memory_type))
+        except Exception as e:
+            logger.error(f"记忆加入写回队列失败: {e}")
+            return False
+
+    async def write_memories(self, memories: List[Memory]) -> List[bool]:
+        """
+        批量写入记忆（写回队列的写入函数）
+        
+        本地存储一次写入整批；连接了API时并发提交到API（不超过 api_concurrency 个请求），
+        返回每条记忆是否写入API。未连接API（本地模式或API不可用）时写入本地即算成功。
+        同一记忆重试时ID不变，本地存储按ID覆盖，不会重复。
+        """
+        await self._run_local(self._add_batch_to_local, memories)
+        now = datetime.now()
+        for memory in memories:
+            self.cache_expiry[memory.user_id] = now + timedelta(hours=1)
+        
+        if not self.session:
+            return [True] * len(memories)
+        
+        semaphore = asyncio.Semaphore(self.api_concurrency)
+        
+        async def post(memory: Memory) -> bool:
+            async with semaphore:
+                return await self._add_memory_via_api(memory)
+        
+        return list(await asyncio.gather(*(post(memory) for memory in memories)))
+
+    def _add_batch_to_local(self, memories: List[Memory]):
+        for memory in memories:
+            self.local_cache.add(memory)
+
+    def _new_memory(self, user_id: str, memory_data: Dict[str, Any], memory_type: str) -> Memory:
+        now = datetime.now()
+        return Memory(
+            id=f"{user_id}_{now.isoformat()}",
+            user_id=user_id,
+            content=memory_data,
+            memory_type=memory_type,
+            timestamp=now,
+            metadata={"created_by": "food_agent"}
+        )
+
     async def _add_memory_via_api(self, memory: Memory) -> bool:
-        """通过API添加记忆"""
+        """
+        通过API添加记忆
+
+        记忆ID同时作为请求体的 id 和 Idempotency-Key 请求头，写回队列重试或重启后重放
+        同一条记忆时服务端不会重复保存；409 表示该记忆已经写入过。
+        """
         try:
             payload = {
+                "id": memory.id,
                 "user_id": memory.user_id,
                 "content": memory.content,
                 "type": memory.memory_type,
@@ -181,11 +282,15 @@ class OpenMemoryClient:
             
             async with self.session.post(
                 f"{self.base_url}/memories",
-                json=payload
+                json=payload,
+                headers={"Idempotency-Key": memory.id}
             ) as response:
                 if response.status == 201:
                     logger.info(f"成功通过API添加记忆: {memory.id}")
                     return True
+                elif response.status == 409:
+                    logger.info(f"记忆已存在于API中，跳过重复写入: {memory.id}")
+                    return True
                 else:
                     logger.warning(f"API添加记忆失败: HTTP {response.status}")
                     # 记录响应内容以便调试
@@ -208,16 +313,15 @@ class OpenMemoryClient:
             logger.error(f"API添加记忆异常: {e}")
             return False
 
-    def _add_to_local_cache(self, memory: Memory):
-        """添加到本地缓存"""
-        if memory.user_id not in self.local_cache:
-            self.local_cache[memory.user_id] = []
-        
-        self.local_cache[memory.user_id].append(memory)
-        
-        # 限制每个用户的记忆数量（最多保留100条）
-        if len(self.local_cache[memory.user_id]) > 100:
-            self.local_cache[memory.user_id] = self.local_cache[memory.user_id][-100:]
+    async def _run_local(self, func, *args):
+        """调用本地存储；持久化存储有磁盘IO，放到线程中执行，不阻塞事件循环"""
+        if getattr(self.local_cache, 'blocking', False):
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def _add_to_local_cache(self, memory: Memory):
+        """添加到本地缓存（进程内缓存每个用户最多保留100条，超出时淘汰最旧的）"""
+        await self._run_local(self.local_cache.add, memory)
         
         # 更新缓存过期时间
         self.cache_expiry[memory.user_id] = datetime.now() + timedelta(hours=1)
@@ -240,14 +344,20 @@ class OpenMemoryClient:
             用户记忆列表
         """
         try:
-            # 首先尝试从API获取
+            # 缓存模式优先读本地
+            if self.store_mode == STORE_CACHE:
+                local_memories = await self._get_from_local_cache(user_id, memory_type, limit)
+                if local_memories:
+                    return local_memories
+            
+            # 尝试从API获取
             if self.session:
                 api_memories = await self._get_memories_via_api(user_id, memory_type, limit)
                 if api_memories:
                     return api_memories
             
             # API失败时使用本地缓存
-            return self._get_from_local_cache(user_id, memory_type, limit)
+            return await self._get_from_local_cache(user_id, memory_type, limit)
             
         except Exception as e:
             logger.error(f"获取用户记忆失败: {e}")
@@ -306,27 +416,14 @@ class OpenMemoryClient:
             logger.error(f"API获取记忆异常: {e}")
             return []
 
-    def _get_from_local_cache(
+    async def _get_from_local_cache(
         self, 
         user_id: str, 
         memory_type: Optional[str],
         limit: int
     ) -> List[Dict[str, Any]]:
-        """从本地缓存获取记忆"""
-        if user_id not in self.local_cache:
-            return []
-        
-        memories = self.local_cache[user_id]
-        
-        # 按类型过滤
-        if memory_type:
-            memories = [m for m in memories if m.memory_type == memory_type]
-        
-        # 按时间排序（最新的在前）
-        memories.sort(key=lambda m: m.timestamp, reverse=True)
-        
-        # 限制数量
-        memories = memories[:limit]
+        """从本地缓存获取记忆（最新的在前）"""
+        memories = await self._run_local(self.local_cache.latest, user_id, memory_type, limit)
         
         # 转换为字典格式
         return [
@@ -359,14 +456,20 @@ class OpenMemoryClient:
             相关记忆列表
         """
         try:
-            # 首先尝试通过API搜索
+            # 缓存模式优先搜索本地
+            if self.store_mode == STORE_CACHE:
+                local_results = await self._search_local_cache(user_id, query, limit)
+                if local_results:
+                    return local_results
+            
+            # 尝试通过API搜索
             if self.session:
                 api_results = await self._search_memories_via_api(user_id, query, limit)
                 if api_results:
                     return api_results
             
             # API失败时使用本地搜索
-            return self._search_local_cache(user_id, query, limit)
+            return await self._search_local_cache(user_id, query, limit)
             
         except Exception as e:
             logger.error(f"搜索记忆失败: {e}")
@@ -424,53 +527,26 @@ class OpenMemoryClient:
             logger.error(f"API搜索异常: {e}")
             return []
 
-    def _search_local_cache(
+    async def _search_local_cache(
         self, 
         user_id: str, 
         query: str, 
         limit: int
     ) -> List[Dict[str, Any]]:
-        """在本地缓存中搜索记忆"""
-        if user_id not in self.local_cache:
-            return []
-        
-        query_lower = query.lower()
-        scored_memories = []
-        
-        for memory in self.local_cache[user_id]:
-            score = 0
-            
-            # 在记忆内容中搜索关键词
-            content_str = json.dumps(memory.content, ensure_ascii=False).lower()
-            if query_lower in content_str:
-                score += 1
-            
-            # 计算关键词匹配度
-            query_words = query_lower.split()
-            for word in query_words:
-                if word in content_str:
-                    score += 0.5
-            
-            if score > 0:
-                scored_memories.append((memory, score))
-        
-        # 按相关性排序
-        scored_memories.sort(key=lambda x: x[1], reverse=True)
-        
-        # 返回前N个结果
-        results = []
-        for memory, score in scored_memories[:limit]:
-            results.append({
+        """在本地缓存中搜索记忆（BM25，较新的记忆适当加权）"""
+        results = await self._run_local(self.local_cache.search, user_id, query, limit)
+        return [
+            {
                 "id": memory.id,
                 "user_id": memory.user_id,
                 "content": memory.content,
                 "type": memory.memory_type,
                 "timestamp": memory.timestamp.isoformat(),
-                "relevance_score": score,
+                "relevance_score": round(score, 4),
                 "metadata": memory.metadata
-            })
-        
-        return results
+            }
+            for memory, score in results
+        ]
 
     async def update_memory(
         self, 
@@ -492,10 +568,12 @@ class OpenMemoryClient:
             if self.session:
                 success = await self._update_memory_via_api(memory_id, updated_content)
                 if success:
+                    # 同时更新本地缓存，避免读到旧内容
+                    await self._update_local_cache(memory_id, updated_content)
                     return True
             
             # API失败时更新本地缓存
-            return self._update_local_cache(memory_id, updated_content)
+            return await self._update_local_cache(memory_id, updated_content)
             
         except Exception as e:
             logger.error(f"更新记忆失败: {e}")
@@ -528,21 +606,16 @@ class OpenMemoryClient:
             logger.error(f"API更新记忆异常: {e}")
             return False
 
-    def _update_local_cache(
+    async def _update_local_cache(
         self, 
         memory_id: str, 
         updated_content: Dict[str, Any]
     ) -> bool:
         """更新本地缓存中的记忆"""
-        for user_id, memories in self.local_cache.items():
-            for memory in memories:
-                if memory.id == memory_id:
-                    memory.content.update(updated_content)
-                    memory.timestamp = datetime.now()
-                    logger.info(f"成功更新本地缓存记忆: {memory_id}")
-                    return True
-        
-        return False
+        if await self._run_local(self.local_cache.update, memory_id, updated_content, datetime.now()) is None:
+            return False
+        logger.info(f"成功更新本地缓存记忆: {memory_id}")
+        return True
 
     async def delete_memory(self, memory_id: str) -> bool:
         """
@@ -559,11 +632,11 @@ class OpenMemoryClient:
             if self.session:
                 success = await self._delete_memory_via_api(memory_id)
                 if success:
-                    self._delete_from_local_cache(memory_id)
+                    await self._delete_from_local_cache(memory_id)
                     return True
             
             # API失败时仅删除本地缓存
-            return self._delete_from_local_cache(memory_id)
+            return await self._delete_from_local_cache(memory_id)
             
         except Exception as e:
             logger.error(f"删除记忆失败: {e}")
@@ -586,24 +659,21 @@ class OpenMemoryClient:
             logger.error(f"API删除记忆异常: {e}")
             return False
 
-    def _delete_from_local_cache(self, memory_id: str) -> bool:
+    async def _delete_from_local_cache(self, memory_id: str) -> bool:
         """从本地缓存删除记忆"""
-        for user_id, memories in self.local_cache.items():
-            for i, memory in enumerate(memories):
-                if memory.id == memory_id:
-                    del memories[i]
-                    logger.info(f"成功从本地缓存删除记忆: {memory_id}")
-                    return True
-        
-        return False
+        if not await self._run_local(self.local_cache.delete, memory_id):
+            return False
+        logger.info(f"成功从本地缓存删除记忆: {memory_id}")
+        return True
 
     def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        total_memories = sum(len(memories) for memories in self.local_cache.values())
-        
         return {
-            "total_users": len(self.local_cache),
-            "total_memories": total_memories,
+            "total_users": self.local_cache.user_count,
+            "total_memories": len(self.local_cache),
             "cache_status": "connected" if self.session else "local_only",
+            "store_mode": self.store_mode,
+            "store": self.local_cache.get_stats() if hasattr(self.local_cache, 'get_stats') else None,
+            "write_queue": self.write_queue.get_stats() if self.write_queue is not None else None,
             "last_updated": datetime.now().isoformat()
         } 
\ No newline at end of file
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: sqlite_store.py
+@description: 持久化本地记忆存储（SQLite WAL模式、FTS5全文检索、批量写入、只读连接池）
+@author: AI Assistant
+@created: 2024
+"""
+
+import hashlib
+import heapq
+import json
+import logging
+import math
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Iterator
+
+from .memory_index import tokenize, memory_text
+from .models import Memory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = Path(__file__).parent.parent.parent / 'cache' / 'memories.db'
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS memories (
+        rowid INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        user_id TEXT NOT NULL,
+        memory_type TEXT NOT NULL,
+        content TEXT NOT NULL,
+        metadata TEXT,
+        timestamp REAL NOT NULL,
+        length INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_memories_user_time ON memories (user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_memories_user_type_time ON memories (user_id, memory_type, timestamp)",
+    # 分词结果（中文字二元组）预先写入，FTS5 按空白切分；每个词带上用户键前缀，
+    # 倒排列表按用户分开，检索只读取该用户的记忆
+    "CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(tokens)"
+)
+
+# 依赖 length 列的索引（旧数据库补上该列之后再创建）：按用户统计记忆数和总词数只读索引
+_LENGTH_INDEX = "CREATE INDEX IF NOT EXISTS idx_memories_user_length ON memories (user_id, length)"
+
+_COLUMNS = "id, user_id, memory_type, content, metadata, timestamp"
+
+
+def _user_terms(user_id: str, tokens: List[str]) -> List[str]:
+    """给词加上用户键前缀（用户ID的哈希，字母数字与中文在FTS5中连成一个词）"""
+    key = 'u' + hashlib.blake2b(user_id.encode('utf-8'), digest_size=8).hexdigest()
+    return [key + token for token in tokens]
+
+
+def _row_to_memory(row: Tuple) -> Memory:
+    memory_id, user_id, memory_type, content, metadata, timestamp = row[:6]
+    return Memory(
+        id=memory_id,
+        user_id=user_id,
+        content=json.loads(content),
+        memory_type=memory_type,
+        timestamp=datetime.fromtimestamp(timestamp),
+        metadata=json.loads(metadata) if metadata else None
+    )
+
+
+class SQLiteMemoryStore:
+    """
+    持久化本地记忆存储
+
+    与 LocalMemoryCache 接口相同（add/get/update/delete/latest/search/count），
+    数据在进程重启后保留，同一台机器上的多个工作进程共享。
+
+    - WAL 模式：读不阻塞写，多个只读连接组成连接池供并发读取；
+    - 新增记忆先进入待写队列，攒够 batch_size 条或超过 flush_interval 秒后
+      在一个事务中批量写入；读取前会先写入待写队列，保证读到自己的写入；
+    - 全文检索由 FTS5 找出包含查询词的记忆，BM25 分数按该用户自己的记忆计算
+      （文档数、词的文档频率、平均长度都只统计该用户），与内存索引 MemoryTextIndex
+      的公式和时间衰减加权一致。所有用户共用一张 FTS5 表，其内置的 bm25() 按全表
+      统计，某个词出现在用户大部分记忆中时IDF会被截断为接近0，因此不使用。
+    """
+
+    # 调用会阻塞（磁盘IO），异步代码中应放到线程中执行
+    blocking = True
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_per_user: int = 0,
+        batch_size: int = 64,
+        flush_interval: float = 0.5,
+        read_pool_size: int = 4,
+        k1: float = 1.2,
+        b: float = 0.75,
+        recency_weight: float = 0.3,
+        half_life_days: float = 30.0
+    ):
+        """
+        Args:
+            path: 数据库文件
+            max_per_user: 每个用户最多保留的记忆数，0 表示不限
+            batch_size: 待写队列达到多少条时立即写入
+            flush_interval: 待写记忆最多等待多久写入（秒）
+            read_pool_size: 只读连接数
+            k1: BM25 词频饱和参数（与 MemoryTextIndex 一致）
+            b: BM25 文档长度归一化参数
+            recency_weight: 最新记忆的最大加权（与 MemoryTextIndex 一致）
+            half_life_days: 时间加权的半衰期（天）
+        """
+        self.path = str(path or DEFAULT_STORE_PATH)
+        self.max_per_user = max_per_user
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.k1 = k1
+        self.b = b
+        self.recency_weight = recency_weight
+        self.half_life = half_life_days * 86400
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        with self._writer:
+            for statement in _SCHEMA:
+                self._writer.execute(statement)
+            self._migrate()
+        self._write_lock = threading.RLock()
+        self._pending: List[Memory] = []
+
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(max(1, read_pool_size)):
+            self._readers.put(self._connect(readonly=True))
+
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="memory-store-flush", daemon=True)
+        self._flusher.start()
+
+        self.batches = 0
+        self.flushed = 0
+
+    # ---------- 写入 ----------
+
+    def add(self, memory: Memory):
+        """写入一条记忆（批量提交），ID已存在时覆盖"""
+        with self._write_lock:
+            self._pending.append(memory)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> int:
+        """立即写入待写队列，返回写入条数"""
+        with self._write_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+            try:
+                with self._writer:
+                    for memory in batch:
+                        self._upsert(memory)
+                    if self.max_per_user:
+                        for user_id in {memory.user_id for memory in batch}:
+                            self._trim(user_id)
+            except sqlite3.Error:
+                # 写入失败时放回队列，下次重试
+                self._pending = batch + self._pending
+                raise
+            self.batches += 1
+            self.flushed += len(batch)
+            return len(batch)
+
+    def update(self, memory_id: str, content: Dict[str, Any], timestamp: datetime) -> Optional[Memory]:
+        """合并更新记忆内容并刷新时间，记忆不存在时返回None"""
+        with self._write_lock:
+            self.flush()
+            row = self._writer.execute(f"SELECT {_COLUMNS} FROM memories WHERE id = ?", (memory_id,)).fetchone()
+            if row is None:
+                return None
+            memory = _row_to_memory(row)
+            memory.content.update(content)
+            memory.timestamp = timestamp
+            with self._writer:
+                self._upsert(memory)
+            return memory
+
+    def delete(self, memory_id: str) -> bool:
+        with self._write_lock:
+            self.flush()
+            with self._writer:
+                return self._delete_rows([memory_id]) > 0
+
+    # ---------- 读取 ----------
+
+    def get(self, memory_id: str) -> Optional[Memory]:
+        self.flush()
+        with self._reader() as connection:
+            row = connection.execute(f"SELECT {_COLUMNS} FROM memories WHERE id = ?", (memory_id,)).fetchone()
+        return _row_to_memory(row) if row else None
+
+    def __contains__(self, memory_id: str) -> bool:
+        return self.get(memory_id) is not None
+
+    def latest(self, user_id: str, memory_type: Optional[str] = None, limit: int = 50) -> List[Memory]:
+        """用户最新的 limit 条记忆（最新的在前），按 (用户, [类型,] 时间) 索引倒序读取"""
+        self.flush()
+        if memory_type:
+            sql = (f"SELECT {_COLUMNS} FROM memories WHERE user_id = ? AND memory_type = ? "
+                   "ORDER BY timestamp DESC LIMIT ?")
+            params = (user_id, memory_type, max(limit, 0))
+        else:
+            sql = f"SELECT {_COLUMNS} FROM memories WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?"
+            params = (user_id, max(limit, 0))
+        with self._reader() as connection:
+            return [_row_to_memory(row) for row in connection.execute(sql, params)]
+
+    def search(self, user_id: str, query: str, limit: int = 10) -> List[Tuple[Memory, float]]:
+        """
+        全文检索，返回 [(记忆, 相关度)]，按相关度降序
+
+        相关度为按该用户的记忆统计的 BM25 分数乘以时间衰减加权。先只读取匹配记忆的
+        分词和长度打分，再读取前 limit 条的完整记录。
+        """
+        query_terms = Counter(tokenize(query))
+        if not query_terms or limit <= 0:
+            return []
+        self.flush()
+        user_terms = dict(zip(_user_terms(user_id, list(query_terms)), query_terms.values()))
+        with self._reader() as connection:
+            count, total_length = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM memories WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if not count:
+                return []
+            idf = {}
+            for term, query_count in user_terms.items():
+                frequency = connection.execute(
+                    "SELECT COUNT(*) FROM memory_fts WHERE memory_fts MATCH ?", (f'"{term}"',)
+                ).fetchone()[0]
+                if frequency:
+                    idf[term] = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5)) * query_count
+            if not idf:
+                return []
+            candidates = connection.execute(
+                "SELECT m.rowid, memory_fts.tokens, m.length, m.timestamp "
+                "FROM memory_fts JOIN memories m ON m.rowid = memory_fts.rowid WHERE memory_fts MATCH ?",
+                (' OR '.join(f'"{term}"' for term in idf),)
+            ).fetchall()
+
+            average_length = total_length / count or 1.0
+            scored = []
+            for rowid, tokens, length, timestamp in candidates:
+                terms = tokens.split()
+                norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                score = 0.0
+                for term, weight in idf.items():
+                    frequency = terms.count(term)
+                    if frequency:
+                        score += weight * frequency * (self.k1 + 1) / (frequency + norm)
+                scored.append((score * self._recency(timestamp), rowid))
+            top = heapq.nlargest(limit, scored)
+
+            rows = {}
+            if top:
+                rowids = [rowid for _, rowid in top]
+                placeholders = ', '.join('?' * len(rowids))
+                for row in connection.execute(
+                    f"SELECT rowid, {_COLUMNS} FROM memories WHERE rowid IN ({placeholders})", rowids
+                ):
+                    rows[row[0]] = row[1:]
+        return [(_row_to_memory(rows[rowid]), score) for score, rowid in top if rowid in rows]
+
+    def count(self, user_id: str, memory_type: Optional[str] = None) -> int:
+        self.flush()
+        with self._reader() as connection:
+            if memory_type:
+                sql, params = "SELECT COUNT(*) FROM memories WHERE user_id = ? AND memory_type = ?", (user_id, memory_type)
+            else:
+                sql, params = "SELECT COUNT(*) FROM memories WHERE user_id = ?", (user_id,)
+            return connection.execute(sql, params).fetchone()[0]
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._reader() as connection:
+            return connection.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    @property
+    def user_count(self) -> int:
+        self.flush()
+        with self._reader() as connection:
+            return connection.execute("SELECT COUNT(DISTINCT user_id) FROM memories").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "flushed": self.flushed,
+            "idle_readers": self._readers.qsize()
+        }
+
+    def close(self):
+        """写入待写队列并关闭所有连接"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flusher.join(timeout=self.flush_interval * 2 + 1)
+        with self._write_lock:
+            self.flush()
+            self._writer.close()
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+    # ---------- 内部方法 ----------
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        if readonly:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5.0, check_same_thread=False)
+        else:
+            connection = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _recency(self, timestamp: float) -> float:
+        age = max(0.0, time.time() - timestamp)
+        return 1 + self.recency_weight * math.pow(0.5, age / self.half_life)
+
+    def _migrate(self):
+        """旧数据库补上 length 列（由已写入的分词计算），再创建依赖它的索引（调用方负责事务）"""
+        columns = {row[1] for row in self._writer.execute("PRAGMA table_info(memories)")}
+        if 'length' not in columns:
+            self._writer.execute("ALTER TABLE memories ADD COLUMN length INTEGER NOT NULL DEFAULT 0")
+            self._writer.execute(
+                "UPDATE memories SET length = COALESCE((SELECT length(tokens) - length(replace(tokens, ' ', '')) "
+                "+ (tokens != '') FROM memory_fts WHERE memory_fts.rowid = memories.rowid), 0)"
+            )
+            logger.info("记忆存储已补充记忆长度列")
+        self._writer.execute(_LENGTH_INDEX)
+
+    @contextmanager
+    def _reader(self) -> Iterator[sqlite3.Connection]:
+        connection = self._readers.get()
+        try:
+            yield connection
+        finally:
+            self._readers.put(connection)
+
+    def _upsert(self, memory: Memory):
+        """写入记忆和全文索引（调用方负责事务）"""
+        existing = self._writer.execute("SELECT rowid FROM memories WHERE id = ?", (memory.id,)).fetchone()
+        tokens = _user_terms(memory.user_id, tokenize(memory_text(memory.content)))
+        values = (
+            memory.user_id,
+            memory.memory_type,
+            json.dumps(memory.content, ensure_ascii=False),
+            json.dumps(memory.metadata, ensure_ascii=False) if memory.metadata is not None else None,
+            memory.timestamp.timestamp(),
+            len(tokens)
+        )
+        if existing:
+            rowid = existing[0]
+            self._writer.execute(
+                "UPDATE memories SET user_id = ?, memory_type = ?, content = ?, metadata = ?, timestamp = ?, "
+                "length = ? WHERE rowid = ?", values + (rowid,)
+            )
+            self._writer.execute("DELETE FROM memory_fts WHERE rowid = ?", (rowid,))
+        else:
+            rowid = self._writer.execute(
+                "INSERT INTO memories (id, user_id, memory_type, content, metadata, timestamp, length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (memory.id,) + values
+            ).lastrowid
+        self._writer.execute("INSERT INTO memory_fts (rowid, tokens) VALUES (?, ?)", (rowid, ' '.join(tokens)))
+
+    def _trim(self, user_id: str):
+        """只保留用户最新的 max_per_user 条记忆"""
+        expired = [
+            row[0] for row in self._writer.execute(
+                "SELECT id FROM memories WHERE user_id = ? ORDER BY timestamp DESC LIMIT -1 OFFSET ?",
+                (user_id, self.max_per_user)
+            )
+        ]
+        if expired:
+            self._delete_rows(expired)
+
+    def _delete_rows(self, memory_ids: List[str]) -> int:
+        deleted = 0
+        for memory_id in memory_ids:
+            row = self._writer.execute("SELECT rowid FROM memories WHERE id = ?", (memory_id,)).fetchone()
+            if row is None:
+                continue
+            self._writer.execute("DELETE FROM memory_fts WHERE rowid = ?", (row[0],))
+            self._writer.execute("DELETE FROM memories WHERE rowid = ?", (row[0],))
+            deleted += 1
+        return deleted
+
+    def _flush_loop(self):
+        """后台定时写入待写队列"""
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.warning(f"记忆批量写入失败，稍后重试: {e}")
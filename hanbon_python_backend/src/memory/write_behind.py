@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: write_behind.py
+@description: 记忆异步写回队列（有界队列、按条数/时间批量写入、指数退避重试、落盘日志重启恢复）
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Deque, Dict, Any, List, Optional, Tuple
+
+from .models import Memory
+
+logger = logging.getLogger(__name__)
+
+# 批量写入函数：接收一批记忆，返回每条是否写入成功
+BatchWriter = Callable[[List[Memory]], Awaitable[List[bool]]]
+
+
+def memory_to_record(memory: Memory) -> Dict[str, Any]:
+    return {
+        "id": memory.id,
+        "user_id": memory.user_id,
+        "content": memory.content,
+        "type": memory.memory_type,
+        "timestamp": memory.timestamp.isoformat(),
+        "metadata": memory.metadata
+    }
+
+
+def record_to_memory(record: Dict[str, Any]) -> Memory:
+    return Memory(
+        id=record["id"],
+        user_id=record["user_id"],
+        content=record["content"],
+        memory_type=record["type"],
+        timestamp=datetime.fromisoformat(record["timestamp"]),
+        metadata=record.get("metadata")
+    )
+
+
+@dataclass
+class _PendingWrite:
+    memory: Memory
+    queued_at: float = field(default_factory=time.time)
+    attempts: int = 0
+
+
+class MemoryWriteQueue:
+    """
+    记忆写回队列
+
+    对话结束时记忆只放入内存队列并追加到落盘日志（微秒级），不等待远端API；
+    后台任务在攒够 batch_size 条或距上次写入超过 flush_interval 秒时批量写入。
+    写入失败的记忆按指数退避（retry_base * 2 ** (次数 - 1)，不超过 retry_max，带随机抖动）
+    重新排队，超过 max_retries 次后放弃。
+
+    落盘日志（JSON Lines）记录"加入"和"完成"两类事件，进程重启后重放日志恢复未写完的记忆；
+    队列清空时截断日志，日志行数过多时只保留未完成的记忆重写。
+    队列中（含重试和正在写入的）记忆数达到 max_size 时拒绝新记忆。
+    落盘日志由一个进程独占（重启时整体重放、清空时截断），多个工作进程不能共用同一个文件。
+    """
+
+    def __init__(
+        self,
+        writer: BatchWriter,
+        max_size: int = 5000,
+        batch_size: int = 32,
+        flush_interval: float = 1.0,
+        max_retries: int = 6,
+        retry_base: float = 1.0,
+        retry_max: float = 60.0,
+        spool_path: Optional[str] = None,
+        compact_lines: int = 2000
+    ):
+        """
+        Args:
+            writer: 批量写入函数，返回与输入一一对应的成功标记
+            max_size: 队列容量
+            batch_size: 每批最多写入条数，队列中攒够这么多条时立即写入
+            flush_interval: 不足一批时最长等待时间（秒）
+            max_retries: 写入失败后的最大重试次数
+            retry_base: 第一次重试的等待时间（秒）
+            retry_max: 重试等待时间上限（秒）
+            spool_path: 落盘日志文件（每个进程一个），不配置时队列只在内存中（重启会丢失未写入的记忆）
+            compact_lines: 日志超过多少行时压缩
+        """
+        self.writer = writer
+        self.max_size = max(1, max_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.spool_path = spool_path
+        self.compact_lines = compact_lines
+
+        self._pending: Deque[_PendingWrite] = deque()
+        # (下次重试时间, 序号, 待写记忆)
+        self._retrying: List[Tuple[float, int, _PendingWrite]] = []
+        self._sequence = itertools.count()
+        self._inflight: List[_PendingWrite] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+        self._spool = None
+        self._spool_lines = 0
+
+        self.submitted = 0
+        self.written = 0
+        self.retries = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restored = 0
+        self.batches = 0
+        self.spool_errors = 0
+        self.last_flush: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._retrying) + len(self._inflight)
+
+    # ---------- 生命周期 ----------
+
+    def start(self) -> asyncio.Task:
+        """恢复落盘日志中未写完的记忆，并在后台启动写入循环"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            if self._spool is None:
+                self._restore()
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self, timeout: float = 5.0):
+        """
+        停止写入循环
+
+        先在 timeout 秒内把队列中的记忆（包括等待重试的）各尝试写入一次，
+        仍未写入的留在落盘日志中，下次启动时恢复。
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        if len(self):
+            try:
+                await asyncio.wait_for(self.flush(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"关闭时记忆写回超时，{len(self)} 条留待下次启动写入")
+        self._close_spool()
+
+    # ---------- 写入 ----------
+
+    def submit(self, memory: Memory) -> bool:
+        """
+        加入一条待写记忆（不等待写入）
+
+        Returns:
+            是否已加入队列；队列已满时返回 False
+        """
+        if len(self) >= self.max_size:
+            self.rejected += 1
+            logger.warning(f"记忆写回队列已满（{self.max_size}），丢弃记忆: {memory.id}")
+            return False
+        self._journal([{"op": "add", "memory": memory_to_record(memory)}])
+        self._pending.append(_PendingWrite(memory))
+        self.submitted += 1
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> int:
+        """立即写入队列中的全部记忆（不等重试时间），每条最多尝试一次，返回写入成功的条数"""
+        while self._retrying:
+            self._pending.append(heapq.heappop(self._retrying)[2])
+        written = 0
+        for _ in range((len(self._pending) + self.batch_size - 1) // self.batch_size):
+            written += await self._write_batch(self._take_batch(time.monotonic()))
+        return written
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写回队列统计信息"""
+        entries = list(self._pending) + [item for _, _, item in self._retrying] + self._inflight
+        oldest = min((entry.queued_at for entry in entries), default=None)
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queued": len(self._pending),
+            "retrying": len(self._retrying),
+            "inflight": len(self._inflight),
+            "capacity": self.max_size,
+            "oldest_age_seconds": round(time.time() - oldest, 3) if oldest is not None else None,
+            "submitted": self.submitted,
+            "written": self.written,
+            "retries": self.retries,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "restored": self.restored,
+            "batches": self.batches,
+            "spool_path": self.spool_path,
+            "spool_lines": self._spool_lines,
+            "spool_errors": self.spool_errors,
+            "last_flush": self.last_flush,
+            "last_error": self.last_error
+        }
+
+    # ---------- 内部方法 ----------
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while True:
+                    batch = self._take_batch(time.monotonic())
+                    if not batch:
+                        break
+                    await self._write_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"记忆写回异常: {e}")
+
+    def _take_batch(self, now: float) -> List[_PendingWrite]:
+        """到期的重试优先，其余按加入顺序"""
+        batch = []
+        while self._retrying and self._retrying[0][0] <= now and len(batch) < self.batch_size:
+            batch.append(heapq.heappop(self._retrying)[2])
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popleft())
+        return batch
+
+    async def _write_batch(self, batch: List[_PendingWrite]) -> int:
+        if not batch:
+            return 0
+        async with self._write_lock:
+            self._inflight = batch
+            try:
+                results = await self.writer([entry.memory for entry in batch])
+            except asyncio.CancelledError:
+                # 取消时放回队列头部，保证不丢失
+                self._pending.extendleft(reversed(batch))
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning(f"批量写入记忆失败: {e}")
+                results = [False] * len(batch)
+            finally:
+                self._inflight = []
+
+        done = []
+        for entry, success in zip(batch, results):
+            if success:
+                self.written += 1
+                done.append(entry)
+                continue
+            entry.attempts += 1
+            if entry.attempts > self.max_retries:
+                self.failed += 1
+                done.append(entry)
+                logger.error(f"记忆写入重试 {self.max_retries} 次仍失败，放弃: {entry.memory.id}")
+                continue
+            self.retries += 1
+            delay = min(self.retry_max, self.retry_base * 2 ** (entry.attempts - 1))
+            delay *= random.uniform(0.5, 1.0)
+            heapq.heappush(self._retrying, (time.monotonic() + delay, next(self._sequence), entry))
+
+        self.batches += 1
+        self.last_flush = time.time()
+        self._journal([{"op": "done", "id": entry.memory.id} for entry in done])
+        self._maybe_compact()
+        return sum(1 for success in results if success)
+
+    # ---------- 落盘日志 ----------
+
+    def _restore(self):
+        """重放落盘日志，未完成的记忆重新排队，然后压缩日志"""
+        if not self.spool_path:
+            return
+        outstanding: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        if os.path.exists(self.spool_path):
+            try:
+                with open(self.spool_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            event = json.loads(line)
+                        except json.JSONDecodeError:
+                            # 进程中断时最后一行可能不完整
+                            continue
+                        if event.get("op") == "add":
+                            outstanding[event["memory"]["id"]] = event["memory"]
+                        elif event.get("op") == "done":
+                            outstanding.pop(event.get("id"), None)
+            except OSError as e:
+                self.spool_errors += 1
+                logger.warning(f"读取记忆写回日志失败: {e}")
+
+        for record in outstanding.values():
+            try:
+                self._pending.append(_PendingWrite(record_to_memory(record)))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"跳过无效的记忆写回记录: {e}")
+        self.restored = len(self._pending)
+        if self.restored:
+            logger.info(f"从写回日志恢复 {self.restored} 条未写入的记忆")
+        self._rewrite_spool()
+
+    def _journal(self, events: List[Dict[str, Any]]):
+        if not self.spool_path or not events:
+            return
+        try:
+            if self._spool is None:
+                directory = os.path.dirname(self.spool_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._spool = open(self.spool_path, 'a', encoding='utf-8')
+            self._spool.write(''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in events))
+            self._spool.flush()
+            self._spool_lines += len(events)
+        except OSError as e:
+            self.spool_errors += 1
+            logger.warning(f"写入记忆写回日志失败: {e}")
+
+    def _maybe_compact(self):
+        if not self.spool_path:
+            return
+        if not len(self) or self._spool_lines > self.compact_lines + len(self):
+            self._rewrite_spool()
+
+    def _rewrite_spool(self):
+        """只保留未完成的记忆重写日志（先写临时文件再替换）"""
+        if not self.spool_path:
+            return
+        self._close_spool()
+        entries = list(self._inflight) + [item for _, _, item in sorted(self._retrying)] + list(self._pending)
+        try:
+            directory = os.path.dirname(self.spool_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.spool_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps({"op": "add", "memory": memory_to_record(entry.memory)}, ensure_ascii=False) + '\n')
+            os.replace(temp_path, self.spool_path)
+            self._spool_lines = len(entries)
+        except OSError as e:
+            self.spool_errors += 1
+            logger.warning(f"压缩记忆写回日志失败: {e}")
+
+    def _close_spool(self):
+        if self._spool is not None:
+            try:
+                self._spool.close()
+            except OSError:
+                pass
+            self._spool = None
@@ -1,7 +1,6 @@
 from fastapi import FastAPI, Request, HTTPException, APIRouter
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import base64
 import io
 import httpx
 import requests
@@ -12,6 +11,7 @@ from pathlib import Path
 
 # 导入天气推荐相关函数
 from .app import weather_recommendations
+from .image_proxy import ImageFetchError, get_image_cache, proxy_url, router as image_proxy_router
 
 # 添加项目根目录到 Python 路径
 project_root = str(Path(__file__).parent.parent)
@@ -86,13 +86,11 @@ async def generate_food_image(food: str):
                         # 获取第一张图片的URL
                         image_url = data["res"][0]
                         
-                        # 下载图片
-                        img_response = await client.get(image_url)
-                        if img_response.status_code == 200:
-                            # 将图片转换为base64
-                            image_base64 = base64.b64encode(img_response.content).decode('utf-8')
-                            yield f"data: {image_base64}"
-                        else:
+                        # 下载到本地图片缓存，返回代理地址（不再把图片base64编码进事件流）
+                        try:
+                            await get_image_cache().get(image_url)
+                            yield f"data: {proxy_url(image_url)}"
+                        except (ValueError, ImageFetchError):
                             yield f"data: Error: Failed to download image"
                     else:
                         yield f"data: Error: No images found"
@@ -326,6 +324,7 @@ async def get_basic_nutrition(food: str):
 
 # 将 api_router 挂载到主应用
 app.include_router(api_router)
+app.include_router(image_proxy_router)
 
 def main():
     uvicorn.run(app, host=API_HOST, port=API_PORT)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_bing_parser.py
+@description: 对比Bing图片结果页各HTML解析后端的耗时（selectolax/lxml/流式/BeautifulSoup）
+@author: AI Assistant
+@created: 2024
+"""
+
+import os
+import sys
+import time
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.mcp_tools.tools.bing_html_parser import extract_images, available_backends, is_valid_image_url
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_pages():
+    """加载保存的Bing结果页（fixtures目录下所有 bing_*.html）"""
+    pages = {}
+    for name in sorted(os.listdir(FIXTURE_DIR)):
+        if name.startswith('bing_') and name.endswith('.html'):
+            with open(os.path.join(FIXTURE_DIR, name), encoding='utf-8') as f:
+                pages[name] = f.read()
+    return pages
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    """主函数"""
+    print("=== Bing结果页解析后端基准测试 ===\n")
+    backends = available_backends()
+    print(f"可用后端: {', '.join(backends)}\n")
+
+    for name, html in load_pages().items():
+        print(f"📄 {name} ({len(html.encode('utf-8')) / 1024:.0f} KB)")
+        print(f"{'图片数':>6} " + " ".join(f"{backend:>12}" for backend in backends) + "  结果一致")
+        for image_num in (5, 10, 25):
+            timings, results = [], []
+            for backend in backends:
+                elapsed, result = timeit(lambda: extract_images(html, image_num, is_valid_image_url, backend), 20)
+                timings.append(elapsed)
+                results.append(result)
+            same = all(result == results[-1] for result in results)
+            print(f"{image_num:>6} " + " ".join(f"{t:>10.2f}ms" for t in timings) + f"  {same}")
+
+        baseline = timings[-1]
+        print("相对 bs4 加速比（25张）: " + ", ".join(
+            f"{backend} {baseline / t:.1f}x" for backend, t in zip(backends, timings)
+        ) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_food_scoring.py
+@description: 美食推荐打分引擎基准测试（NumPy矩阵-向量打分 + argpartition 对比逐道菜的Python循环）
+@author: AI Assistant
+@created: 2024
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.mcp_tools.tools.food_knowledge_base import FoodKnowledgeBase, DEFAULT_KB_PATH
+from src.mcp_tools.tools.food_scoring import FoodScorer
+
+TOP_K = 8
+
+REQUESTS = [
+    {"mood": "聚会", "preferences": {"spicy_level": "重辣"}, "weather": "雨天", "occasion": "party"},
+    {"dietary_restrictions": ["素食"], "skill_level": "easy"},
+    {"preferences": {"cuisine_type": ["粤菜"], "spicy_level": "不辣"}, "weather": "炎热", "occasion": "family"},
+    {"mood": "浪漫", "dietary_restrictions": ["高蛋白"], "occasion": "date", "skill_level": "hard"},
+]
+
+
+def make_knowledge_base(directory: str, size: int) -> str:
+    """以内置知识库的菜系和取值为基础，生成 size 道随机菜品"""
+    with open(DEFAULT_KB_PATH, encoding='utf-8') as f:
+        base = json.load(f)
+    rng = random.Random(size)
+    ingredients = [f"食材{i}" for i in range(300)]
+    dishes = []
+    for i in range(size):
+        dishes.append({
+            "name": f"菜品{i}",
+            "cuisine": rng.choice(list(base['cuisines'])),
+            "seasons": rng.sample(["春季", "夏季", "秋季", "冬季"], rng.randint(0, 2)),
+            "moods": rng.sample(["开心", "减压", "聚会", "浪漫"], rng.randint(0, 1)),
+            "tags": rng.sample(["素食", "低热量", "高蛋白", "儿童适宜"], rng.randint(0, 2)),
+            "difficulty": rng.choice(["easy", "medium", "hard"]),
+            "cooking_minutes": rng.randint(10, 120),
+            "ingredients": rng.sample(ingredients, 5),
+            "calories": rng.randint(50, 900),
+            "protein": rng.randint(0, 45),
+            "popularity": rng.randint(40, 100)
+        })
+    path = os.path.join(directory, f"kb_{size}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"cuisines": base['cuisines'], "dishes": dishes}, f, ensure_ascii=False)
+    return path
+
+
+def loop_top_k(scorer: FoodScorer, weights: np.ndarray, candidates, k: int):
+    """对照组：逐道菜计算加权和，再整体排序"""
+    features = scorer.features
+    rows = features.matrix.tolist()
+    active = [(column, float(weights[column])) for column in range(len(weights)) if weights[column]]
+    allowed = set(candidates.tolist()) if candidates is not None else None
+    scored = []
+    for dish_id, row in enumerate(rows):
+        if allowed is not None and dish_id not in allowed:
+            continue
+        scored.append((sum(row[column] * weight for column, weight in active), dish_id))
+    scored.sort(key=lambda item: -item[0])
+    return [dish_id for _, dish_id in scored[:k]]
+
+
+def vector_top_k(scorer: FoodScorer, request):
+    weights = scorer.weights(season="秋季", **request)
+    candidates = scorer.candidates(request.get("dietary_restrictions"), request.get("skill_level", "medium"))
+    return scorer.top_k(weights, TOP_K, candidates), weights, candidates
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    """主函数"""
+    print("=== 美食推荐打分引擎基准测试 ===\n")
+    print(f"{'菜品数':>8} {'特征数':>6} {'构建(ms)':>10} {'向量化(ms)':>12} {'Python循环(ms)':>16} {'加速比':>8} 结果一致")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in (1000, 5000, 20000, 100000):
+            kb = FoodKnowledgeBase(make_knowledge_base(directory, size), mmap_threshold=1 << 40)
+            kb.load()
+            scorer = FoodScorer(kb)
+            start = time.perf_counter()
+            scorer.prepare()
+            build_ms = (time.perf_counter() - start) * 1000
+
+            vector_ms = loop_ms = 0.0
+            same = True
+            for request in REQUESTS:
+                (ids, scores), weights, candidates = vector_top_k(scorer, request)
+                vector_ms += timeit(lambda: vector_top_k(scorer, request), 200)
+                loop_ms += timeit(lambda: loop_top_k(scorer, weights, candidates, TOP_K), 3)
+                # 分数相同的菜品顺序可能不同，比较分数
+                expected = loop_top_k(scorer, weights, candidates, TOP_K)
+                expected_scores = scorer.features.matrix[expected] @ weights
+                same = same and np.allclose(np.sort(scores), np.sort(expected_scores), atol=1e-4)
+
+            vector_ms /= len(REQUESTS)
+            loop_ms /= len(REQUESTS)
+            print(f"{size:>8} {scorer.features.shape[1]:>6} {build_ms:>10.2f} {vector_ms:>12.3f} "
+                  f"{loop_ms:>16.2f} {loop_ms / vector_ms:>7.0f}x {same}")
+            kb.close()
+
+
+if __name__ == "__main__":
+    main()
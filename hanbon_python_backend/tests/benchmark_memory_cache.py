@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_memory_cache.py
+@description: 本地记忆缓存基准测试（记忆ID索引 + 按用户、按类型的时间有序存储，对比按用户列表扫描和每次读取排序）
+@author: AI Assistant
+@created: 2024
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.memory.openmemory_client import Memory
+from src.memory.local_cache import LocalMemoryCache
+
+PER_USER = 100
+OPERATIONS = 2000
+TYPES = ["conversation", "preference", "feedback"]
+
+
+def make_memories(total: int):
+    start = datetime.now() - timedelta(days=30)
+    return [
+        Memory(
+            id=f"user{i // PER_USER}_{i}",
+            user_id=f"user{i // PER_USER}",
+            content={"user_message": f"第{i}条记忆"},
+            memory_type=TYPES[i % len(TYPES)],
+            timestamp=start + timedelta(seconds=i)
+        )
+        for i in range(total)
+    ]
+
+
+class ListCache:
+    """对照组：原实现，用户ID -> 记忆列表，按ID操作时扫描所有用户"""
+
+    def __init__(self):
+        self.local_cache = {}
+
+    def add(self, memory):
+        self.local_cache.setdefault(memory.user_id, []).append(memory)
+        if len(self.local_cache[memory.user_id]) > PER_USER:
+            self.local_cache[memory.user_id] = self.local_cache[memory.user_id][-PER_USER:]
+
+    def update(self, memory_id, content, timestamp):
+        for memories in self.local_cache.values():
+            for memory in memories:
+                if memory.id == memory_id:
+                    memory.content.update(content)
+                    memory.timestamp = timestamp
+                    return memory
+        return None
+
+    def delete(self, memory_id):
+        for memories in self.local_cache.values():
+            for i, memory in enumerate(memories):
+                if memory.id == memory_id:
+                    del memories[i]
+                    return True
+        return False
+
+    def latest(self, user_id, memory_type=None, limit=50):
+        memories = self.local_cache.get(user_id, [])
+        if memory_type:
+            memories = [m for m in memories if m.memory_type == memory_type]
+        memories.sort(key=lambda m: m.timestamp, reverse=True)
+        return memories[:limit]
+
+
+def run(cache, memories, rng):
+    """返回各操作的平均耗时（微秒）"""
+    timings = {}
+
+    start = time.perf_counter()
+    for memory in memories:
+        cache.add(memory)
+    timings["add"] = (time.perf_counter() - start) / len(memories) * 1e6
+
+    operations = min(OPERATIONS, len(memories) // 2)
+    targets = rng.sample(memories, operations * 2)
+    start = time.perf_counter()
+    for memory in targets[:operations]:
+        cache.update(memory.id, {"edited": True}, datetime.now())
+    timings["update"] = (time.perf_counter() - start) / operations * 1e6
+
+    users = [memory.user_id for memory in targets[:operations]]
+    start = time.perf_counter()
+    for user_id in users:
+        cache.latest(user_id, None, 10)
+    timings["latest"] = (time.perf_counter() - start) / operations * 1e6
+
+    start = time.perf_counter()
+    for user_id in users:
+        cache.latest(user_id, "preference", 10)
+    timings["latest_type"] = (time.perf_counter() - start) / operations * 1e6
+
+    start = time.perf_counter()
+    for memory in targets[operations:]:
+        cache.delete(memory.id)
+    timings["delete"] = (time.perf_counter() - start) / operations * 1e6
+    return timings
+
+
+def main():
+    """主函数"""
+    print("=== 本地记忆缓存基准测试（单位：微秒/次）===\n")
+    print(f"{'记忆数':>8} {'实现':>6} {'写入':>8} {'更新':>10} {'删除':>10} {'最新N条':>9} {'按类型最新N条':>14}")
+
+    for total in (1000, 10000, 100000):
+        for name, factory in (("列表", ListCache), ("索引", LocalMemoryCache)):
+            timings = run(factory(), make_memories(total), random.Random(total))
+            print(f"{total:>8} {name:>6} {timings['add']:>8.2f} {timings['update']:>10.2f} "
+                  f"{timings['delete']:>10.2f} {timings['latest']:>9.2f} {timings['latest_type']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
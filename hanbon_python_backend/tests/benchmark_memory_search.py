@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_memory_search.py
+@description: 本地记忆检索基准测试（倒排索引 + BM25 对比逐条序列化后子串匹配）
+@author: AI Assistant
+@created: 2024
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.memory.openmemory_client import Memory
+from src.memory.memory_index import MemoryTextIndex
+
+QUERIES = ["喜欢吃辣", "川菜 火锅", "不吃香菜", "减肥 低热量 晚餐", "北京烤鸭", "海鲜过敏"]
+DISHES = ["红烧肉", "麻婆豆腐", "北京烤鸭", "水煮鱼", "清蒸鲈鱼", "宫保鸡丁", "火锅", "凉拌黄瓜", "番茄炒蛋", "糖醋排骨"]
+PHRASES = ["喜欢吃辣", "不吃香菜", "最近在减肥", "海鲜过敏", "想学做川菜", "周末聚会", "给孩子做早餐", "晚餐要低热量"]
+
+
+def make_memories(count: int, seed: int = 0):
+    """模拟一个用户的对话记忆"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    memories = []
+    for i in range(count):
+        memories.append(Memory(
+            id=f"user_{i}",
+            user_id="user",
+            content={
+                "user_message": f"{rng.choice(PHRASES)}，推荐一道{rng.choice(DISHES)}",
+                "ai_response": f"为您推荐{rng.choice(DISHES)}和{rng.choice(DISHES)}，" + "做法简单，" * rng.randint(1, 8),
+                "tools_used": rng.sample(["food_recommendation", "amap_search", "weather_api"], rng.randint(0, 2))
+            },
+            memory_type="conversation",
+            timestamp=now - timedelta(minutes=count - i)
+        ))
+    return memories
+
+
+def scan_search(memories, query: str, limit: int):
+    """对照组：原实现，逐条 json.dumps 后做子串匹配"""
+    query_lower = query.lower()
+    scored = []
+    for memory in memories:
+        content_str = json.dumps(memory.content, ensure_ascii=False).lower()
+        score = 1 if query_lower in content_str else 0
+        for word in query_lower.split():
+            if word in content_str:
+                score += 0.5
+        if score > 0:
+            scored.append((memory, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:limit]
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    """主函数"""
+    print("=== 本地记忆检索基准测试 ===\n")
+    print(f"{'记忆数':>8} {'建索引(ms)':>11} {'索引检索(ms)':>13} {'逐条扫描(ms)':>13} {'加速比':>8} {'索引命中':>8} {'扫描命中':>8}")
+
+    for count in (100, 1000, 5000, 20000):
+        memories = make_memories(count)
+        index = MemoryTextIndex()
+        start = time.perf_counter()
+        for memory in memories:
+            index.add(memory)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        index_ms = scan_ms = 0.0
+        index_hits = scan_hits = 0
+        for query in QUERIES:
+            index_ms += timeit(lambda: index.search(query, 10), 20)
+            scan_ms += timeit(lambda: scan_search(memories, query, 10), 3)
+            index_hits += len(index.search(query, 10))
+            scan_hits += len(scan_search(memories, query, 10))
+
+        index_ms /= len(QUERIES)
+        scan_ms /= len(QUERIES)
+        print(f"{count:>8} {build_ms:>11.1f} {index_ms:>13.3f} {scan_ms:>13.2f} {scan_ms / index_ms:>7.0f}x "
+              f"{index_hits:>8} {scan_hits:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_memory_store.py
+@description: 持久化记忆存储基准测试（SQLite WAL + FTS5：批量写入与逐条提交的写入速度、读取和全文检索延迟、多线程并发读取）
+@author: AI Assistant
+@created: 2024
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.memory.models import Memory
+from src.memory.sqlite_store import SQLiteMemoryStore
+
+USERS = 200
+QUERIES = ["喜欢吃辣", "北京烤鸭", "减肥 晚餐", "海鲜过敏"]
+PHRASES = ["喜欢吃辣", "不吃香菜", "最近在减肥", "海鲜过敏", "想学做川菜", "北京烤鸭", "晚餐要低热量"]
+
+
+def make_memories(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    start = datetime.now() - timedelta(days=90)
+    return [
+        Memory(
+            id=f"m{i}",
+            user_id=f"user{rng.randrange(USERS)}",
+            content={"user_message": f"{rng.choice(PHRASES)}，{rng.choice(PHRASES)}", "ai_response": "推荐" * rng.randint(1, 5)},
+            memory_type=rng.choice(["conversation", "preference"]),
+            timestamp=start + timedelta(minutes=i)
+        )
+        for i in range(count)
+    ]
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def main():
+    """主函数"""
+    print("=== 持久化记忆存储基准测试 ===\n")
+    print(f"{'记忆数':>8} {'批量写入(条/s)':>15} {'逐条提交(条/s)':>15} {'最新N条p50(ms)':>15} "
+          f"{'检索p50(ms)':>12} {'检索p99(ms)':>12} {'4线程读取(次/s)':>16}")
+
+    for count in (1000, 10000, 50000):
+        memories = make_memories(count)
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteMemoryStore(os.path.join(directory, "batched.db"), batch_size=256, flush_interval=60)
+            start = time.perf_counter()
+            for memory in memories:
+                store.add(memory)
+            store.flush()
+            batched_rate = count / (time.perf_counter() - start)
+
+            single = SQLiteMemoryStore(os.path.join(directory, "single.db"), batch_size=1, flush_interval=60)
+            sample = memories[:min(count, 2000)]
+            start = time.perf_counter()
+            for memory in sample:
+                single.add(memory)
+            single_rate = len(sample) / (time.perf_counter() - start)
+            single.close()
+
+            rng = random.Random(1)
+            latest_times, search_times = [], []
+            for _ in range(300):
+                user_id = f"user{rng.randrange(USERS)}"
+                start = time.perf_counter()
+                store.latest(user_id, "preference", 10)
+                latest_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                store.search(user_id, rng.choice(QUERIES), 10)
+                search_times.append(time.perf_counter() - start)
+
+            def read(i):
+                user_id = f"user{i % USERS}"
+                store.latest(user_id, None, 20)
+                store.search(user_id, QUERIES[i % len(QUERIES)], 10)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                list(pool.map(read, range(2000)))
+            read_rate = 2000 / (time.perf_counter() - start)
+            store.close()
+
+        print(f"{count:>8} {batched_rate:>15.0f} {single_rate:>15.0f} {percentile_ms(latest_times, 50):>15.3f} "
+              f"{percentile_ms(search_times, 50):>12.3f} {percentile_ms(search_times, 99):>12.3f} {read_rate:>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_memory_write_behind.py
+@description: 记忆异步写回基准测试（回复路径上保存记忆的耗时：直接写入API与放入写回队列对比；API部分失败时的重试、重启恢复）
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.memory.openmemory_client import OpenMemoryClient
+
+CONVERSATIONS = 200
+USERS = 20
+
+
+class _Session:
+    """模拟已连接的API会话"""
+
+    async def close(self):
+        pass
+
+
+class SlowApiClient(OpenMemoryClient):
+    """API写入有固定延迟、按比例失败的记忆客户端"""
+
+    def __init__(self, latency: float, failure_rate: float = 0.0, **kwargs):
+        super().__init__("benchmark", **kwargs)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(0)
+        self.api_writes = set()
+        self.session = _Session()
+
+    async def _add_memory_via_api(self, memory) -> bool:
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.failure_rate:
+            return False
+        self.api_writes.add(memory.id)
+        return True
+
+
+def conversation(i: int):
+    return f"user{i % USERS}", {"user_message": f"第{i}轮：最近在减肥，不吃辣", "ai_response": "推荐清蒸鱼"}
+
+
+async def response_path(client: OpenMemoryClient, method: str):
+    """并发模拟 CONVERSATIONS 次对话结束时保存记忆，返回每次的耗时"""
+
+    async def save(i: int) -> float:
+        user_id, memory_data = conversation(i)
+        start = time.perf_counter()
+        await getattr(client, method)(user_id, memory_data)
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(save(i) for i in range(CONVERSATIONS)))
+
+
+async def run(latency: float, failure_rate: float):
+    direct = SlowApiClient(latency, failure_rate)
+    direct_times = await response_path(direct, "add_memory")
+
+    with tempfile.TemporaryDirectory() as directory:
+        queued = SlowApiClient(latency, failure_rate, write_behind={
+            "spool_path": os.path.join(directory, "spool.jsonl"),
+            "batch_size": 32,
+            "flush_interval": 0.05,
+            "retry_base": 0.05,
+            "retry_max": 0.5
+        })
+        queued.write_queue.start()
+        queued_times = await response_path(queued, "enqueue_memory")
+        start = time.perf_counter()
+        while len(queued.write_queue):
+            await asyncio.sleep(0.01)
+        drain = time.perf_counter() - start
+        stats = queued.write_queue.get_stats()
+        await queued.close()
+
+    return {
+        "direct_p50": float(np.percentile(direct_times, 50)) * 1000,
+        "direct_api": len(direct.api_writes),
+        "queued_p50": float(np.percentile(queued_times, 50)) * 1000,
+        "queued_p99": float(np.percentile(queued_times, 99)) * 1000,
+        "drain": drain * 1000,
+        "queued_api": len(queued.api_writes),
+        "retries": stats["retries"]
+    }
+
+
+async def restart_recovery() -> str:
+    """队列未写完时进程退出，重新启动后从落盘日志恢复"""
+    with tempfile.TemporaryDirectory() as directory:
+        spool_path = os.path.join(directory, "spool.jsonl")
+        crashed = SlowApiClient(0.05, write_behind={"spool_path": spool_path, "flush_interval": 60})
+        for i in range(CONVERSATIONS):
+            await crashed.enqueue_memory(*conversation(i))
+        # 不调用 close，模拟进程被强制结束
+        crashed.write_queue._close_spool()
+
+        restarted = SlowApiClient(0.05, write_behind={"spool_path": spool_path, "flush_interval": 0.05})
+        restarted.write_queue.start()
+        restored = restarted.write_queue.restored
+        await restarted.close()
+        return f"未写入 {CONVERSATIONS} 条 -> 重启恢复 {restored} 条，关闭前写入API {len(restarted.api_writes)} 条"
+
+
+async def main_async():
+    print("=== 记忆异步写回基准测试 ===\n")
+    print(f"{CONVERSATIONS} 次并发对话保存记忆（回复路径耗时，单位：毫秒）\n")
+    print(f"{'API延迟(ms)':>11} {'失败率':>6} {'直接写入p50':>11} {'直接写入API成功':>15} "
+          f"{'写回p50':>9} {'写回p99':>9} {'后台写完':>9} {'写回API成功':>11} {'重试次数':>8}")
+    for latency, failure_rate in ((0.05, 0.0), (0.3, 0.0), (0.3, 0.2)):
+        result = await run(latency, failure_rate)
+        print(f"{latency * 1000:>11.0f} {failure_rate:>6.0%} {result['direct_p50']:>11.1f} {result['direct_api']:>15} "
+              f"{result['queued_p50']:>9.3f} {result['queued_p99']:>9.3f} {result['drain']:>9.0f} "
+              f"{result['queued_api']:>11} {result['retries']:>8}")
+
+    print(f"\n重启恢复：{await restart_recovery()}")
+
+
+def main():
+    """主函数"""
+    asyncio.run(main_async())
+
+
+if __name__ == "__main__":
+    main()
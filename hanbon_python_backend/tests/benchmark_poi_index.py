@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_poi_index.py
+@description: 对比高德周边搜索的线上路径与本地POI索引路径的耗时
+@author: AI Assistant
+@created: 2024
+
+线上路径使用本地aiohttp服务回放 fixtures/amap_place_around.json，
+只衡量HTTP往返、JSON解析和结果解析，不含真实网络延迟。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+from aiohttp import web
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.mcp_tools.tools.amap_tool import AmapTool
+from src.mcp_tools.tools.poi_index import haversine_distance
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'amap_place_around.json')
+CENTER = (112.938814, 28.228209)
+ROUNDS = 300
+# 高德按类别和语义匹配关键词（"美食"不出现在POI文本中），本地结果应与线上一致
+CONSISTENCY_KEYWORDS = ("餐饮", "美食", "火锅", "湘菜")
+CONSISTENCY_RADIUS = 500
+
+
+async def start_fixture_server(data):
+    """启动回放高德响应的本地服务"""
+    async def place_around(request):
+        return web.json_response(data)
+
+    app = web.Application()
+    app.router.add_get('/v3/place/around', place_around)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/v3"
+
+
+def random_queries(count):
+    """在fixture覆盖范围内随机生成查询中心"""
+    rng = random.Random(42)
+    queries = []
+    for _ in range(count):
+        lng = CENTER[0] + rng.uniform(-0.004, 0.004)
+        lat = CENTER[1] + rng.uniform(-0.004, 0.004)
+        queries.append(f"{lng:.6f},{lat:.6f}")
+    return queries
+
+
+async def run(tool, queries):
+    """依次执行查询并返回每次耗时（毫秒）"""
+    timings = []
+    for location in queries:
+        start = time.perf_counter()
+        result = await tool.execute(keyword="餐饮", location=location, radius="1500")
+        timings.append((time.perf_counter() - start) * 1000)
+        assert result.get("success"), result
+    return timings
+
+
+async def check_consistency(tool, data, queries):
+    """对每个关键词比较本地结果与线上结果（fixture中查询半径内的POI），返回不一致的查询数"""
+    mismatches = 0
+    for keyword in CONSISTENCY_KEYWORDS:
+        await tool.execute(keyword=keyword, location=f"{CENTER[0]},{CENTER[1]}", radius="5000")
+        local_total = live_total = 0
+        for location in queries:
+            lng, lat = (float(v) for v in location.split(','))
+            expected = {
+                poi['id'] for poi in data['pois']
+                if haversine_distance(lng, lat, *(float(v) for v in poi['location'].split(','))) <= CONSISTENCY_RADIUS
+            }
+            result = await tool.execute(keyword=keyword, location=location, radius=str(CONSISTENCY_RADIUS))
+            assert result.get("source") == "local_index", result
+            actual = {item['id'] for item in result['display_data']['locations']}
+            local_total += len(actual)
+            live_total += len(expected)
+            mismatches += actual != expected
+        print(f"{keyword:<6} 半径{CONSISTENCY_RADIUS}m 本地结果 {local_total:5d}  线上结果 {live_total:5d}")
+    return mismatches
+
+
+def report(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<12} 平均 {statistics.mean(timings):7.3f}ms  中位数 {statistics.median(timings):7.3f}ms  P95 {p95:7.3f}ms")
+
+
+async def main():
+    """主函数"""
+    logging.disable(logging.INFO)
+    print("=== 高德POI本地索引基准测试 ===\n")
+
+    with open(FIXTURE, encoding='utf-8') as f:
+        data = json.load(f)
+    runner, base_url = await start_fixture_server(data)
+
+    live_tool = AmapTool(name="amap_live", description="线上路径", api_key="test", poi_index=False)
+    indexed_tool = AmapTool(name="amap_indexed", description="索引路径", api_key="test")
+    live_tool.base_url = indexed_tool.base_url = base_url
+
+    try:
+        # 预热：索引工具先以fixture中心做一次线上查询建立覆盖范围
+        await indexed_tool.execute(keyword="餐饮", location=f"{CENTER[0]},{CENTER[1]}", radius="5000")
+
+        queries = random_queries(ROUNDS)
+        live = await run(live_tool, queries)
+        indexed = await run(indexed_tool, queries)
+
+        print(f"查询次数: {ROUNDS}，fixture POI数: {len(data['pois'])}\n")
+        report("线上路径", live)
+        report("本地索引", indexed)
+        print(f"\n加速比: {statistics.mean(live) / statistics.mean(indexed):.1f}x")
+        print(f"索引统计: {indexed_tool.poi_index.get_stats()}\n")
+
+        mismatches = await check_consistency(indexed_tool, data, queries[:50])
+        print(f"\n本地与线上不一致的查询: {mismatches}")
+    finally:
+        await live_tool.cleanup()
+        await indexed_tool.cleanup()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_poi_ranking.py
+@description: 对比餐厅排序的NumPy向量化实现与逐条Python循环实现
+@author: AI Assistant
+@created: 2024
+"""
+
+import json
+import math
+import os
+import random
+import sys
+import time
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.mcp_tools.tools.poi_ranking import (
+    rank_pois, RankingWeights, SPICY_KEYWORDS, LIGHT_KEYWORDS
+)
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'amap_place_around.json')
+PREFERENCES = {'spicy_preference': 'high', 'budget': 80}
+MAX_DISTANCE = 5000.0
+TOP_K = 10
+
+
+def _safe_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def rank_pois_loop(pois, preferences, top_k, max_distance, weights=RankingWeights()):
+    """逐条计算得分的参考实现（与向量化实现的公式一致）"""
+    budget = _safe_float(preferences.get('budget'))
+    spicy = preferences.get('spicy_preference')
+    scored = []
+    for index, poi in enumerate(pois):
+        biz_ext = poi.get('biz_ext') if isinstance(poi.get('biz_ext'), dict) else {}
+        text = f"{poi.get('name', '')} {poi.get('type', '')} {biz_ext.get('tag') or ''}"
+
+        distance = _safe_float(poi.get('distance'))
+        distance_score = 0.5 if distance is None else 1.0 - min(max(distance / max_distance, 0.0), 1.0)
+
+        rating = _safe_float(biz_ext.get('rating'))
+        rating_score = 0.5 if not rating or rating <= 0 else min(rating / 5.0, 1.0)
+
+        cost = _safe_float(biz_ext.get('cost'))
+        if cost is None:
+            price_score = 0.5
+        elif budget:
+            price_score = math.exp(-max(cost - budget, 0.0) / budget)
+        else:
+            price_score = 1.0 - min(max(cost / 200.0, 0.0), 1.0)
+
+        preference_score = 0.5
+        is_spicy = any(k in text for k in SPICY_KEYWORDS)
+        if spicy == 'high':
+            preference_score = 1.0 if is_spicy else 0.3
+        elif spicy == 'low':
+            preference_score = 1.0 if any(k in text for k in LIGHT_KEYWORDS) else (0.0 if is_spicy else 0.5)
+
+        score = (
+            weights.distance * distance_score
+            + weights.rating * rating_score
+            + weights.price * price_score
+            + weights.preference * preference_score
+        )
+        scored.append((-score, index, poi))
+
+    scored.sort(key=lambda item: (item[0], item[1]))
+    return [(poi, -neg_score) for neg_score, _, poi in scored[:top_k]]
+
+
+def synthetic_pois(base, count):
+    """在fixture基础上随机扰动距离、评分和人均生成更多POI"""
+    rng = random.Random(0)
+    pois = []
+    for i in range(count):
+        poi = dict(base[i % len(base)])
+        poi['id'] = f"{poi['id']}-{i}"
+        poi['distance'] = str(rng.randint(50, 5000))
+        poi['biz_ext'] = {
+            **poi['biz_ext'],
+            'rating': '' if rng.random() < 0.1 else f"{rng.uniform(3.0, 5.0):.1f}",
+            'cost': str(rng.randint(15, 300))
+        }
+        pois.append(poi)
+    return pois
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    """主函数"""
+    print("=== 餐厅排序基准测试（NumPy向量化 vs Python循环） ===\n")
+    with open(FIXTURE, encoding='utf-8') as f:
+        base = json.load(f)['pois']
+
+    print(f"{'POI数':>8} {'Python循环':>12} {'NumPy':>12} {'加速比':>8}  结果一致")
+    for count in (20, 100, 1000, 10000, 50000):
+        pois = synthetic_pois(base, count)
+        repeat = max(3, 20000 // count)
+        loop_ms, loop_result = timeit(lambda: rank_pois_loop(pois, PREFERENCES, TOP_K, MAX_DISTANCE), repeat)
+        numpy_ms, numpy_result = timeit(lambda: rank_pois(pois, PREFERENCES, TOP_K, MAX_DISTANCE), repeat)
+
+        same = all(
+            a[0]['id'] == b[0]['id'] and abs(a[1] - b[1]) < 1e-9
+            for a, b in zip(loop_result, numpy_result)
+        )
+        print(f"{count:>8} {loop_ms:>10.3f}ms {numpy_ms:>10.3f}ms {loop_ms / numpy_ms:>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
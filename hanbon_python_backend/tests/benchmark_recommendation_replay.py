@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_recommendation_replay.py
+@description: 美食推荐流量回放（确定性校验、各排序方案的延迟、覆盖率、与默认方案的重合度和模拟点击命中率）
+@author: AI Assistant
+@created: 2024
+
+用法:
+    python tests/benchmark_recommendation_replay.py [traffic.jsonl]
+
+traffic.jsonl 每行一个请求（food_recommendation 的参数，可选 "clicked": [菜名...]），
+不提供时生成合成流量，点击按菜品热度和请求偏好模拟。
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.mcp_tools.tools.food_recommendation_tool import FoodRecommendationTool, RESPONSE_CACHE_SIZE
+from src.mcp_tools.tools.food_scoring import RANKING_VARIANTS, DEFAULT_VARIANT
+
+REQUESTS = 2000
+USERS = 300
+
+
+def make_traffic(count: int, seed: int = 0):
+    """合成流量：用户在一个月内的随机请求"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    traffic = []
+    for _ in range(count):
+        request = {
+            "user_id": f"user{rng.randrange(USERS)}",
+            "date": (start + timedelta(days=rng.randrange(30))).isoformat()
+        }
+        if rng.random() < 0.5:
+            request["mood"] = rng.choice(["开心", "减压", "聚会", "浪漫"])
+        if rng.random() < 0.4:
+            request["weather"] = rng.choice(["晴天", "雨天", "阴天", "炎热", "寒冷"])
+        if rng.random() < 0.3:
+            request["dietary_restrictions"] = [rng.choice(["素食", "低热量", "高蛋白", "儿童适宜"])]
+        if rng.random() < 0.3:
+            request["preferences"] = {"spicy_level": rng.choice(["不辣", "微辣", "中辣", "重辣"])}
+        request["skill_level"] = rng.choice(["easy", "medium", "medium", "hard"])
+        traffic.append(request)
+    return traffic
+
+
+def load_traffic(path: str):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def simulate_clicks(tool: FoodRecommendationTool, request, rng: random.Random):
+    """模拟点击：从满足饮食限制的菜品中按热度加权抽取3道作为用户真实喜欢的菜"""
+    kb = tool.knowledge_base
+    filters = {}
+    if request.get("dietary_restrictions"):
+        filters["tag"] = request["dietary_restrictions"]
+    dish_ids = kb.query(**filters)
+    if len(dish_ids) == 0:
+        return set()
+    popularity = kb.numeric('popularity')[dish_ids].astype(float)
+    light = kb.numeric('calories')[dish_ids] < 350 if request.get("mood") == "减压" else 0
+    weights = popularity ** 2 * (1 + light)
+    picked = rng.choices(list(dish_ids), weights=list(weights), k=3)
+    return {kb.get(int(dish_id))["name"] for dish_id in picked}
+
+
+async def replay(tool: FoodRecommendationTool, traffic, variant: str):
+    """按给定排序方案回放流量，返回每个请求的推荐菜名列表和耗时"""
+    results = []
+    latencies = []
+    for request in traffic:
+        params = {key: value for key, value in request.items() if key != "clicked"}
+        params["variant"] = variant
+        start = time.perf_counter()
+        response = await tool.execute(**params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([item["dish_name"] for item in response["recommendations"]])
+    return results, latencies
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(set(a) & set(b)) / len(set(a) | set(b))
+
+
+async def run(traffic):
+    print(f"=== 美食推荐流量回放（{len(traffic)} 个请求）===\n")
+    print(f"{'排序方案':>10} {'确定性':>6} {'p50(ms)':>8} {'p99(ms)':>8} {'缓存p50(ms)':>12} "
+          f"{'覆盖菜品':>8} {'与默认重合':>10} {'命中率':>7}")
+
+    baseline = None
+    for variant in RANKING_VARIANTS:
+        # 每个方案用全新的工具实例，首轮不命中缓存
+        tool = FoodRecommendationTool("food_recommendation", "")
+        first, latencies = await replay(tool, traffic, variant)
+        # 缓存命中：重放最近的、仍在缓存中的请求
+        _, cached_latencies = await replay(tool, traffic[-RESPONSE_CACHE_SIZE:], variant)
+
+        fresh = FoodRecommendationTool("food_recommendation", "")
+        second, _ = await replay(fresh, traffic, variant)
+        deterministic = first == second
+
+        if baseline is None:
+            rng = random.Random(42)
+            clicks = [set(request["clicked"]) if "clicked" in request else simulate_clicks(tool, request, rng)
+                      for request in traffic]
+        if variant == DEFAULT_VARIANT:
+            baseline = first
+
+        coverage = len({name for names in first for name in names})
+        overlap = np.mean([jaccard(a, b) for a, b in zip(first, baseline)]) if baseline else 1.0
+        hit_rate = np.mean([bool(set(names) & clicked) for names, clicked in zip(first, clicks)])
+        print(f"{variant:>10} {str(deterministic):>6} {np.percentile(latencies, 50):>8.3f} "
+              f"{np.percentile(latencies, 99):>8.3f} {np.percentile(cached_latencies, 50):>12.3f} "
+              f"{coverage:>8} {overlap:>10.1%} {hit_rate:>7.1%}")
+
+
+def main():
+    """主函数"""
+    traffic = load_traffic(sys.argv[1]) if len(sys.argv) > 1 else make_traffic(REQUESTS)
+    asyncio.run(run(traffic))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@file: benchmark_search_cache.py
+@description: 网页搜索缓存基准测试（模拟规划器生成的同义查询，对比仅合并请求、原文缓存与归一化缓存的上游调用次数和耗时）
+@author: AI Assistant
+@created: 2024
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 添加父目录到路径，以便导入src模块
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from src.mcp_tools.tools.bing_search_tool import BingSearchTool
+from src.mcp_tools.tools.search_cache import normalize_query
+
+UPSTREAM_LATENCY = 0.15
+REQUESTS = 400
+CONCURRENCY = 20
+
+TOPICS = [
+    ["北京", "烤鸭", "推荐"], ["成都", "火锅", "排名"], ["上海", "本帮菜", "餐厅"],
+    ["广州", "早茶", "哪家好"], ["西安", "肉夹馍", "老字号"], ["杭州", "西湖醋鱼", "做法"],
+    ["长沙", "臭豆腐", "攻略"], ["重庆", "小面", "推荐"], ["番茄炒蛋", "家常", "做法"],
+    ["红烧肉", "不腻", "技巧"], ["减脂", "晚餐", "食谱"], ["儿童", "早餐", "营养"]
+]
+SEPARATORS = [" ", "  ", "，", "、", " ", "　"]
+
+
+def make_queries(count: int, seed: int = 0):
+    """同一主题的查询只在空白、标点、词序和末尾标点上不同"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = list(rng.choice(TOPICS))
+        rng.shuffle(words)
+        query = words[0]
+        for word in words[1:]:
+            query += rng.choice(SEPARATORS) + word
+        queries.append(query + rng.choice(["", "？", "!", "。"]))
+    return queries
+
+
+async def replay(tool: BingSearchTool, queries):
+    """以固定并发回放查询，返回每次请求的耗时（毫秒）"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await tool.execute(query=query, count=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(query) for query in queries))
+    return latencies
+
+
+async def run():
+    queries = make_queries(REQUESTS)
+    print("=== 网页搜索缓存基准测试 ===\n")
+    print(f"{REQUESTS} 个查询，{len(set(queries))} 种原文，{len({normalize_query(q) for q in queries})} 种归一化结果\n")
+    print(f"{'模式':>10} {'上游调用':>8} {'p50(ms)':>8} {'p99(ms)':>8} {'总耗时(s)':>9}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ("仅合并请求", "原文缓存", "归一化缓存"):
+            tool = BingSearchTool(
+                "bing_search", "", api_key="benchmark",
+                cache_path=os.path.join(directory, f"{mode}.db"), max_concurrency=CONCURRENCY
+            )
+            tool.quota.min_interval = 0.0
+            upstream_calls = 0
+
+            async def fake_search(query, count):
+                nonlocal upstream_calls
+                upstream_calls += 1
+                await asyncio.sleep(UPSTREAM_LATENCY)
+                return {"success": True, "results": [{"title": f"{query} {i}"} for i in range(count)]}
+
+            tool._search = fake_search
+            if mode == "仅合并请求":
+                # 缓存立即过期，只有同时进行的相同查询会被合并
+                tool.search_cache.ttl = 0.0
+            elif mode == "原文缓存":
+                # 对照组：以查询原文为键
+                import src.mcp_tools.tools.bing_search_tool as bing_module
+                original_normalize = bing_module.normalize_query
+                bing_module.normalize_query = lambda query: query
+
+            start = time.perf_counter()
+            latencies = await replay(tool, queries)
+            total = time.perf_counter() - start
+            if mode == "原文缓存":
+                bing_module.normalize_query = original_normalize
+
+            print(f"{mode:>10} {upstream_calls:>8} {np.percentile(latencies, 50):>8.2f} "
+                  f"{np.percentile(latencies, 99):>8.2f} {total:>9.2f}")
+            await tool.cleanup()
+
+
+def main():
+    """主函数"""
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()